@@ -1,3 +1,15 @@
-from .pymysql_base import get_Pool, destroy_Pool, destroy_Pool, get_connection_for_iterable_cursor
-
-
+from .pymysql_base import get_Pool, destroy_Pool, destroy_Pool, get_connection_for_iterable_cursor, \
+    iterate_read_query
+from .pooled_db import InstrumentedPooledDB
+from .pool_registry import CURW_FCST, CURW_OBS, CURW_SIM, configure_pool, get_registered_pool, get_pool_stats, \
+    destroy_registered_pool, destroy_registered_pools
+from .session import Session
+from .instrumentation import enable_instrumentation, disable_instrumentation, is_instrumentation_enabled, \
+    get_query_stats, reset_query_stats, dump_query_stats, JSON, PROMETHEUS
+from .timeseries_format import TimeseriesFormat, format_timeseries
+from .bulk_load import load_data_local_infile, is_bulk_load_supported, SerializedRows
+from .timeseries_payload import build_data_rows, is_columnar_timeseries, serialize_data_rows
+from .date_bounds import update_date_bound, update_date_bounds
+from .data_merge import merge_data_rows, diff_rows, fetch_window
+from .reference_cache import enable_reference_cache, disable_reference_cache, is_reference_cache_enabled, \
+    invalidate_reference_cache
@@ -0,0 +1,133 @@
+import os
+from collections import namedtuple
+from datetime import datetime
+
+from pymysql.err import MySQLError, IntegrityError
+
+from db_adapter.logger import logger
+
+"""
+Bulk loading of rows through LOAD DATA LOCAL INFILE.
+
+Rows are serialized into a tab separated buffer held in an anonymous in-memory file (memfd),
+which is handed over to the client library through its /proc/self/fd path, so nothing is written to disk.
+Requires local_infile to be enabled on both the connection (see get_Pool(local_infile=True)) and the server.
+Duplicate keys are handled as by executemany: an IntegrityError 1062 when inserting, an upsert through a
+temporary table (INSERT ... SELECT ... ON DUPLICATE KEY UPDATE) when upserting.
+load_data_local_infile() returns None whenever bulk loading is not possible, so callers can fall back
+to executemany.
+"""
+
+# 1148: ER_NOT_ALLOWED_COMMAND, 2068: CR_LOAD_DATA_LOCAL_INFILE_REJECTED,
+# 3948: ER_CLIENT_LOCAL_FILES_DISABLED
+LOCAL_INFILE_DISABLED_ERRORS = (1148, 2068, 3948)
+
+# ER_DUP_ENTRY
+DUPLICATE_ENTRY_ERROR = 1062
+
+# rows already serialized in the LOAD DATA format (e.g. by timeseries_payload.serialize_data_rows)
+SerializedRows = namedtuple('SerializedRows', ['row_count', 'payload'])
+
+_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r', '\0': '\\0'})
+
+
+def is_bulk_load_supported():
+    """
+    Check whether in-memory files can be handed over to LOAD DATA LOCAL INFILE on this platform
+    :return: True if supported, else False
+    """
+    return hasattr(os, 'memfd_create') and os.path.isdir('/proc/self/fd')
+
+
+def _format_field(value):
+
+    if value is None:
+        return '\\N'
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, float):
+        return repr(float(value))
+    return str(value).translate(_ESCAPES)
+
+
+def _serialize_rows(rows):
+
+    lines = ['\t'.join([_format_field(value) for value in row]) for row in rows]
+    lines.append('')
+    return '\n'.join(lines).encode('utf-8')
+
+
+def _get_duplicate_entry_warning(cursor):
+
+    cursor.execute("SHOW WARNINGS")
+    for warning in cursor.fetchall():
+        code, message = (warning.get('Code'), warning.get('Message')) if isinstance(warning, dict) \
+            else (warning[1], warning[2])
+        if code == DUPLICATE_ENTRY_ERROR:
+            return message
+    return None
+
+
+def _load(cursor, table, columns, fd):
+
+    sql_statement = "LOAD DATA LOCAL INFILE %s INTO TABLE `{}` CHARACTER SET utf8mb4 " \
+                    "FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n' ({})"\
+        .format(table, ', '.join(['`{}`'.format(column) for column in columns]))
+
+    try:
+        return cursor.execute(sql_statement, '/proc/self/fd/{}'.format(fd))
+    except MySQLError as error:
+        if error.args and error.args[0] in LOCAL_INFILE_DISABLED_ERRORS:
+            logger.warning("LOAD DATA LOCAL INFILE is disabled: {}".format(error.args[1]))
+            return None
+        raise error
+
+
+def load_data_local_infile(cursor, table, columns, rows, upsert=False):
+    """
+    Load rows into a table with LOAD DATA LOCAL INFILE
+    :param cursor: cursor of the connection to load data through
+    :param table: name of the table
+    :param columns: list of column names, in the order of the row fields
+    :param rows: list of rows (lists or tuples), or SerializedRows
+    :param boolean upsert: If True, rows are loaded into a temporary copy of the table and upserted from there
+    (INSERT ... SELECT ... ON DUPLICATE KEY UPDATE), else a row with an existing key raises IntegrityError 1062,
+    as executemany does
+    :return: affected row count, counted as by executemany (upserted rows count 1 if inserted, 2 if updated),
+    or None if bulk loading is not possible (local infile disabled or unsupported platform)
+    """
+
+    if not is_bulk_load_supported():
+        logger.warning("LOAD DATA LOCAL INFILE is not supported on this platform.")
+        return None
+
+    fd = os.memfd_create('db_adapter_{}'.format(table), os.MFD_CLOEXEC)
+    try:
+        with open(fd, 'wb', closefd=False) as buffer:
+            buffer.write(rows.payload if isinstance(rows, SerializedRows) else _serialize_rows(rows))
+        sent_row_count = rows.row_count if isinstance(rows, SerializedRows) else len(rows)
+
+        if not upsert:
+            row_count = _load(cursor, table, columns, fd)
+            # with LOCAL the server skips rows with an existing key (with a warning) instead of failing
+            if row_count is not None and row_count < sent_row_count:
+                message = _get_duplicate_entry_warning(cursor)
+                if message is not None:
+                    raise IntegrityError(DUPLICATE_ENTRY_ERROR, message)
+            return row_count
+
+        staging_table = '{}_bulk_load'.format(table)
+        column_list = ', '.join(['`{}`'.format(column) for column in columns])
+        cursor.execute("DROP TEMPORARY TABLE IF EXISTS `{}`".format(staging_table))
+        cursor.execute("CREATE TEMPORARY TABLE `{}` LIKE `{}`".format(staging_table, table))
+        try:
+            if _load(cursor, staging_table, columns, fd) is None:
+                return None
+            sql_statement = "INSERT INTO `{}` ({}) SELECT {} FROM `{}` ON DUPLICATE KEY UPDATE {}"\
+                .format(table, column_list, column_list, staging_table,
+                        ', '.join(['`{0}`=VALUES(`{0}`)'.format(column) for column in columns]))
+            return cursor.execute(sql_statement)
+        finally:
+            cursor.execute("DROP TEMPORARY TABLE IF EXISTS `{}`".format(staging_table))
+    finally:
+        os.close(fd)
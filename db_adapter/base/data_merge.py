@@ -0,0 +1,121 @@
+import numpy as np
+import pandas as pd
+
+"""
+Diff-aware merge of timeseries rows into a data table.
+
+The stored window (the time range of the incoming rows) is fetched with a single range query, compared against the
+incoming values in vectorized form, and only the rows which are new or whose value changed beyond the tolerance are
+written. Unchanged rows are not rewritten, which keeps reruns of a model from rewriting (and replicating) every row.
+"""
+
+# absolute and relative tolerances under which a value is considered unchanged (as in numpy.isclose)
+DEFAULT_ATOL = 1e-6
+DEFAULT_RTOL = 0.0
+
+
+def _to_seconds(times):
+
+    if len(times) == 0:
+        return np.array([], dtype=np.int64)
+    return np.asarray(pd.to_datetime(list(times)), dtype='datetime64[s]').astype(np.int64)
+
+
+def _to_values(values):
+    return np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+
+
+def fetch_window(cursor, table, conditions, start, end):
+    """
+    Fetch the stored (time, value) rows of a time window
+    :param cursor: cursor of the connection to read through
+    :param table: data table name
+    :param conditions: dict of column -> value identifying the timeseries (e.g. {'id': tms_id, 'fgt': fgt})
+    :param start: window start (inclusive)
+    :param end: window end (inclusive)
+    :return: (times, values) tuple of NumPy arrays (times as int64 epoch seconds, values as float64)
+    """
+
+    columns = list(conditions.keys())
+    sql_statement = "SELECT `time`, `value` FROM `{}` WHERE {} AND `time` BETWEEN %s AND %s;"\
+        .format(table, ' AND '.join(["`{}`=%s".format(column) for column in columns]))
+    cursor.execute(sql_statement, [conditions[column] for column in columns] + [start, end])
+
+    results = cursor.fetchall()
+    if len(results) > 0 and isinstance(results[0], dict):
+        results = [(result.get('time'), result.get('value')) for result in results]
+    times = [result[0] for result in results]
+    values = [result[1] for result in results]
+    return _to_seconds(times), _to_values(values)
+
+
+def diff_rows(rows, time_index, value_index, stored_times, stored_values, atol=DEFAULT_ATOL, rtol=DEFAULT_RTOL):
+    """
+    Compare incoming rows against the stored values of the same timeseries
+    :param rows: list of row tuples
+    :param time_index: index of the time field in a row
+    :param value_index: index of the value field in a row
+    :param stored_times: NumPy array of stored times (int64 epoch seconds or datetime64[s])
+    :param stored_values: NumPy array of stored values (float64, NaN for NULL)
+    :param atol: absolute tolerance
+    :param rtol: relative tolerance
+    :return: (rows to write, counts) tuple, where counts is a dict with 'inserted', 'updated' and 'unchanged' keys
+    """
+
+    if len(rows) == 0:
+        return [], {'inserted': 0, 'updated': 0, 'unchanged': 0}
+
+    times = _to_seconds([row[time_index] for row in rows])
+    values = _to_values([row[value_index] for row in rows])
+    stored_times = np.asarray(stored_times).astype('datetime64[s]').astype(np.int64)
+    stored_values = np.asarray(stored_values, dtype=np.float64)
+
+    order = np.argsort(stored_times)
+    stored_times, stored_values = stored_times[order], stored_values[order]
+
+    positions = np.searchsorted(stored_times, times)
+    positions[positions >= len(stored_times)] = 0
+    found = stored_times[positions] == times if len(stored_times) > 0 else np.zeros(len(times), dtype=bool)
+
+    previous_values = stored_values[positions] if len(stored_times) > 0 else np.full(len(times), np.nan)
+    unchanged = found & (np.isclose(values, previous_values, rtol=rtol, atol=atol) |
+                         (np.isnan(values) & np.isnan(previous_values)))
+    inserted = ~found
+    updated = found & ~unchanged
+
+    rows_to_write = [rows[i] for i in np.flatnonzero(~unchanged).tolist()]
+    counts = {'inserted': int(inserted.sum()), 'updated': int(updated.sum()), 'unchanged': int(unchanged.sum())}
+    return rows_to_write, counts
+
+
+def merge_data_rows(cursor, table, columns, rows, conditions, atol=DEFAULT_ATOL, rtol=DEFAULT_RTOL):
+    """
+    Merge the rows of one timeseries into a data table, writing only new and changed rows (without committing)
+    :param cursor: cursor of the connection to write through
+    :param table: data table name
+    :param columns: column names, in the order of the row fields. Must include 'time' and 'value'
+    :param rows: list of row tuples, all of the timeseries identified by conditions
+    :param conditions: dict of column -> value identifying the timeseries (e.g. {'id': tms_id})
+    :param atol: absolute tolerance
+    :param rtol: relative tolerance
+    :return: dict with 'inserted', 'updated' and 'unchanged' keys
+    """
+
+    time_index = columns.index('time')
+    value_index = columns.index('value')
+
+    if len(rows) == 0:
+        return {'inserted': 0, 'updated': 0, 'unchanged': 0}
+
+    times = pd.to_datetime([row[time_index] for row in rows])
+    stored_times, stored_values = fetch_window(cursor, table, conditions, times.min().to_pydatetime(),
+            times.max().to_pydatetime())
+
+    rows_to_write, counts = diff_rows(rows, time_index, value_index, stored_times, stored_values, atol, rtol)
+
+    if len(rows_to_write) > 0:
+        sql_statement = "INSERT INTO `{}` ({}) VALUES ({}) ON DUPLICATE KEY UPDATE `value`=VALUES(`value`)"\
+            .format(table, ', '.join(["`{}`".format(column) for column in columns]), ', '.join(['%s'] * len(columns)))
+        cursor.executemany(sql_statement, rows_to_write)
+
+    return counts
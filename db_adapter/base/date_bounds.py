@@ -0,0 +1,69 @@
+"""
+Atomic, set based updates of the date bounds (e.g. start_date / end_date) of run tables.
+
+Bounds only ever move outwards: a latest bound is updated with GREATEST(COALESCE(bound, new), new) and an earliest
+bound with LEAST(COALESCE(bound, new), new), so the check and the update happen in one statement and concurrent
+writers can not move a bound backwards.
+"""
+
+# maximum number of (id, date) pairs per bulk update statement
+BOUNDS_CHUNK_SIZE = 1000
+
+
+def _bound_expression(column_reference, value_reference, latest):
+
+    return "{}(COALESCE({}, {}), {})".format('GREATEST' if latest else 'LEAST', column_reference, value_reference,
+            value_reference)
+
+
+def update_date_bound(cursor, table, column, id_, date, latest=True):
+    """
+    Move the date bound of one run outwards, in a single statement
+    :param cursor: cursor of the connection to update through
+    :param table: run table name
+    :param column: date column name (e.g. 'end_date')
+    :param id_: run id
+    :param date: new date
+    :param latest: If True, keep the later of the existing and the new date, else keep the earlier one
+    :return: affected row count (0 if the bound was not moved)
+    """
+
+    sql_statement = "UPDATE `{}` SET `{}`={} WHERE `id`=%s".format(table, column,
+            _bound_expression("`{}`".format(column), "CAST(%s AS DATETIME)", latest))
+    return cursor.execute(sql_statement, (date, date, id_))
+
+
+def update_date_bounds(cursor, table, column, id_date_pairs, latest=True, chunk_size=BOUNDS_CHUNK_SIZE):
+    """
+    Move the date bounds of many runs outwards, with one multi-row join statement per chunk of runs.
+    Duplicate ids are merged to their latest (or earliest) date beforehand.
+    :param cursor: cursor of the connection to update through
+    :param table: run table name
+    :param column: date column name (e.g. 'end_date')
+    :param id_date_pairs: iterable of (id, date) pairs
+    :param latest: If True, keep the later of the existing and the new dates, else keep the earlier one
+    :param chunk_size: maximum number of runs updated per statement
+    :return: affected row count
+    """
+
+    dates = {}
+    for id_, date in id_date_pairs:
+        if date is None:
+            continue
+        existing_date = dates.get(id_)
+        if existing_date is None or (date > existing_date if latest else date < existing_date):
+            dates[id_] = date
+
+    pairs = list(dates.items())
+    row_count = 0
+
+    for i in range(0, len(pairs), chunk_size):
+        pair_chunk = pairs[i: i + chunk_size]
+        bounds = " UNION ALL ".join(["SELECT %s AS `id`, CAST(%s AS DATETIME) AS `date`"] +
+                                   ["SELECT %s, CAST(%s AS DATETIME)"] * (len(pair_chunk) - 1))
+        sql_statement = "UPDATE `{0}` JOIN ({1}) AS `bounds` ON `{0}`.`id`=`bounds`.`id` SET `{0}`.`{2}`={3}"\
+            .format(table, bounds, column,
+                    _bound_expression("`{}`.`{}`".format(table, column), "`bounds`.`date`", latest))
+        row_count += cursor.execute(sql_statement, [value for pair in pair_chunk for value in pair])
+
+    return row_count
@@ -0,0 +1,385 @@
+import json
+import re
+import sys
+import threading
+from time import perf_counter
+
+import pymysql
+from pymysql.cursors import SSCursor
+
+from db_adapter.logger import logger
+
+"""
+Opt-in per statement instrumentation of all the queries executed through connections created by the adapter
+(db_adapter.base.get_Pool, get_registered_pool and get_connection_for_iterable_cursor).
+
+For each cursor execute / executemany / callproc, the statement fingerprint, the calling adapter method,
+duration, rows affected/returned and bytes sent to/received from the server are recorded and aggregated into
+in-process latency histograms keyed by (fingerprint, caller).
+When instrumentation is disabled, cursors are not wrapped and only a flag check is added per cursor/packet.
+
+e.g.:
+    enable_instrumentation()
+    ...
+    dump_query_stats('query_stats.prom', output_format=PROMETHEUS)
+"""
+
+JSON = 'json'
+PROMETHEUS = 'prometheus'
+
+# latency histogram bucket upper bounds in seconds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+                   float('inf'))
+
+_MAX_CACHED_FINGERPRINTS = 10000
+
+_enabled = False
+_stats = {}
+_stats_lock = threading.Lock()
+_fingerprints = {}
+
+_QUOTED_STRING = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.|\"\")*\"")
+_PLACEHOLDER = re.compile(r"%(?:\([^)]*\))?s")
+_NUMBER = re.compile(r"(?<![\w`$])-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?(?![\w`])")
+_WHITESPACE = re.compile(r"\s+")
+_VALUE_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_REPEATED_VALUE_LISTS = re.compile(r"\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))+")
+
+
+def enable_instrumentation():
+    global _enabled
+    _enabled = True
+
+
+def disable_instrumentation():
+    global _enabled
+    _enabled = False
+
+
+def is_instrumentation_enabled():
+    return _enabled
+
+
+def fingerprint_statement(statement):
+    """
+    Normalize a sql statement so that statements differing only by literal values, placeholders,
+    whitespace or number of rows in VALUES / IN lists share the same fingerprint
+    :param statement: sql statement (str or bytes)
+    :return: str: fingerprint
+    """
+
+    fingerprint = _fingerprints.get(statement)
+    if fingerprint is not None:
+        return fingerprint
+
+    text = statement.decode('utf-8', 'replace') if isinstance(statement, bytes) else str(statement)
+    text = _QUOTED_STRING.sub('?', text)
+    text = _PLACEHOLDER.sub('?', text)
+    text = _NUMBER.sub('?', text)
+    text = _WHITESPACE.sub(' ', text).strip().rstrip(';').strip()
+    text = _VALUE_LIST.sub('(...)', text)
+    fingerprint = _REPEATED_VALUE_LISTS.sub('(...)', text)
+
+    if len(_fingerprints) >= _MAX_CACHED_FINGERPRINTS:
+        _fingerprints.clear()
+    _fingerprints[statement] = fingerprint
+
+    return fingerprint
+
+
+def _get_caller():
+    """
+    Find the adapter method which issued the statement, i.e. the innermost db_adapter frame outside of
+    db_adapter.base. Falls back to the innermost db_adapter.base frame, or the innermost external frame.
+    """
+
+    frame = sys._getframe(3)
+    base_caller = None
+    external_caller = None
+
+    while frame is not None:
+        module = frame.f_globals.get('__name__', '')
+        if module.startswith('db_adapter.'):
+            if not module.startswith('db_adapter.base.'):
+                return _frame_name(module, frame)
+            if base_caller is None and module != __name__:
+                base_caller = _frame_name(module, frame)
+        elif external_caller is None and not module.startswith(('DBUtils', 'pymysql')):
+            external_caller = _frame_name(module, frame)
+        frame = frame.f_back
+
+    return base_caller or external_caller or '<unknown>'
+
+
+def _frame_name(module, frame):
+    code = frame.f_code
+    return "{}.{}".format(module, getattr(code, 'co_qualname', code.co_name))
+
+
+def _new_entry(fingerprint, caller):
+    return {
+            'fingerprint'   : fingerprint,
+            'caller'        : caller,
+            'count'         : 0,
+            'errors'        : 0,
+            'total_time'    : 0.0,
+            'min_time'      : None,
+            'max_time'      : 0.0,
+            'rows'          : 0,
+            'bytes_sent'    : 0,
+            'bytes_received': 0,
+            'buckets'       : [0] * len(LATENCY_BUCKETS)
+            }
+
+
+def record_statement(fingerprint, caller, duration, rows, bytes_sent, bytes_received, error=False):
+    """
+    Add a statement execution to the aggregates
+    """
+
+    key = (fingerprint, caller)
+
+    with _stats_lock:
+        entry = _stats.get(key)
+        if entry is None:
+            entry = _new_entry(fingerprint, caller)
+            _stats[key] = entry
+
+        entry['count'] += 1
+        if error:
+            entry['errors'] += 1
+        entry['total_time'] += duration
+        if entry['min_time'] is None or duration < entry['min_time']:
+            entry['min_time'] = duration
+        if duration > entry['max_time']:
+            entry['max_time'] = duration
+        if rows:
+            entry['rows'] += rows
+        entry['bytes_sent'] += bytes_sent
+        entry['bytes_received'] += bytes_received
+
+        for index, upper_bound in enumerate(LATENCY_BUCKETS):
+            if duration <= upper_bound:
+                entry['buckets'][index] += 1
+                break
+
+
+def _record_fetch(key, rows, bytes_received):
+    with _stats_lock:
+        entry = _stats.get(key)
+        if entry is not None:
+            entry['rows'] += rows
+            entry['bytes_received'] += bytes_received
+
+
+def get_query_stats():
+    """
+    Snapshot of the aggregated statement statistics
+    :return: list of dicts with 'fingerprint', 'caller', 'count', 'errors', 'total_time', 'min_time', 'max_time',
+    'mean_time', 'rows', 'bytes_sent', 'bytes_received' and 'histogram' (list of [upper_bound, cumulative count])
+    keys, slowest (by total time) first
+    """
+
+    with _stats_lock:
+        entries = [dict(entry, buckets=list(entry['buckets'])) for entry in _stats.values()]
+
+    snapshot = []
+    for entry in entries:
+        buckets = entry.pop('buckets')
+        cumulative = 0
+        histogram = []
+        for upper_bound, count in zip(LATENCY_BUCKETS, buckets):
+            cumulative += count
+            histogram.append(['+Inf' if upper_bound == float('inf') else upper_bound, cumulative])
+        entry['histogram'] = histogram
+        entry['mean_time'] = entry['total_time'] / entry['count'] if entry['count'] else 0.0
+        snapshot.append(entry)
+
+    snapshot.sort(key=lambda e: e['total_time'], reverse=True)
+    return snapshot
+
+
+def reset_query_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+def _escape_label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_prometheus(snapshot=None):
+    """
+    Render statement statistics in Prometheus text exposition format
+    :param snapshot: output of get_query_stats(). If None, a new snapshot is taken
+    :return: str
+    """
+
+    if snapshot is None:
+        snapshot = get_query_stats()
+
+    lines = ["# HELP db_adapter_query_duration_seconds Statement execution time.",
+             "# TYPE db_adapter_query_duration_seconds histogram"]
+    counters = [('rows', 'db_adapter_query_rows_total', "Rows affected or returned."),
+                ('bytes_sent', 'db_adapter_query_bytes_sent_total', "Bytes sent to the server."),
+                ('bytes_received', 'db_adapter_query_bytes_received_total', "Bytes received from the server."),
+                ('errors', 'db_adapter_query_errors_total', "Failed statement executions.")]
+
+    for entry in snapshot:
+        labels = 'fingerprint="{}",caller="{}"'.format(_escape_label(entry['fingerprint']),
+                _escape_label(entry['caller']))
+        for upper_bound, cumulative in entry['histogram']:
+            lines.append('db_adapter_query_duration_seconds_bucket{{{},le="{}"}} {}'.format(labels, upper_bound,
+                    cumulative))
+        lines.append('db_adapter_query_duration_seconds_sum{{{}}} {}'.format(labels, entry['total_time']))
+        lines.append('db_adapter_query_duration_seconds_count{{{}}} {}'.format(labels, entry['count']))
+
+    for key, metric, description in counters:
+        lines.append("# HELP {} {}".format(metric, description))
+        lines.append("# TYPE {} counter".format(metric))
+        for entry in snapshot:
+            lines.append('{}{{fingerprint="{}",caller="{}"}} {}'.format(metric, _escape_label(entry['fingerprint']),
+                    _escape_label(entry['caller']), entry[key]))
+
+    return '\n'.join(lines) + '\n'
+
+
+def dump_query_stats(file_path, output_format=JSON):
+    """
+    Write a snapshot of the statement statistics to a file
+    :param file_path: output file path
+    :param output_format: JSON or PROMETHEUS
+    :return: number of statement fingerprints written
+    """
+
+    snapshot = get_query_stats()
+
+    if output_format == JSON:
+        content = json.dumps(snapshot, indent=2)
+    elif output_format == PROMETHEUS:
+        content = format_prometheus(snapshot)
+    else:
+        raise ValueError("Unsupported output format {}. Expected {} or {}".format(output_format, JSON, PROMETHEUS))
+
+    with open(file_path, 'w') as f:
+        f.write(content)
+
+    logger.info("Query statistics of {} statement fingerprints written to {}".format(len(snapshot), file_path))
+    return len(snapshot)
+
+
+class InstrumentedCursor:
+    """
+    Cursor wrapper recording execute, executemany and callproc calls
+    """
+
+    def __init__(self, cursor, connection):
+        self._cursor = cursor
+        self._connection = connection
+        self._unbuffered = isinstance(cursor, SSCursor)
+        self._last_key = None
+
+    def _record(self, statement, method, *args):
+        connection = self._connection
+        caller = _get_caller()
+        fingerprint = fingerprint_statement(statement)
+        sent = connection.bytes_sent
+        received = connection.bytes_received
+        error = True
+        start = perf_counter()
+        try:
+            result = method(*args)
+            error = False
+            return result
+        finally:
+            duration = perf_counter() - start
+            rows = self._cursor.rowcount
+            if rows is None or rows < 0 or rows >= 2 ** 63:
+                # unknown (e.g. unbuffered cursors); rows are counted while fetching
+                rows = 0
+            self._last_key = (fingerprint, caller)
+            record_statement(fingerprint, caller, duration, rows, connection.bytes_sent - sent,
+                    connection.bytes_received - received, error)
+
+    def execute(self, query, args=None):
+        return self._record(query, self._cursor.execute, query, args)
+
+    def executemany(self, query, args):
+        return self._record(query, self._cursor.executemany, query, args)
+
+    def callproc(self, procname, args=()):
+        return self._record("CALL {}".format(procname), self._cursor.callproc, procname, args)
+
+    def _fetch(self, method, single_row, *args):
+        if not self._unbuffered or self._last_key is None:
+            return method(*args)
+
+        received = self._connection.bytes_received
+        result = method(*args)
+        if single_row:
+            rows = 0 if result is None else 1
+        else:
+            rows = len(result)
+        _record_fetch(self._last_key, rows, self._connection.bytes_received - received)
+        return result
+
+    def fetchone(self):
+        return self._fetch(self._cursor.fetchone, True)
+
+    def fetchmany(self, size=None):
+        return self._fetch(self._cursor.fetchmany, False, size)
+
+    def fetchall(self):
+        return self._fetch(self._cursor.fetchall, False)
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class InstrumentedConnection(pymysql.connections.Connection):
+    """
+    pymysql connection which counts bytes transferred and hands out instrumented cursors
+    while instrumentation is enabled
+    """
+
+    bytes_sent = 0
+    bytes_received = 0
+
+    def _read_bytes(self, num_bytes):
+        data = super()._read_bytes(num_bytes)
+        if _enabled:
+            self.bytes_received += len(data)
+        return data
+
+    def _write_bytes(self, data):
+        if _enabled:
+            self.bytes_sent += len(data)
+        super()._write_bytes(data)
+
+    def cursor(self, cursor=None):
+        new_cursor = super().cursor(cursor)
+        if _enabled:
+            return InstrumentedCursor(new_cursor, self)
+        return new_cursor
+
+
+def create_connection(*args, **kwargs):
+    """
+    Connection creator used by the adapter connection pools
+    :return: InstrumentedConnection
+    """
+    return InstrumentedConnection(*args, **kwargs)
+
+
+# let DBUtils treat the creator like the pymysql module itself
+create_connection.dbapi = pymysql
+create_connection.threadsafety = pymysql.threadsafety
@@ -0,0 +1,156 @@
+import os
+import threading
+
+from db_adapter.logger import logger
+from db_adapter.constants import connection as db_config
+from db_adapter.base.pymysql_base import get_Pool, destroy_Pool
+
+"""
+Registry of connection pools, one pool per CUrW database.
+Pools are created on first use with the connection details read from the db_adapter config file
+and the pool settings configured through configure_pool().
+Pools are not shared across fork(): the registry of a child process starts empty (the pool settings are kept),
+so a forked worker creates its own pool on first use instead of reusing the parent's connections.
+
+e.g.:
+    configure_pool(CURW_FCST, mincached=2, maxcached=8, maxconnections=16)
+    pool = get_registered_pool(CURW_FCST)
+    ...
+    print(get_pool_stats())
+"""
+
+CURW_FCST = 'curw_fcst'
+CURW_OBS = 'curw_obs'
+CURW_SIM = 'curw_sim'
+
+DEFAULT_POOL_SETTINGS = {
+        'mincached'     : 0,
+        'maxcached'     : 0,
+        'maxconnections': 4,
+        'blocking'      : True,
+        'ping'          : 1,
+        'local_infile'  : False
+        }
+
+_pool_settings = {
+        CURW_FCST: dict(DEFAULT_POOL_SETTINGS),
+        CURW_OBS : dict(DEFAULT_POOL_SETTINGS),
+        CURW_SIM : dict(DEFAULT_POOL_SETTINGS)
+        }
+
+_pools = {}
+_registry_lock = threading.Lock()
+
+
+def _reset_after_fork():
+
+    # the inherited pools hold the parent's sockets, hence they are dropped without being closed
+    global _registry_lock
+    _registry_lock = threading.Lock()
+    _pools.clear()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _get_connection_details(database):
+
+    if database == CURW_FCST:
+        return {'host': db_config.CURW_FCST_HOST, 'port': db_config.CURW_FCST_PORT,
+                'user': db_config.CURW_FCST_USERNAME, 'password': db_config.CURW_FCST_PASSWORD,
+                'db': db_config.CURW_FCST_DATABASE}
+    elif database == CURW_OBS:
+        return {'host': db_config.CURW_OBS_HOST, 'port': db_config.CURW_OBS_PORT,
+                'user': db_config.CURW_OBS_USERNAME, 'password': db_config.CURW_OBS_PASSWORD,
+                'db': db_config.CURW_OBS_DATABASE}
+    elif database == CURW_SIM:
+        return {'host': db_config.CURW_SIM_HOST, 'port': db_config.CURW_SIM_PORT,
+                'user': db_config.CURW_SIM_USERNAME, 'password': db_config.CURW_SIM_PASSWORD,
+                'db': db_config.CURW_SIM_DATABASE}
+    else:
+        raise ValueError("Unknown database {}. Expected one of {}, {}, {}".format(database, CURW_FCST, CURW_OBS,
+                CURW_SIM))
+
+
+def configure_pool(database, **settings):
+    """
+    Set pool settings of a database. Settings take effect when the pool is (re)created.
+    :param database: one of CURW_FCST, CURW_OBS, CURW_SIM
+    :param settings: any of 'mincached', 'maxcached', 'maxconnections', 'blocking', 'ping', 'local_infile'
+    (see db_adapter.base.get_Pool)
+    :return: the resulting pool settings of the database
+    """
+
+    _get_connection_details(database)
+
+    unknown_settings = set(settings.keys()) - set(DEFAULT_POOL_SETTINGS.keys())
+    if unknown_settings:
+        raise ValueError("Unknown pool settings: {}".format(', '.join(sorted(unknown_settings))))
+
+    with _registry_lock:
+        _pool_settings[database].update(settings)
+        return dict(_pool_settings[database])
+
+
+def get_registered_pool(database):
+    """
+    Retrieve the pool of a database, creating it on first use
+    :param database: one of CURW_FCST, CURW_OBS, CURW_SIM
+    :return: connection pool
+    """
+
+    with _registry_lock:
+        pool = _pools.get(database)
+        if pool is None:
+            connection_details = _get_connection_details(database)
+            pool = get_Pool(**connection_details, **_pool_settings[database])
+            _pools[database] = pool
+            logger.info("Connection pool for {} created with settings {}".format(database, _pool_settings[database]))
+        return pool
+
+
+def get_pool_stats(database=None):
+    """
+    Retrieve live usage counters of the registered pools
+    :param database: one of CURW_FCST, CURW_OBS, CURW_SIM. If None, counters of all registered pools are returned
+    :return: dict of counters, or dict of database name -> dict of counters if database is None.
+    None if the pool of the given database has not been created yet.
+    """
+
+    with _registry_lock:
+        if database is not None:
+            pool = _pools.get(database)
+            return pool.get_stats() if pool is not None else None
+
+        return {name: pool.get_stats() for name, pool in _pools.items()}
+
+
+def destroy_registered_pool(database):
+    """
+    Close and remove the pool of a database from the registry
+    :param database: one of CURW_FCST, CURW_OBS, CURW_SIM
+    :return: True if a pool was destroyed, else False
+    """
+
+    with _registry_lock:
+        pool = _pools.pop(database, None)
+
+    if pool is None:
+        return False
+
+    destroy_Pool(pool)
+    return True
+
+
+def destroy_registered_pools():
+    """
+    Close and remove all registered pools
+    """
+
+    with _registry_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+
+    for pool in pools:
+        destroy_Pool(pool)
@@ -0,0 +1,107 @@
+import threading
+from time import perf_counter
+
+from DBUtils.PooledDB import PooledDB
+
+
+class InstrumentedPooledDB(PooledDB):
+    """
+    PooledDB which keeps live usage counters of the pool.
+
+    Counters:
+        - checkouts: number of connections handed out by the pool
+        - waits: number of checkouts which had to wait for a free connection (blocking mode)
+        - wait_time: total seconds spent waiting for a free connection (blocking mode)
+        - connections_created: number of new database connections opened by the pool
+        - connections_reset: number of connections reset (rolled back) while being returned to the idle cache
+        - connections_discarded: number of returned connections closed because the idle cache was full
+    """
+
+    def __init__(self, creator, *args, **kwargs):
+        self._stats_lock = threading.Lock()
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._connections_created = 0
+        self._connections_reset = 0
+        self._connections_discarded = 0
+        # wait start of the checkout in progress in the current thread
+        self._checkout = threading.local()
+
+        super().__init__(creator, *args, **kwargs)
+
+        # connections opened to warm up the idle cache (mincached) are not checkouts
+        self._checkouts = 0
+        self._connections_reset = 0
+
+    def steady_connection(self):
+        con = super().steady_connection()
+        with self._stats_lock:
+            self._connections_created += 1
+        return con
+
+    def connection(self, shareable=True):
+        self._checkout.wait_start = None
+        try:
+            con = super().connection(shareable)
+            with self._stats_lock:
+                self._checkouts += 1
+            return con
+        finally:
+            # a checkout waiting through several wakeups counts as a single wait
+            wait_start = self._checkout.wait_start
+            self._checkout.wait_start = None
+            if wait_start is not None:
+                with self._stats_lock:
+                    self._waits += 1
+                    self._wait_time += perf_counter() - wait_start
+
+    def cache(self, con):
+        # the pool lock is reentrant, holding it makes the idle cache size observed around the call consistent
+        with self._lock:
+            idle = len(self._idle_cache)
+            super().cache(con)
+            reset = len(self._idle_cache) > idle
+
+        with self._stats_lock:
+            if reset:
+                self._connections_reset += 1
+            else:
+                self._connections_discarded += 1
+
+    def _wait_lock(self):
+        start = perf_counter()
+        # raises TooManyConnections in non blocking mode, which is not a wait
+        super()._wait_lock()
+        if self._checkout.wait_start is None:
+            self._checkout.wait_start = start
+
+    def get_stats(self):
+        """
+        Snapshot of the pool usage counters
+        :return: dict of counters along with the current pool sizes
+        """
+        with self._stats_lock:
+            stats = {
+                    'checkouts'            : self._checkouts,
+                    'waits'                : self._waits,
+                    'wait_time'            : self._wait_time,
+                    'connections_created'  : self._connections_created,
+                    'connections_reset'    : self._connections_reset,
+                    'connections_discarded': self._connections_discarded
+                    }
+        with self._lock:
+            stats['in_use'] = self._connections
+            stats['idle'] = len(self._idle_cache)
+        stats['max_cached'] = self._maxcached
+        stats['max_connections'] = self._maxconnections
+        return stats
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self._checkouts = 0
+            self._waits = 0
+            self._wait_time = 0.0
+            self._connections_created = 0
+            self._connections_reset = 0
+            self._connections_discarded = 0
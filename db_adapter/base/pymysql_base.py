@@ -2,15 +2,31 @@
 
 import pymysql
 import traceback
-from DBUtils.PooledDB import PooledDB
 
 from db_adapter.logger import logger
+from db_adapter.base.pooled_db import InstrumentedPooledDB
+from db_adapter.base.instrumentation import InstrumentedConnection, create_connection
 
 
-def get_Pool(host, port, user, password, db):
+def get_Pool(host, port, user, password, db, mincached=0, maxcached=0, maxconnections=4, blocking=True, ping=1,
+             local_infile=False):
+    """
+    Create a connection pool
+    :param mincached: initial number of idle connections in the pool (0 means no connections are made at startup)
+    :param maxcached: maximum number of idle connections in the pool (0 means unlimited)
+    :param maxconnections: maximum number of connections generally allowed (0 means unlimited)
+    :param blocking: if True, wait for a free connection when maxconnections is reached, else raise an error
+    :param ping: when connections should be checked with ping()
+    (0 = never, 1 = whenever fetched from the pool, 2 = when a cursor is created, 4 = when a query is executed,
+    7 = always)
+    :param local_infile: if True, enable LOAD DATA LOCAL INFILE on the pooled connections (used by bulk_load inserts)
+    :return: InstrumentedPooledDB; pool usage counters are available through pool.get_stats()
+    """
 
-    pool = PooledDB(creator=pymysql, maxconnections=4, blocking=True,
-            host=host, port=port, user=user, password=password, db=db, autocommit=False, cursorclass=pymysql.cursors.DictCursor)
+    pool = InstrumentedPooledDB(creator=create_connection, mincached=mincached, maxcached=maxcached,
+            maxconnections=maxconnections, blocking=blocking, ping=ping,
+            host=host, port=port, user=user, password=password, db=db, autocommit=False, local_infile=local_infile,
+            cursorclass=pymysql.cursors.DictCursor)
 
     return pool
 
@@ -73,7 +89,68 @@ def execute_write_query(pool, query, params):
             connection.close()
 
 
+def iterate_read_query(pool, query, params, chunk_size=None, dict_rows=False):
+    """
+    Stream the result of a read query through an unbuffered (server side) cursor.
+    Rows are read from the socket as they are consumed, so the full result set is never held in memory.
+    A pooled connection is checked out on the first iteration and is returned to the pool as soon as the
+    rows are exhausted, the generator is closed (e.g. caller breaks out of the loop) or an error occurs.
+    Unread rows of an unfinished result are discarded before the connection is returned to the pool.
+
+    e.g.:
+        for chunk in iterate_read_query(pool, "SELECT `time`, `value` FROM `data` WHERE `id`=%s", (id_,),
+                                        chunk_size=10000):
+            process(chunk)
+
+    :param pool: connection pool
+    :param query: sql query with wild cards
+    :param params: tuple, parameters need to be passed in to the sql query
+    :param chunk_size: int, if specified, lists of at most chunk_size rows are yielded, else rows are yielded one by one
+    :param dict_rows: boolean, if True rows are yielded as dicts, else as tuples. Default is False.
+    :return: generator of rows or row chunks
+    """
+
+    cursor_class = pymysql.cursors.SSDictCursor if dict_rows else pymysql.cursors.SSCursor
+
+    connection = pool.connection()
+    cursor = None
+
+    try:
+        cursor = connection.cursor(cursor_class)
+        cursor.execute(query, params)
+        if chunk_size:
+            rows = cursor.fetchmany(chunk_size)
+            while rows:
+                yield rows
+                rows = cursor.fetchmany(chunk_size)
+        else:
+            row = cursor.fetchone()
+            while row is not None:
+                yield row
+                row = cursor.fetchone()
+    except GeneratorExit:
+        raise
+    except Exception as exception:
+        error_message = "Streaming sql query {} with params {} failed".format(query, params)
+        logger.error(error_message)
+        traceback.print_exc()
+        raise exception
+    finally:
+        try:
+            if cursor is not None:
+                cursor.close()
+        finally:
+            if connection is not None:
+                connection.close()
+
+
 # for bulk data retrieval
-def get_connection_for_iterable_cursor(host, port, user, password, db):
-    return pymysql.connect(host=host, user=user, password=password, db=db, port=port,
-                           cursorclass=pymysql.cursors.DictCursor)
+def get_connection_for_iterable_cursor(host, port, user, password, db, cursorclass=pymysql.cursors.DictCursor):
+    """
+    Open a dedicated (non pooled) connection
+    :param cursorclass: default cursor class of the connection.
+    Use pymysql.cursors.SSCursor or pymysql.cursors.SSDictCursor for unbuffered iteration over large results.
+    :return: pymysql connection
+    """
+    return InstrumentedConnection(host=host, user=user, password=password, db=db, port=port,
+                                  cursorclass=cursorclass)
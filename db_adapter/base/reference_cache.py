@@ -0,0 +1,236 @@
+import os
+import threading
+import traceback
+import weakref
+
+from db_adapter.logger import logger
+from db_adapter.base.session import Session
+from db_adapter.base.pool_registry import CURW_OBS
+
+"""
+Opt-in in-memory cache of the reference data (station, source, variable and unit tables) of curw_fcst and curw_obs.
+
+When enabled, the four tables of a database are loaded with one connection on the first lookup through a pool, and
+indexed by id and by natural key (station: id range of the station type, latitude and longitude; source: model and
+version (curw_fcst) or source (curw_obs); variable: variable; unit: unit and type).
+get_station_id, get_source_id, get_variable_id, get_unit_id and the get_*_by_id helpers of both databases then
+resolve from the cache. A key missing from the cache falls back to the database query.
+
+The cache of a pool is invalidated by the add_* / delete_* helpers of the same package, and can be invalidated
+explicitly (e.g. after the reference tables were changed by another process). Lookups through a Session bypass the
+cache and query through the session connection, so that they see the uncommitted changes of the session. An
+invalidation through a Session is repeated when the session ends, as the cache may have been reloaded from the pool
+before its changes were committed.
+
+e.g.:
+    enable_reference_cache()
+    station_id = get_station_id(pool, latitude, longitude, StationEnum.WRF)
+    ...
+    invalidate_reference_cache(pool)
+"""
+
+STATION = 'station'
+SOURCE = 'source'
+VARIABLE = 'variable'
+UNIT = 'unit'
+
+REFERENCE_TABLES = [STATION, SOURCE, VARIABLE, UNIT]
+
+_enabled = False
+_caches = weakref.WeakKeyDictionary()
+_cache_lock = threading.Lock()
+# incremented on every invalidation, so that tables loaded concurrently with an invalidation are not cached
+_generation = 0
+
+
+def _reset_after_fork():
+
+    global _cache_lock
+    _cache_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def enable_reference_cache():
+    global _enabled
+    _enabled = True
+
+
+def disable_reference_cache():
+    global _enabled
+    _enabled = False
+    invalidate_reference_cache()
+
+
+def is_reference_cache_enabled():
+    return _enabled
+
+
+def get_reference_cache_generation():
+    """
+    Counter incremented on every invalidation, for caches derived from the reference data
+    (e.g. db_adapter.spatial station indexes)
+    :return: int
+    """
+    return _generation
+
+
+def station_type_prefix(value):
+    """
+    Leading digits shared by the ids of a station type (the digits matched by the `id` LIKE patterns),
+    e.g. '11' for 1100000 (WRF) and 1100123
+    :param value: station id or StationEnum value
+    :return: str
+    """
+    value = str(value)
+    return value[:len(value) - 5]
+
+
+def station_key(latitude, longitude, station_type, type_string=None):
+    """
+    Natural key of a station in the cache
+    :param latitude:
+    :param longitude:
+    :param station_type: StationEnum of the database
+    :param type_string: value of the `station_type` column (curw_obs only)
+    :return: tuple, or None if latitude / longitude are not numeric
+    """
+    try:
+        latitude, longitude = float(latitude), float(longitude)
+    except (TypeError, ValueError):
+        return None
+    if type_string is not None:
+        return station_type_prefix(station_type.value), type_string, latitude, longitude
+    return station_type_prefix(station_type.value), latitude, longitude
+
+
+def _station_row_key(database, row):
+    if database == CURW_OBS:
+        return (station_type_prefix(row.get('id')), row.get('station_type'), float(row.get('latitude')),
+                float(row.get('longitude')))
+    return station_type_prefix(row.get('id')), float(row.get('latitude')), float(row.get('longitude'))
+
+
+def _source_row_key(database, row):
+    if database == CURW_OBS:
+        return row.get('source')
+    return row.get('model'), row.get('version')
+
+
+_ROW_KEYS = {
+        STATION : _station_row_key,
+        SOURCE  : _source_row_key,
+        VARIABLE: lambda database, row: row.get('variable'),
+        UNIT    : lambda database, row: (row.get('unit'), row.get('type'))
+        }
+
+
+def _get_pool(pool):
+    while isinstance(pool, Session):
+        pool = pool.pool
+    return pool
+
+
+def _load(pool, database):
+
+    tables = {}
+
+    connection = pool.connection()
+    try:
+        with connection.cursor() as cursor:
+            for table in REFERENCE_TABLES:
+                cursor.execute("SELECT * FROM `{}`;".format(table))
+                by_id = {}
+                by_key = {}
+                for row in cursor.fetchall():
+                    by_id[row.get('id')] = row
+                    by_key.setdefault(_ROW_KEYS[table](database, row), row.get('id'))
+                tables[table] = (by_id, by_key)
+        logger.info("Loaded reference data of {}:: {}".format(database, ', '.join(
+                ["{} {}s".format(len(tables[table][0]), table) for table in REFERENCE_TABLES])))
+        return tables
+    except Exception as exception:
+        error_message = "Loading reference data of {} failed.".format(database)
+        logger.error(error_message)
+        traceback.print_exc()
+        raise exception
+    finally:
+        if connection is not None:
+            connection.close()
+
+
+def _get_tables(pool, database):
+
+    with _cache_lock:
+        tables = _caches.get(pool, {}).get(database)
+        generation = _generation
+    if tables is not None:
+        return tables
+
+    # loaded outside the lock, a concurrent first lookup may load the tables twice
+    tables = _load(pool, database)
+    with _cache_lock:
+        if generation == _generation:
+            _caches.setdefault(pool, {})[database] = tables
+    return tables
+
+
+def get_cached_id(pool, database, table, key):
+    """
+    Resolve the id of a reference data row by its natural key
+    :param pool: database connection pool (or Session)
+    :param database: CURW_FCST or CURW_OBS
+    :param table: STATION, SOURCE, VARIABLE or UNIT
+    :param key: natural key (see station_key for stations)
+    :return: id, or None if the cache is disabled, pool is a Session or the key is not cached
+    """
+
+    if not _enabled or isinstance(pool, Session):
+        return None
+    return _get_tables(pool, database)[table][1].get(key)
+
+
+def get_cached_row(pool, database, table, id_):
+    """
+    Retrieve a reference data row by id
+    :param pool: database connection pool (or Session)
+    :param database: CURW_FCST or CURW_OBS
+    :param table: STATION, SOURCE, VARIABLE or UNIT
+    :param id_: row id
+    :return: copy of the row dict, or None if the cache is disabled, pool is a Session or the id is not cached
+    """
+
+    if not _enabled or isinstance(pool, Session):
+        return None
+    row = _get_tables(pool, database)[table][0].get(id_)
+    return dict(row) if row is not None else None
+
+
+def invalidate_reference_cache(pool=None, database=None):
+    """
+    Drop cached reference data, to be reloaded on the next lookup
+    :param pool: database connection pool (or Session). None to invalidate the cache of every pool
+    :param database: CURW_FCST or CURW_OBS. None to invalidate every database of the pool(s)
+    :return:
+    """
+
+    global _generation
+
+    if isinstance(pool, Session):
+        pool.on_end(lambda: invalidate_reference_cache(_get_pool(pool), database))
+
+    with _cache_lock:
+        _generation += 1
+        if pool is None:
+            pools = list(_caches.keys())
+        else:
+            pool = _get_pool(pool)
+            pools = [pool] if pool in _caches else []
+
+        for pool_ in pools:
+            if database is None:
+                del _caches[pool_]
+            else:
+                _caches[pool_].pop(database, None)
@@ -0,0 +1,153 @@
+import struct
+import zlib
+
+import numpy as np
+import pandas as pd
+
+"""
+Compact binary encoding of one timeseries (e.g. one forecast of a curw_fcst timeseries id).
+
+Layout (little endian):
+    header: magic b'CWTS', version (uint8), flags (uint8), count (uint32), start (int64, epoch seconds),
+            step (int32, seconds)
+    body (zlib compressed): offsets (int32 seconds from start, only if irregular), values (float32 or float64)
+
+Regularly spaced timeseries are stored as start + step, irregular ones with explicit offsets.
+Missing values (None / NaN) are stored as NaN.
+"""
+
+MAGIC = b'CWTS'
+VERSION = 1
+
+FLAG_FLOAT32 = 0x01
+FLAG_IRREGULAR = 0x02
+
+HEADER = struct.Struct('<4sBBIqi')
+
+VALUE_TYPES = {'float32': np.dtype('<f4'), 'float64': np.dtype('<f8')}
+OFFSET_TYPE = np.dtype('<i4')
+
+COMPRESSION_LEVEL = 6
+
+
+def normalize_series(times, values=None):
+    """
+    Convert a timeseries into sorted, duplicate free (by time, the last value wins) NumPy arrays
+    :param times: times (datetime64 array, datetimes or datetime strings), or a list of [time, value] lists
+    if values is None
+    :param values: values, in the order of times. None values become NaN
+    :return: (times, values) tuple of NumPy arrays (times as datetime64[s], values as float64)
+    """
+
+    if values is None:
+        # list of [time, value] lists
+        if len(times) > 0:
+            times, values = zip(*[(t[0], t[1]) for t in times])
+        else:
+            times, values = (), ()
+
+    if isinstance(times, (pd.Index, pd.Series)) or np.asarray(times).dtype.kind != 'M':
+        times = pd.to_datetime(list(times) if isinstance(times, tuple) else times)
+    times = np.asarray(times, dtype='datetime64[s]')
+
+    values = np.array([np.nan if value is None else value for value in values], dtype=np.float64) \
+        if not isinstance(values, np.ndarray) else values.astype(np.float64)
+
+    if len(times) != len(values):
+        raise ValueError("Length mismatch between times ({}) and values ({})".format(len(times), len(values)))
+
+    # sort by time, keeping the last value of duplicated times
+    order = np.argsort(times, kind='mergesort')
+    times, values = times[order], values[order]
+    if len(times) > 1:
+        keep = np.append(times[1:] != times[:-1], True)
+        times, values = times[keep], values[keep]
+
+    return times, values
+
+
+def encode_series(times, values=None, value_type='float64'):
+    """
+    Encode a timeseries into a compressed binary payload
+    :param times: times (datetime64 array, datetimes or datetime strings), or a list of [time, value] lists
+    if values is None
+    :param values: values, in the order of times
+    :param value_type: 'float32' or 'float64'
+    :return: bytes
+    """
+
+    times, values = normalize_series(times, values)
+    times = times.astype(np.int64)
+
+    if value_type not in VALUE_TYPES:
+        raise ValueError("Unsupported value type {}".format(value_type))
+
+    flags = FLAG_FLOAT32 if value_type == 'float32' else 0
+    start = int(times[0]) if len(times) > 0 else 0
+    step = 0
+    offsets = times - start
+
+    if len(times) > 1:
+        steps = np.diff(times)
+        if np.all(steps == steps[0]) and steps[0] <= np.iinfo(OFFSET_TYPE).max:
+            step = int(steps[0])
+        else:
+            if offsets[-1] > np.iinfo(OFFSET_TYPE).max:
+                raise ValueError("Timeseries spans more than {} seconds".format(np.iinfo(OFFSET_TYPE).max))
+            flags |= FLAG_IRREGULAR
+
+    body = b''
+    if flags & FLAG_IRREGULAR:
+        body += offsets.astype(OFFSET_TYPE).tobytes()
+    body += values.astype(VALUE_TYPES[value_type]).tobytes()
+
+    return HEADER.pack(MAGIC, VERSION, flags, len(times), start, step) + zlib.compress(body, COMPRESSION_LEVEL)
+
+
+def decode_series(payload):
+    """
+    Decode a payload created by encode_series
+    :param payload: bytes
+    :return: (times, values) tuple of NumPy arrays (times as datetime64[s], values as float64)
+    """
+
+    magic, version, flags, count, start, step = HEADER.unpack_from(payload)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Not a version {} timeseries payload".format(VERSION))
+
+    body = zlib.decompress(payload[HEADER.size:])
+
+    if flags & FLAG_IRREGULAR:
+        offsets = np.frombuffer(body, dtype=OFFSET_TYPE, count=count).astype(np.int64)
+        body = body[count * OFFSET_TYPE.itemsize:]
+    else:
+        offsets = np.arange(count, dtype=np.int64) * step
+
+    value_type = VALUE_TYPES['float32'] if flags & FLAG_FLOAT32 else VALUE_TYPES['float64']
+    values = np.frombuffer(body, dtype=value_type, count=count).astype(np.float64)
+
+    return (offsets + start).astype('datetime64[s]'), values
+
+
+def series_to_rows(times, values, start=None, end=None):
+    """
+    Convert a decoded timeseries into (time, value) rows, as fetched from a row per value table
+    :param times: datetime64 array
+    :param values: float64 array. NaN values are returned as None
+    :param start: time range start (inclusive)
+    :param end: time range end (inclusive)
+    :return: list of (datetime, value) tuples
+    """
+
+    if start is not None or end is not None:
+        mask = np.ones(len(times), dtype=bool)
+        if start is not None:
+            mask &= times >= np.datetime64(pd.Timestamp(start).to_pydatetime(), 's')
+        if end is not None:
+            mask &= times <= np.datetime64(pd.Timestamp(end).to_pydatetime(), 's')
+        times, values = times[mask], values[mask]
+
+    value_list = values.tolist()
+    for i in np.flatnonzero(np.isnan(values)).tolist():
+        value_list[i] = None
+    return list(zip(times.tolist(), value_list))
@@ -0,0 +1,165 @@
+import traceback
+
+from db_adapter.logger import logger
+from db_adapter.exceptions import DatabaseAdapterError
+
+"""
+Session (unit of work) sharing a single pooled connection and a single transaction among several adapter calls.
+
+A Session exposes the same connection() method as a connection pool, so it can be passed to any
+Timeseries class, station, source, variable or unit helper in place of the pool. Inside the session
+commits issued by the helpers are deferred and connections are not returned to the pool;
+the whole unit of work is committed once when the session ends, or rolled back if any step failed
+(in which case ending the session raises DatabaseAdapterError).
+
+e.g.:
+    with Session(pool) as session:
+        ts = Timeseries(pool=session)
+        ts.insert_run(run_meta)
+        ts.insert_data(timeseries, tms_id, fgt, upsert=True)
+        ts.update_start_date(tms_id, fgt)
+        ts.update_latest_fgt(tms_id, fgt)
+"""
+
+
+class Session:
+
+    def __init__(self, pool):
+        """
+        :param pool: database connection pool (or an enclosing Session, in which case this session joins
+        the transaction of the enclosing one)
+        """
+        self.pool = pool
+        self._connection = None
+        self._rollback_only = False
+        self._end_callbacks = []
+
+    def connection(self, shareable=True):
+        """
+        Connection of the session. Has the same interface as a pooled connection, except that commit() and close()
+        are deferred to the end of the session and rollback() marks the whole session for rollback.
+        :return: session bound connection
+        """
+        return SessionConnection(self)
+
+    def _get_connection(self):
+        if self._connection is None:
+            self._connection = self.pool.connection()
+        return self._connection
+
+    def _mark_rollback_only(self):
+        self._rollback_only = True
+
+    @property
+    def rollback_only(self):
+        return self._rollback_only
+
+    def on_end(self, callback):
+        """
+        Register a function to be called once the transaction of the session ends (committed, rolled back or
+        discarded on close). Sessions joining an enclosing session register on the enclosing one.
+        :param callback: function without arguments
+        """
+
+        if isinstance(self.pool, Session):
+            self.pool.on_end(callback)
+        else:
+            self._end_callbacks.append(callback)
+
+    def _end_transaction(self):
+        callbacks, self._end_callbacks = self._end_callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def commit(self):
+        """
+        Commit the work done so far in the session
+        :return: True if committed. If the session was marked for rollback (an operation of the session failed),
+        the work is rolled back and DatabaseAdapterError is raised
+        """
+
+        if self._rollback_only:
+            error_message = "Session marked for rollback due to a failed operation. Rolled back the session."
+            logger.error(error_message)
+            self.rollback()
+            raise DatabaseAdapterError(error_message, None)
+
+        if self._connection is None:
+            self._end_transaction()
+            return True
+
+        try:
+            self._connection.commit()
+        except Exception as exception:
+            self.rollback()
+            error_message = "Committing session failed."
+            logger.error(error_message)
+            traceback.print_exc()
+            raise exception
+
+        self._end_transaction()
+        return True
+
+    def rollback(self):
+        """
+        Discard the work done so far in the session
+        """
+
+        self._rollback_only = False
+
+        try:
+            if self._connection is not None:
+                self._connection.rollback()
+        finally:
+            self._end_transaction()
+
+    def close(self):
+        """
+        Return the session connection to the pool. Uncommitted work is rolled back by the pool.
+        """
+
+        try:
+            if self._connection is not None:
+                self._connection.close()
+        finally:
+            self._connection = None
+            self._end_transaction()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        try:
+            if exc_type is None:
+                self.commit()
+            else:
+                self.rollback()
+        finally:
+            self.close()
+        return False
+
+
+class SessionConnection:
+    """
+    Connection handed out by a Session
+    """
+
+    def __init__(self, session):
+        self._session = session
+
+    def cursor(self, *args, **kwargs):
+        return self._session._get_connection().cursor(*args, **kwargs)
+
+    def commit(self):
+        # deferred to the end of the session
+        pass
+
+    def rollback(self):
+        self._session._mark_rollback_only()
+
+    def close(self):
+        # connection is kept until the end of the session
+        pass
+
+    def __getattr__(self, name):
+        return getattr(self._session._get_connection(), name)
@@ -0,0 +1,44 @@
+from enum import Enum
+
+import numpy as np
+import pandas as pd
+
+
+class TimeseriesFormat(Enum):
+    """
+    Return formats of timeseries read from the database
+
+        - LIST: list of [time, value] lists
+        - NUMPY: tuple of two NumPy arrays (times as datetime64[s], values as float64)
+        - SERIES: pandas Series of values indexed by time
+    """
+    LIST = 'list'
+    NUMPY = 'numpy'
+    SERIES = 'series'
+
+
+def format_timeseries(rows, output_format=TimeseriesFormat.LIST):
+    """
+    Convert (time, value) rows fetched with a tuple cursor into the requested format
+    :param rows: sequence of (time, value) tuples
+    :param output_format: TimeseriesFormat
+    :return: timeseries in the requested format
+    """
+
+    if output_format is TimeseriesFormat.LIST:
+        return [list(row) for row in rows]
+
+    if len(rows) > 0:
+        times, values = zip(*rows)
+    else:
+        times, values = (), ()
+
+    times = np.array(times, dtype='datetime64[s]')
+    values = np.array(values, dtype=np.float64)
+
+    if output_format is TimeseriesFormat.NUMPY:
+        return times, values
+    elif output_format is TimeseriesFormat.SERIES:
+        return pd.Series(values, index=pd.DatetimeIndex(times, name='time'), name='value')
+    else:
+        raise ValueError("Unsupported timeseries format {}".format(output_format))
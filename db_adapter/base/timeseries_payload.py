@@ -0,0 +1,119 @@
+from itertools import repeat
+
+import numpy as np
+import pandas as pd
+
+from db_adapter.logger import logger
+from db_adapter.base.bulk_load import SerializedRows, _format_field
+
+
+def _to_columns(timeseries):
+
+    if isinstance(timeseries, pd.Series):
+        return timeseries.index, timeseries.to_numpy()
+
+    if isinstance(timeseries, pd.DataFrame):
+        times = timeseries['time'] if 'time' in timeseries.columns else timeseries.index
+        values = timeseries['value'] if 'value' in timeseries.columns else \
+            timeseries.drop(columns=['time'], errors='ignore').iloc[:, 0]
+        return times, values.to_numpy()
+
+    return timeseries
+
+
+def _to_datetime64(times):
+
+    if isinstance(times, (pd.Index, pd.Series)) or np.asarray(times).dtype.kind != 'M':
+        times = pd.to_datetime(times)
+    return np.asarray(times, dtype='datetime64[s]')
+
+
+def _to_times(times):
+    return _to_datetime64(times).tolist()
+
+
+def _to_values(values):
+
+    values = np.asarray(values, dtype=np.float64)
+    value_list = values.tolist()
+    for i in np.flatnonzero(np.isnan(values)).tolist():
+        value_list[i] = None
+    return value_list
+
+
+def is_columnar_timeseries(timeseries):
+    """
+    Check whether a timeseries is given in columnar form, i.e. a pandas Series/DataFrame
+    or a (times, values) pair of NumPy arrays
+    :param timeseries:
+    :return: True if columnar, False if a list of [time, value] lists
+    """
+
+    if isinstance(timeseries, (pd.Series, pd.DataFrame)):
+        return True
+    return isinstance(timeseries, tuple) and len(timeseries) == 2 and \
+        all([isinstance(column, (np.ndarray, pd.Index, pd.Series)) for column in timeseries])
+
+
+def build_data_rows(timeseries, tms_id, fgt=None):
+    """
+    Build the rows for a data table insert, without modifying the given timeseries
+    :param timeseries: one of,
+        - list of [time, value] lists
+        - (times, values) tuple of NumPy arrays (times as datetime64 or datetime strings)
+        - pandas Series of values indexed by time
+        - pandas DataFrame with a 'time' column (or a time index) and a 'value' column
+    NaN values of columnar timeseries are inserted as NULL
+    :param tms_id: hash value
+    :param fgt: forecast generated time. If specified, rows are (tms_id, time, fgt, value), else (tms_id, time, value)
+    :return: list of row tuples
+    """
+
+    if is_columnar_timeseries(timeseries):
+        times, values = _to_columns(timeseries)
+        times = _to_times(times)
+        values = _to_values(values)
+
+        if len(times) != len(values):
+            raise ValueError("Length mismatch between times ({}) and values ({})".format(len(times), len(values)))
+
+        if fgt is None:
+            return list(zip(repeat(tms_id), times, values))
+        return list(zip(repeat(tms_id), times, repeat(fgt), values))
+
+    rows = []
+    for t in timeseries:
+        if len(t) > 1:
+            rows.append((tms_id, t[0], t[1]) if fgt is None else (tms_id, t[0], fgt, t[1]))
+        else:
+            logger.warning('Invalid timeseries data:: %s', t)
+    return rows
+
+
+def serialize_data_rows(timeseries, tms_id, fgt=None):
+    """
+    Serialize a columnar timeseries straight into LOAD DATA LOCAL INFILE rows (see db_adapter.base.bulk_load),
+    formatting whole columns with NumPy instead of building row tuples and formatting them field by field
+    :param timeseries: (times, values) tuple of NumPy arrays, pandas Series or pandas DataFrame
+    (see build_data_rows)
+    :param tms_id: hash value
+    :param fgt: forecast generated time. If specified, rows are (tms_id, time, fgt, value), else (tms_id, time, value)
+    :return: SerializedRows, to be passed to load_data_local_infile
+    """
+
+    times, values = _to_columns(timeseries)
+    times = _to_datetime64(times)
+    values = np.asarray(values, dtype=np.float64)
+
+    if len(times) != len(values):
+        raise ValueError("Length mismatch between times ({}) and values ({})".format(len(times), len(values)))
+
+    time_strings = np.char.replace(np.datetime_as_string(times, unit='s'), 'T', ' ').tolist()
+    value_strings = values.astype(str).astype(object)
+    value_strings[np.isnan(values)] = '\\N'
+
+    head = _format_field(tms_id) + '\t'
+    middle = '\t' if fgt is None else '\t' + _format_field(fgt) + '\t'
+    payload = ''.join([head + time + middle + value + '\n' for time, value in zip(time_strings,
+            value_strings.tolist())])
+    return SerializedRows(len(time_strings), payload.encode('utf-8'))
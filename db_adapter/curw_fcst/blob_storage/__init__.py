@@ -0,0 +1,2 @@
+from .blob_storage_utils import DATA_BLOB_TABLE, DataStorage, create_data_blob_table, read_series, write_series, \
+    migrate_to_blob_storage
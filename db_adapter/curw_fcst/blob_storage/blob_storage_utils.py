@@ -0,0 +1,266 @@
+import traceback
+from datetime import datetime
+from enum import Enum
+
+import numpy as np
+import pymysql
+from pymysql import IntegrityError
+
+from db_adapter.logger import logger
+from db_adapter.constants import COMMON_DATE_TIME_FORMAT
+from db_adapter.base.series_codec import encode_series, decode_series, normalize_series
+
+"""
+Compressed blob storage of curw_fcst forecasts.
+
+In the data_blob table each (id, fgt) forecast is a single row holding the whole timeseries as a compressed, typed
+binary payload (see db_adapter.base.series_codec), instead of one data table row per value.
+Timeseries created with storage=DataStorage.BLOB read and write this table through the same API as the row per value
+layout. Existing data is copied over with migrate_to_blob_storage.
+
+e.g.:
+    create_data_blob_table(pool)
+    report = migrate_to_blob_storage(pool, value_type='float32')
+    ts = Timeseries(pool=pool, storage=DataStorage.BLOB)
+"""
+
+DATA_BLOB_TABLE = 'data_blob'
+
+# maximum number of (id, fgt) series per statement
+SERIES_CHUNK_SIZE = 500
+# number of rows fetched at a time while migrating
+MIGRATION_FETCH_SIZE = 10000
+
+
+class DataStorage(Enum):
+    ROWS = 'rows'
+    BLOB = 'blob'
+
+    @staticmethod
+    def getType(name):
+        _nameToType = {
+                'rows': DataStorage.ROWS,
+                'blob': DataStorage.BLOB
+                }
+
+        return _nameToType.get(name, DataStorage.ROWS)
+
+
+def create_data_blob_table(pool):
+    """
+    Create the data_blob table, if it does not exist
+    :param pool: curw_fcst database connection pool
+    :return:
+    """
+
+    sql_statement = "CREATE TABLE IF NOT EXISTS `{}` (" \
+                    "`id` VARCHAR(64) NOT NULL, " \
+                    "`fgt` DATETIME NOT NULL, " \
+                    "`start_time` DATETIME NULL, " \
+                    "`end_time` DATETIME NULL, " \
+                    "`row_count` INT UNSIGNED NOT NULL DEFAULT 0, " \
+                    "`payload` MEDIUMBLOB NOT NULL, " \
+                    "PRIMARY KEY (`id`, `fgt`)" \
+                    ") ENGINE=InnoDB;".format(DATA_BLOB_TABLE)
+
+    connection = pool.connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(sql_statement)
+        connection.commit()
+    except Exception as exception:
+        connection.rollback()
+        error_message = "Creating {} table failed.".format(DATA_BLOB_TABLE)
+        logger.error(error_message)
+        traceback.print_exc()
+        raise exception
+    finally:
+        if connection is not None:
+            connection.close()
+
+
+def _to_datetime(value):
+    return datetime.strptime(value, COMMON_DATE_TIME_FORMAT) if type(value) is str else value
+
+
+def read_series(cursor, id_fgt_pairs):
+    """
+    Read and decode the series of many (id, fgt) pairs
+    :param cursor: cursor of the connection to read through
+    :param id_fgt_pairs: list of (id, fgt) pairs
+    :return: dict of (id, fgt) -> (times, values) tuple of NumPy arrays, for the stored pairs
+    """
+
+    series = {}
+    for i in range(0, len(id_fgt_pairs), SERIES_CHUNK_SIZE):
+        pair_chunk = id_fgt_pairs[i: i + SERIES_CHUNK_SIZE]
+        sql_statement = "SELECT `id`, `fgt`, `payload` FROM `{}` WHERE (`id`, `fgt`) IN ({});"\
+            .format(DATA_BLOB_TABLE, ', '.join(['(%s, %s)'] * len(pair_chunk)))
+        cursor.execute(sql_statement, [value for pair in pair_chunk for value in pair])
+        for result in cursor.fetchall():
+            series[(result.get('id'), result.get('fgt'))] = decode_series(result.get('payload'))
+    return series
+
+
+def write_series(cursor, rows, upsert=False, value_type='float64'):
+    """
+    Write data rows into the data_blob table, merging them into the already stored series of the same (id, fgt)
+    :param cursor: cursor of the connection to write through
+    :param rows: list of (id, time, fgt, value) rows
+    :param boolean upsert: If True, given values replace stored values of the same time,
+    else such duplicates raise IntegrityError (as with the row per value layout)
+    :param value_type: 'float32' or 'float64'
+    :return: number of values written
+    """
+
+    groups = {}
+    for id_, time, fgt, value in rows:
+        groups.setdefault((id_, _to_datetime(fgt)), []).append([time, value])
+
+    keys = list(groups.keys())
+    row_count = 0
+
+    for i in range(0, len(keys), SERIES_CHUNK_SIZE):
+        key_chunk = keys[i: i + SERIES_CHUNK_SIZE]
+
+        sql_statement = "SELECT `id`, `fgt`, `payload` FROM `{}` WHERE (`id`, `fgt`) IN ({}) FOR UPDATE;"\
+            .format(DATA_BLOB_TABLE, ', '.join(['(%s, %s)'] * len(key_chunk)))
+        cursor.execute(sql_statement, [value for key in key_chunk for value in key])
+        stored = {(result.get('id'), result.get('fgt')): result.get('payload') for result in cursor.fetchall()}
+
+        values = []
+        for key in key_chunk:
+            new_times, new_values = normalize_series(groups[key])
+            times, series_values = new_times, new_values
+
+            payload = stored.get(key)
+            if payload is not None:
+                stored_times, stored_values = decode_series(payload)
+                duplicates = np.isin(stored_times, new_times)
+                if not upsert and np.any(duplicates):
+                    raise IntegrityError(1062, "Duplicate entry '{}-{}-{}' for key 'PRIMARY'".format(key[0],
+                            stored_times[duplicates][0], key[1]))
+                times = np.concatenate([stored_times[~duplicates], new_times])
+                series_values = np.concatenate([stored_values[~duplicates], new_values])
+
+            payload = encode_series(times, series_values, value_type=value_type)
+            times = np.sort(times)
+            values.append((key[0], key[1], times[0].tolist() if len(times) > 0 else None,
+                           times[-1].tolist() if len(times) > 0 else None, len(times), payload))
+            row_count += len(groups[key])
+
+        sql_statement = "INSERT INTO `{}` (`id`, `fgt`, `start_time`, `end_time`, `row_count`, `payload`) " \
+                        "VALUES {} ON DUPLICATE KEY UPDATE `start_time`=VALUES(`start_time`), " \
+                        "`end_time`=VALUES(`end_time`), `row_count`=VALUES(`row_count`), " \
+                        "`payload`=VALUES(`payload`);"\
+            .format(DATA_BLOB_TABLE, ', '.join(['(%s, %s, %s, %s, %s, %s)'] * len(values)))
+        cursor.execute(sql_statement, [value for row in values for value in row])
+
+    return row_count
+
+
+def _get_table_size(cursor, table):
+
+    cursor.execute("ANALYZE TABLE `{}`;".format(table))
+    cursor.fetchall()
+    sql_statement = "SELECT `DATA_LENGTH` + `INDEX_LENGTH` AS `size`, `TABLE_ROWS` AS `estimated_rows` " \
+                    "FROM `information_schema`.`TABLES` WHERE `TABLE_SCHEMA`=DATABASE() AND `TABLE_NAME`=%s;"
+    cursor.execute(sql_statement, table)
+    result = cursor.fetchone()
+    if result is None:
+        return 0, 0
+    return int(result.get('size') or 0), int(result.get('estimated_rows') or 0)
+
+
+def _get_fgt_batches(cursor, id_):
+
+    # groups the fgts of an id into batches of at most MIGRATION_FETCH_SIZE rows (or a single larger fgt)
+    cursor.execute("SELECT `fgt`, COUNT(*) AS `row_count` FROM `data` WHERE `id`=%s GROUP BY `fgt` ORDER BY `fgt`;",
+                   id_)
+    batches = []
+    batch = []
+    batch_rows = 0
+    for result in cursor.fetchall():
+        if len(batch) > 0 and batch_rows + result.get('row_count') > MIGRATION_FETCH_SIZE:
+            batches.append(batch)
+            batch = []
+            batch_rows = 0
+        batch.append(result.get('fgt'))
+        batch_rows += result.get('row_count')
+    if len(batch) > 0:
+        batches.append(batch)
+    return batches
+
+
+def migrate_to_blob_storage(pool, ids=None, value_type='float64', delete_rows=False):
+    """
+    Copy the data table rows of the given timeseries ids into the data_blob table, one transaction per id,
+    and report the size reduction
+    :param pool: curw_fcst database connection pool
+    :param ids: list of timeseries ids. None to migrate every run
+    :param value_type: 'float32' or 'float64'
+    :param boolean delete_rows: If True, delete the migrated rows from the data table
+    :return: dict with keys
+        'ids', 'series', 'rows': number of migrated ids, (id, fgt) series and data rows
+        'row_bytes': estimated size of the migrated rows in the data table (data and indexes, from the average row
+        size of the data table before the migration)
+        'payload_bytes': size of the written payloads
+        'size_ratio': payload_bytes / row_bytes
+        'data_table_bytes', 'blob_table_bytes': table sizes (data and indexes) after the migration
+    """
+
+    report = {'ids': 0, 'series': 0, 'rows': 0, 'payload_bytes': 0}
+
+    connection = pool.connection()
+    try:
+        with connection.cursor() as cursor:
+            data_table_bytes, data_table_rows = _get_table_size(cursor, 'data')
+            if ids is None:
+                cursor.execute("SELECT `id` FROM `run`;")
+                ids = [result.get('id') for result in cursor.fetchall()]
+
+        for count, id_ in enumerate(ids, start=1):
+            row_count = 0
+            fgts = set()
+            with connection.cursor() as cursor:
+                # rows are read on the held connection (buffered), a batch of whole fgts at a time
+                for fgt_batch in _get_fgt_batches(cursor, id_):
+                    with connection.cursor(pymysql.cursors.Cursor) as read_cursor:
+                        sql_statement = "SELECT `id`, `time`, `fgt`, `value` FROM `data` WHERE `id`=%s " \
+                                        "AND `fgt` IN ({}) ORDER BY `fgt`, `time`;"\
+                            .format(', '.join(['%s'] * len(fgt_batch)))
+                        read_cursor.execute(sql_statement, [id_] + fgt_batch)
+                        rows = read_cursor.fetchall()
+                    row_count += write_series(cursor, rows, upsert=True, value_type=value_type)
+                    fgts.update(fgt_batch)
+                if delete_rows:
+                    cursor.execute("DELETE FROM `data` WHERE `id`=%s;", id_)
+                cursor.execute("SELECT SUM(LENGTH(`payload`)) AS `payload_bytes` FROM `{}` WHERE `id`=%s;"
+                               .format(DATA_BLOB_TABLE), id_)
+                payload_bytes = cursor.fetchone().get('payload_bytes')
+            connection.commit()
+
+            report['ids'] += 1
+            report['series'] += len(fgts)
+            report['rows'] += row_count
+            report['payload_bytes'] += int(payload_bytes or 0)
+            logger.info("Migrated {} rows ({} fgts) of id {} to {} ({}/{})".format(row_count, len(fgts), id_,
+                    DATA_BLOB_TABLE, count, len(ids)))
+
+        report['row_bytes'] = int(report['rows'] * data_table_bytes / data_table_rows) if data_table_rows > 0 else 0
+        report['size_ratio'] = report['payload_bytes'] / report['row_bytes'] if report['row_bytes'] > 0 else None
+        with connection.cursor() as cursor:
+            report['data_table_bytes'], _ = _get_table_size(cursor, 'data')
+            report['blob_table_bytes'], _ = _get_table_size(cursor, DATA_BLOB_TABLE)
+
+        logger.info("Migration to {} completed:: {}".format(DATA_BLOB_TABLE, report))
+        return report
+    except Exception as exception:
+        connection.rollback()
+        error_message = "Migrating data rows to {} table failed.".format(DATA_BLOB_TABLE)
+        logger.error(error_message)
+        traceback.print_exc()
+        raise exception
+    finally:
+        if connection is not None:
+            connection.close()
@@ -1,6 +1,7 @@
 import traceback
 
 from db_adapter.logger import logger
+from db_adapter.curw_fcst.fgt_index import FGT_INDEX_TABLE
 
 
 def get_curw_fcst_hash_ids(pool, sim_tag=None, source_id=None, variable_id=None, unit_id=None, station_id=None,
@@ -49,7 +50,7 @@ def get_curw_fcst_hash_ids(pool, sim_tag=None, source_id=None, variable_id=None,
 
     sql_statement = pre_sql_statement + conditions + ";"
 
-    print(sql_statement)
+    logger.debug(sql_statement)
 
     ids = []
     connection = pool.connection()
@@ -71,15 +72,37 @@ def get_curw_fcst_hash_ids(pool, sim_tag=None, source_id=None, variable_id=None,
             connection.close()
 
 
-def get_distinct_fgts_for_given_id(pool, id_):
-
-    sql_statement = "select distinct `fgt` from data where id=%s ;"
+def get_distinct_fgts_for_given_id(pool, id_, fgt_start=None, fgt_end=None, use_fgt_index=False):
+    """
+    Retrieve the distinct fgts of a hash id, in ascending order
+    :param pool: database connection pool
+    :param id_: hash id
+    :param fgt_start: fgt range start (inclusive)
+    :param fgt_end: fgt range end (inclusive)
+    :param use_fgt_index: If True, read the fgts from the fgt_index table instead of scanning the data table
+    :return: list of fgts
+    """
+
+    if use_fgt_index:
+        sql_statement = "select `fgt` from `{}` where id=%s".format(FGT_INDEX_TABLE)
+    else:
+        sql_statement = "select distinct `fgt` from data where id=%s"
+    variable_list = [id_]
+
+    if fgt_start is not None:
+        sql_statement += " and `fgt`>=%s"
+        variable_list.append(fgt_start)
+    if fgt_end is not None:
+        sql_statement += " and `fgt`<=%s"
+        variable_list.append(fgt_end)
+
+    sql_statement += " order by `fgt` ;"
 
     fgts = []
     connection = pool.connection()
     try:
         with connection.cursor() as cursor:
-            row_count = cursor.execute(sql_statement, id_)
+            row_count = cursor.execute(sql_statement, variable_list)
             if row_count > 0:
                 results = cursor.fetchall()
                 for result in results:
@@ -0,0 +1,2 @@
+from .fgt_index_utils import FGT_INDEX_TABLE, create_fgt_index_table, backfill_fgt_index, \
+    prepare_fgt_index_update, apply_fgt_index_update, remove_from_fgt_index, get_expired_row_counts
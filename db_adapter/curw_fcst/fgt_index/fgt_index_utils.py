@@ -0,0 +1,242 @@
+import traceback
+from datetime import datetime
+
+from db_adapter.logger import logger
+from db_adapter.constants import COMMON_DATE_TIME_FORMAT
+
+"""
+Maintained (id, fgt) index of the curw_fcst data table.
+
+The fgt_index table keeps one row per (id, fgt) with the number of data rows and their time range, so that fgt
+listing, nearest fgt resolution and retention planning read a few hundred index rows instead of scanning every data
+row of a timeseries id.
+
+The index is kept up to date by curw_fcst Timeseries created with fgt_index=True (inserts and deletes),
+and by purge_curw_fcst / drop_expired_partitions when called with fgt_index=True.
+Existing data is indexed once with backfill_fgt_index.
+
+e.g.:
+    create_fgt_index_table(pool)
+    backfill_fgt_index(pool)
+    ts = Timeseries(pool=pool, fgt_index=True)
+"""
+
+FGT_INDEX_TABLE = 'fgt_index'
+
+# maximum number of (id, fgt) groups per statement
+GROUP_CHUNK_SIZE = 1000
+
+
+def create_fgt_index_table(pool):
+    """
+    Create the fgt_index table, if it does not exist
+    :param pool: curw_fcst database connection pool
+    :return:
+    """
+
+    sql_statement = "CREATE TABLE IF NOT EXISTS `{}` (" \
+                    "`id` VARCHAR(64) NOT NULL, " \
+                    "`fgt` DATETIME NOT NULL, " \
+                    "`row_count` INT UNSIGNED NOT NULL DEFAULT 0, " \
+                    "`min_time` DATETIME NULL, " \
+                    "`max_time` DATETIME NULL, " \
+                    "PRIMARY KEY (`id`, `fgt`), " \
+                    "KEY `fgt_index_fgt` (`fgt`)" \
+                    ") ENGINE=InnoDB;".format(FGT_INDEX_TABLE)
+
+    connection = pool.connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(sql_statement)
+        connection.commit()
+    except Exception as exception:
+        connection.rollback()
+        error_message = "Creating {} table failed.".format(FGT_INDEX_TABLE)
+        logger.error(error_message)
+        traceback.print_exc()
+        raise exception
+    finally:
+        if connection is not None:
+            connection.close()
+
+
+def backfill_fgt_index(pool, ids=None):
+    """
+    (Re)build the fgt index entries of the given timeseries ids from the data table, one transaction per id
+    :param pool: curw_fcst database connection pool
+    :param ids: list of timeseries ids. None to index every run
+    :return: number of index rows written
+    """
+
+    connection = pool.connection()
+    try:
+        if ids is None:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT `id` FROM `run`;")
+                ids = [result.get('id') for result in cursor.fetchall()]
+
+        index_row_count = 0
+        for count, id_ in enumerate(ids, start=1):
+            with connection.cursor() as cursor:
+                cursor.execute("DELETE FROM `{}` WHERE `id`=%s;".format(FGT_INDEX_TABLE), id_)
+                sql_statement = "INSERT INTO `{}` (`id`, `fgt`, `row_count`, `min_time`, `max_time`) " \
+                                "SELECT `id`, `fgt`, COUNT(*), MIN(`time`), MAX(`time`) FROM `data` " \
+                                "WHERE `id`=%s GROUP BY `id`, `fgt`;".format(FGT_INDEX_TABLE)
+                index_row_count += cursor.execute(sql_statement, id_)
+            connection.commit()
+            logger.info("Backfilled fgt index of id {} ({}/{})".format(id_, count, len(ids)))
+
+        return index_row_count
+    except Exception as exception:
+        connection.rollback()
+        error_message = "Backfilling {} table failed.".format(FGT_INDEX_TABLE)
+        logger.error(error_message)
+        traceback.print_exc()
+        raise exception
+    finally:
+        if connection is not None:
+            connection.close()
+
+
+def _to_datetime(value):
+    return datetime.strptime(value, COMMON_DATE_TIME_FORMAT) if type(value) is str else value
+
+
+def _group_rows(rows):
+
+    groups = {}
+    for id_, time, fgt, _ in rows:
+        time = _to_datetime(time)
+        key = (id_, _to_datetime(fgt))
+        group = groups.get(key)
+        if group is None:
+            groups[key] = [1, time, time]
+        else:
+            group[0] += 1
+            if time < group[1]:
+                group[1] = time
+            if time > group[2]:
+                group[2] = time
+    return groups
+
+
+def _count_rows(cursor, groups):
+
+    # counts data rows of each group within the overall time range of the groups,
+    # an index range scan on the data table's primary key
+    keys = list(groups.keys())
+    min_time = min([group[1] for group in groups.values()])
+    max_time = max([group[2] for group in groups.values()])
+
+    row_counts = {}
+    for i in range(0, len(keys), GROUP_CHUNK_SIZE):
+        key_chunk = keys[i: i + GROUP_CHUNK_SIZE]
+        sql_statement = "SELECT `id`, `fgt`, COUNT(*) AS `row_count` FROM `data` WHERE (`id`, `fgt`) IN ({}) " \
+                        "AND `time` BETWEEN %s AND %s GROUP BY `id`, `fgt`;"\
+            .format(', '.join(['(%s, %s)'] * len(key_chunk)))
+        cursor.execute(sql_statement, [value for key in key_chunk for value in key] + [min_time, max_time])
+        for result in cursor.fetchall():
+            row_counts[(result.get('id'), result.get('fgt'))] = result.get('row_count')
+    return row_counts
+
+
+def prepare_fgt_index_update(cursor, rows, exact=False):
+    """
+    Prepare the fgt index update of data rows about to be inserted. Call before inserting the rows,
+    and apply_fgt_index_update after, within the same transaction.
+    :param cursor: cursor of the connection inserting the rows
+    :param rows: list of (id, time, fgt, value) rows
+    :param exact: If True, count the existing rows of the affected groups first, so that rows upserted or
+    ignored (rather than inserted) are not counted. Required for upserts.
+    :return: fgt index update, to be passed to apply_fgt_index_update
+    """
+
+    groups = _group_rows(rows)
+    existing_row_counts = _count_rows(cursor, groups) if exact and len(groups) > 0 else None
+    return groups, existing_row_counts
+
+
+def apply_fgt_index_update(cursor, fgt_index_update):
+    """
+    Add inserted data rows to the fgt index
+    :param cursor: cursor of the connection which inserted the rows
+    :param fgt_index_update: value returned by prepare_fgt_index_update
+    :return: affected row count
+    """
+
+    groups, existing_row_counts = fgt_index_update
+    if len(groups) == 0:
+        return 0
+
+    if existing_row_counts is None:
+        row_counts = {key: group[0] for key, group in groups.items()}
+    else:
+        current_row_counts = _count_rows(cursor, groups)
+        row_counts = {key: current_row_counts.get(key, 0) - existing_row_counts.get(key, 0) for key in groups}
+
+    values = [(key[0], key[1], row_counts[key], group[1], group[2]) for key, group in groups.items()]
+
+    row_count = 0
+    for i in range(0, len(values), GROUP_CHUNK_SIZE):
+        value_chunk = values[i: i + GROUP_CHUNK_SIZE]
+        sql_statement = "INSERT INTO `{0}` (`id`, `fgt`, `row_count`, `min_time`, `max_time`) VALUES {1} " \
+                        "ON DUPLICATE KEY UPDATE `row_count`=`row_count`+VALUES(`row_count`), " \
+                        "`min_time`=LEAST(COALESCE(`min_time`, VALUES(`min_time`)), VALUES(`min_time`)), " \
+                        "`max_time`=GREATEST(COALESCE(`max_time`, VALUES(`max_time`)), VALUES(`max_time`));"\
+            .format(FGT_INDEX_TABLE, ', '.join(['(%s, %s, %s, %s, %s)'] * len(value_chunk)))
+        row_count += cursor.execute(sql_statement, [value for row in value_chunk for value in row])
+    return row_count
+
+
+def remove_from_fgt_index(cursor, id_, fgt=None, before=None):
+    """
+    Remove the index entries of deleted data
+    :param cursor: cursor of the connection which deleted the data
+    :param id_: timeseries id
+    :param fgt: remove the entry of this fgt only
+    :param before: remove the entries of fgts earlier than this
+    :return: affected row count
+    """
+
+    sql_statement = "DELETE FROM `{}` WHERE `id`=%s".format(FGT_INDEX_TABLE)
+    params = [id_]
+    if fgt is not None:
+        sql_statement += " AND `fgt`=%s"
+        params.append(fgt)
+    if before is not None:
+        sql_statement += " AND `fgt` < %s"
+        params.append(before)
+
+    return cursor.execute(sql_statement + ";", params)
+
+
+def get_expired_row_counts(pool, ids, before):
+    """
+    Retrieve the number of data rows with fgts earlier than the given date, per timeseries id, from the fgt index
+    :param pool: curw_fcst database connection pool
+    :param ids: list of timeseries ids
+    :param before: datetime
+    :return: dict of id -> row count, for the ids having such rows
+    """
+
+    row_counts = {}
+    connection = pool.connection()
+    try:
+        with connection.cursor() as cursor:
+            for i in range(0, len(ids), GROUP_CHUNK_SIZE):
+                id_chunk = ids[i: i + GROUP_CHUNK_SIZE]
+                sql_statement = "SELECT `id`, SUM(`row_count`) AS `row_count` FROM `{}` " \
+                                "WHERE `id` IN ({}) AND `fgt` < %s GROUP BY `id`;"\
+                    .format(FGT_INDEX_TABLE, ', '.join(['%s'] * len(id_chunk)))
+                cursor.execute(sql_statement, list(id_chunk) + [before])
+                for result in cursor.fetchall():
+                    row_counts[result.get('id')] = int(result.get('row_count'))
+        return row_counts
+    except Exception as exception:
+        error_message = "Retrieving expired row counts from {} table failed.".format(FGT_INDEX_TABLE)
+        logger.error(error_message)
+        traceback.print_exc()
+        raise exception
+    finally:
+        if connection is not None:
+            connection.close()
@@ -0,0 +1 @@
+from .ingestion_utils import ingest_parallel
@@ -0,0 +1,111 @@
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from time import monotonic
+
+from db_adapter.logger import logger
+from db_adapter.base.pymysql_base import get_Pool
+from db_adapter.base.pool_registry import CURW_FCST, get_registered_pool
+from db_adapter.hash_utils import generate_timeseries_id, CURW_FCST_HASH_KEYS
+from db_adapter.curw_fcst.timeseries import Timeseries
+
+"""
+Parallel ingestion of curw_fcst timeseries with a pool of worker processes.
+
+The stations of a batch (e.g. a whole WRF run) are grouped by timeseries (hash) id and split into sub batches
+of contiguous hash ids, so that no two workers ever write the same run row. Sub batches are inserted with
+Timeseries.insert_run_batch by N worker processes, each creating its own connection pool when it starts
+(connection pools must not be shared across fork()). Per station outcomes are aggregated in the parent process.
+
+e.g.:
+    outcomes = ingest_parallel(runs, fgt, workers=4,
+                               connection={'host': HOST, 'port': PORT, 'user': USER, 'password': PASSWORD,
+                                           'db': 'curw_fcst'})
+"""
+
+DEFAULT_BATCH_SIZE = 500
+
+_worker_pool = None
+
+
+def _init_worker(connection, pool_settings):
+
+    global _worker_pool
+
+    if connection is None:
+        _worker_pool = get_registered_pool(CURW_FCST)
+    else:
+        _worker_pool = get_Pool(**connection, **(pool_settings or {}))
+
+
+def _ingest_batch(runs, fgt, upsert, chunk_size, bulk_load):
+    return Timeseries(pool=_worker_pool).insert_run_batch(runs, fgt, upsert=upsert, chunk_size=chunk_size,
+            bulk_load=bulk_load)
+
+
+def _shard(runs, batch_size):
+
+    runs_by_id = {}
+    for key, (meta_data, timeseries) in runs.items():
+        missing_keys = [hash_key for hash_key in CURW_FCST_HASH_KEYS if hash_key not in meta_data]
+        # invalid meta data is reported by insert_run_batch
+        tms_id = generate_timeseries_id(meta_data, CURW_FCST_HASH_KEYS) if len(missing_keys) == 0 else ''
+        runs_by_id.setdefault(tms_id, {})[key] = (meta_data, timeseries)
+
+    batches = []
+    batch = {}
+    for tms_id in sorted(runs_by_id.keys()):
+        if len(batch) > 0 and len(batch) + len(runs_by_id[tms_id]) > batch_size:
+            batches.append(batch)
+            batch = {}
+        batch.update(runs_by_id[tms_id])
+    if len(batch) > 0:
+        batches.append(batch)
+    return batches
+
+
+def ingest_parallel(runs, fgt, workers=4, connection=None, pool_settings=None, upsert=False, chunk_size=10000,
+                    bulk_load=False, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Insert the timeseries of many stations for one fgt with a pool of worker processes
+    :param runs: dict of key (e.g. station name) -> (meta_data, timeseries) tuples (see Timeseries.insert_run_batch)
+    :param fgt: forecast generated time
+    :param workers: number of worker processes
+    :param connection: dict with 'host', 'port', 'user', 'password' and 'db' keys. If None, workers use the
+    registered curw_fcst pool (see db_adapter.base.pool_registry)
+    :param pool_settings: settings of the worker pools (see db_adapter.base.get_Pool), used with connection
+    :param boolean upsert: If True, upsert existing values ON DUPLICATE KEY. Default is False.
+    :param chunk_size: maximum number of data rows inserted per statement
+    :param boolean bulk_load: If True, load data rows with LOAD DATA LOCAL INFILE
+    :param batch_size: maximum number of stations per sub batch (one transaction each)
+    :return: dict of key -> outcome dict with 'tms_id', 'new_run', 'row_count' and 'error' keys.
+    Stations of a failed sub batch are reported with the error of the sub batch.
+    """
+
+    batches = _shard(runs, batch_size)
+    outcomes = {}
+    start_time = monotonic()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(connection, pool_settings)) as executor:
+        futures = {executor.submit(_ingest_batch, batch, fgt, upsert, chunk_size, bulk_load): batch
+                   for batch in batches}
+
+        for future in as_completed(futures):
+            batch = futures[future]
+            try:
+                outcomes.update(future.result())
+            except Exception as exception:
+                error_message = "Ingestion of a sub batch of {} timeseries for fgt {} failed.".format(len(batch), fgt)
+                logger.error(error_message)
+                traceback.print_exception(type(exception), exception, exception.__traceback__)
+                for key in batch:
+                    outcomes[key] = {'tms_id': None, 'new_run': False, 'row_count': 0, 'error': str(exception)}
+
+    elapsed = monotonic() - start_time
+    row_count = sum([outcome['row_count'] for outcome in outcomes.values() if outcome['error'] is None])
+    error_count = len([outcome for outcome in outcomes.values() if outcome['error'] is not None])
+    logger.info("Ingested {} rows of {} timeseries for fgt {} in {} sub batches with {} workers, {:.2f} s "
+                "({:.1f} rows/sec), {} errors".format(row_count, len(outcomes), fgt, len(batches), workers, elapsed,
+            row_count / elapsed if elapsed > 0 else 0, error_count))
+
+    return outcomes
@@ -0,0 +1,2 @@
+from .partition_utils import PartitionInterval, get_partitions, partition_data_table, create_future_partitions, \
+    drop_expired_partitions
@@ -0,0 +1,296 @@
+import traceback
+from datetime import datetime, timedelta
+from enum import Enum
+
+from db_adapter.logger import logger
+from db_adapter.constants import COMMON_DATE_TIME_FORMAT
+from db_adapter.curw_fcst.fgt_index import FGT_INDEX_TABLE
+
+"""
+Partition management of the curw_fcst data table.
+
+The data table is RANGE COLUMNS partitioned on `fgt`, one partition per month or week, plus a catch-all
+`p_future` partition (VALUES LESS THAN MAXVALUE). Future partitions are split off p_future ahead of time and
+expired forecasts are removed by dropping (or exchanging out) whole partitions, which is a metadata operation
+instead of a row by row DELETE.
+
+Each operation builds a plan: a list of dicts with the 'statement' (DDL), a 'description' and the
+'estimated_rows' affected (from information_schema statistics). With dry_run=True the plan is only returned,
+else it is executed in order.
+
+Note: partitioned InnoDB tables can not have foreign keys, hence the conversion plan drops the foreign keys
+of the data table. Data rows of deleted runs are deleted explicitly by Timeseries.delete_all_by_hash_id.
+
+e.g.:
+    for operation in partition_data_table(pool, PartitionInterval.MONTHLY, dry_run=True):
+        print(operation['statement'], operation['estimated_rows'])
+
+    create_future_partitions(pool, PartitionInterval.MONTHLY, future_partitions=3)
+    drop_expired_partitions(pool, before=datetime.now() - timedelta(days=365))
+"""
+
+DATA_TABLE = 'data'
+FUTURE_PARTITION = 'p_future'
+
+
+class PartitionInterval(Enum):
+    MONTHLY = 'monthly'
+    WEEKLY = 'weekly'
+
+    @staticmethod
+    def getType(name):
+        _nameToType = {
+                'monthly': PartitionInterval.MONTHLY,
+                'weekly' : PartitionInterval.WEEKLY
+                }
+
+        return _nameToType.get(name, PartitionInterval.MONTHLY)
+
+
+def _interval_start(date_time, interval):
+
+    date_time = date_time.replace(hour=0, minute=0, second=0, microsecond=0)
+    if interval is PartitionInterval.WEEKLY:
+        return date_time - timedelta(days=date_time.weekday())
+    return date_time.replace(day=1)
+
+
+def _next_interval_start(date_time, interval):
+
+    if interval is PartitionInterval.WEEKLY:
+        return date_time + timedelta(days=7)
+    if date_time.month == 12:
+        return date_time.replace(year=date_time.year + 1, month=1)
+    return date_time.replace(month=date_time.month + 1)
+
+
+def _partition_name(interval_start):
+    return interval_start.strftime('p%Y%m%d')
+
+
+def _partition_definition(interval_start, interval):
+    return "PARTITION `{}` VALUES LESS THAN ('{}')".format(_partition_name(interval_start),
+            _next_interval_start(interval_start, interval).strftime(COMMON_DATE_TIME_FORMAT))
+
+
+def _future_partition_definition():
+    return "PARTITION `{}` VALUES LESS THAN (MAXVALUE)".format(FUTURE_PARTITION)
+
+
+def _operation(statement, description, estimated_rows=0):
+    return {'statement': statement, 'description': description, 'estimated_rows': estimated_rows}
+
+
+def _execute_plan(pool, plan, dry_run):
+
+    if dry_run:
+        for operation in plan:
+            logger.info("[dry run] {} (~{} rows):: {}".format(operation['description'], operation['estimated_rows'],
+                    operation['statement']))
+        return plan
+
+    connection = pool.connection()
+    try:
+        with connection.cursor() as cursor:
+            for operation in plan:
+                logger.info("{} (~{} rows):: {}".format(operation['description'], operation['estimated_rows'],
+                        operation['statement']))
+                cursor.execute(operation['statement'])
+        connection.commit()
+        return plan
+    except Exception as exception:
+        connection.rollback()
+        error_message = "Executing partition maintenance plan failed."
+        logger.error(error_message)
+        traceback.print_exc()
+        raise exception
+    finally:
+        if connection is not None:
+            connection.close()
+
+
+def _query(pool, sql_statement, params=None):
+
+    connection = pool.connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(sql_statement, params)
+            return cursor.fetchall()
+    except Exception as exception:
+        error_message = "Retrieving partition information failed."
+        logger.error(error_message)
+        traceback.print_exc()
+        raise exception
+    finally:
+        if connection is not None:
+            connection.close()
+
+
+def get_partitions(pool, table=DATA_TABLE):
+    """
+    Retrieve the partitions of a table
+    :param pool: curw_fcst database connection pool
+    :param table: table name
+    :return: list of dicts with 'name', 'upper_bound' (datetime, None for MAXVALUE) and 'estimated_rows' keys,
+    in partition order. Empty list if the table is not partitioned.
+    """
+
+    sql_statement = "SELECT `PARTITION_NAME` AS `name`, `PARTITION_DESCRIPTION` AS `description`, " \
+                    "`TABLE_ROWS` AS `estimated_rows` FROM `information_schema`.`PARTITIONS` " \
+                    "WHERE `TABLE_SCHEMA`=DATABASE() AND `TABLE_NAME`=%s AND `PARTITION_NAME` IS NOT NULL " \
+                    "ORDER BY `PARTITION_ORDINAL_POSITION`;"
+
+    partitions = []
+    for result in _query(pool, sql_statement, table):
+        description = result.get('description')
+        upper_bound = None
+        if description is not None and description != 'MAXVALUE':
+            upper_bound = datetime.strptime(description.strip("'")[:19], COMMON_DATE_TIME_FORMAT)
+        partitions.append({'name': result.get('name'), 'upper_bound': upper_bound,
+                           'estimated_rows': result.get('estimated_rows') or 0})
+    return partitions
+
+
+def _get_foreign_keys(pool, table):
+
+    sql_statement = "SELECT DISTINCT `CONSTRAINT_NAME` AS `name` FROM `information_schema`.`KEY_COLUMN_USAGE` " \
+                    "WHERE `TABLE_SCHEMA`=DATABASE() AND `TABLE_NAME`=%s AND `REFERENCED_TABLE_NAME` IS NOT NULL;"
+    return [result.get('name') for result in _query(pool, sql_statement, table)]
+
+
+def _get_estimated_table_rows(pool, table):
+
+    sql_statement = "SELECT `TABLE_ROWS` AS `estimated_rows` FROM `information_schema`.`TABLES` " \
+                    "WHERE `TABLE_SCHEMA`=DATABASE() AND `TABLE_NAME`=%s;"
+    results = _query(pool, sql_statement, table)
+    return (results[0].get('estimated_rows') or 0) if len(results) > 0 else 0
+
+
+def partition_data_table(pool, interval=PartitionInterval.MONTHLY, future_partitions=3, dry_run=False):
+    """
+    Convert the (non partitioned) data table to RANGE COLUMNS(fgt) partitions, covering the existing fgts,
+    future_partitions intervals ahead of now, and a p_future partition for everything later.
+    The conversion rebuilds the whole table.
+    :param pool: curw_fcst database connection pool
+    :param interval: PartitionInterval
+    :param future_partitions: number of partitions to create after the current interval
+    :param dry_run: If True, only return the plan
+    :return: plan (list of operation dicts)
+    """
+
+    if len(get_partitions(pool)) > 0:
+        logger.info("Data table is already partitioned.")
+        return []
+
+    plan = []
+    for foreign_key in _get_foreign_keys(pool, DATA_TABLE):
+        plan.append(_operation("ALTER TABLE `{}` DROP FOREIGN KEY `{}`;".format(DATA_TABLE, foreign_key),
+                "Drop foreign key {} (not supported on partitioned tables)".format(foreign_key)))
+
+    results = _query(pool, "SELECT MIN(`fgt`) AS `min_fgt` FROM `{}`;".format(DATA_TABLE))
+    min_fgt = results[0].get('min_fgt') if len(results) > 0 else None
+
+    current = _interval_start(datetime.now(), interval)
+    interval_start = _interval_start(min_fgt, interval) if min_fgt is not None else current
+
+    end = current
+    for i in range(future_partitions + 1):
+        end = _next_interval_start(end, interval)
+
+    definitions = []
+    while interval_start < end:
+        definitions.append(_partition_definition(interval_start, interval))
+        interval_start = _next_interval_start(interval_start, interval)
+    definitions.append(_future_partition_definition())
+
+    plan.append(_operation("ALTER TABLE `{}` PARTITION BY RANGE COLUMNS(`fgt`) ({});".format(DATA_TABLE,
+            ', '.join(definitions)), "Partition data table into {} {} partitions"
+            .format(len(definitions), interval.value), _get_estimated_table_rows(pool, DATA_TABLE)))
+
+    return _execute_plan(pool, plan, dry_run)
+
+
+def create_future_partitions(pool, interval=PartitionInterval.MONTHLY, future_partitions=3, dry_run=False):
+    """
+    Pre-create the partitions up to future_partitions intervals ahead of now, by splitting them off p_future
+    :param pool: curw_fcst database connection pool
+    :param interval: PartitionInterval
+    :param future_partitions: number of partitions to have after the current interval
+    :param dry_run: If True, only return the plan
+    :return: plan (list of operation dicts)
+    """
+
+    partitions = get_partitions(pool)
+    if len(partitions) == 0 or partitions[-1]['name'] != FUTURE_PARTITION:
+        raise ValueError("Data table is not partitioned with a {} partition. "
+                         "Use partition_data_table first.".format(FUTURE_PARTITION))
+
+    bounded_partitions = [partition for partition in partitions if partition['upper_bound'] is not None]
+    if len(bounded_partitions) > 0:
+        interval_start = _interval_start(bounded_partitions[-1]['upper_bound'], interval)
+        if interval_start < bounded_partitions[-1]['upper_bound']:
+            interval_start = _next_interval_start(interval_start, interval)
+    else:
+        interval_start = _interval_start(datetime.now(), interval)
+
+    end = _interval_start(datetime.now(), interval)
+    for i in range(future_partitions + 1):
+        end = _next_interval_start(end, interval)
+
+    definitions = []
+    while interval_start < end:
+        definitions.append(_partition_definition(interval_start, interval))
+        interval_start = _next_interval_start(interval_start, interval)
+
+    plan = []
+    if len(definitions) > 0:
+        definitions.append(_future_partition_definition())
+        plan.append(_operation("ALTER TABLE `{}` REORGANIZE PARTITION `{}` INTO ({});".format(DATA_TABLE,
+                FUTURE_PARTITION, ', '.join(definitions)), "Split {} future partitions off {}"
+                .format(len(definitions) - 1, FUTURE_PARTITION), partitions[-1]['estimated_rows']))
+
+    return _execute_plan(pool, plan, dry_run)
+
+
+def drop_expired_partitions(pool, before, exchange=False, dry_run=False, fgt_index=False):
+    """
+    Remove the partitions holding only fgts earlier than the given date
+    :param pool: curw_fcst database connection pool
+    :param before: datetime or str (COMMON_DATE_TIME_FORMAT); partitions with an upper bound at or before it are removed
+    :param exchange: If True, exchange each expired partition out into its own table (data_<partition name>),
+    keeping the rows outside the data table, before dropping the (then empty) partition
+    :param dry_run: If True, only return the plan
+    :param fgt_index: If True, also remove the fgt_index entries of the removed partitions
+    :return: plan (list of operation dicts)
+    """
+
+    if type(before) is str:
+        before = datetime.strptime(before, COMMON_DATE_TIME_FORMAT)
+
+    expired_partitions = [partition for partition in get_partitions(pool)
+                          if partition['upper_bound'] is not None and partition['upper_bound'] <= before]
+
+    plan = []
+    for partition in expired_partitions:
+        if exchange:
+            archive_table = "{}_{}".format(DATA_TABLE, partition['name'])
+            plan.append(_operation("CREATE TABLE `{}` LIKE `{}`;".format(archive_table, DATA_TABLE),
+                    "Create archive table {}".format(archive_table)))
+            plan.append(_operation("ALTER TABLE `{}` REMOVE PARTITIONING;".format(archive_table),
+                    "Remove partitioning of archive table {}".format(archive_table)))
+            plan.append(_operation("ALTER TABLE `{}` EXCHANGE PARTITION `{}` WITH TABLE `{}`;".format(DATA_TABLE,
+                    partition['name'], archive_table), "Exchange partition {} out into {}"
+                    .format(partition['name'], archive_table), partition['estimated_rows']))
+            plan.append(_operation("ALTER TABLE `{}` DROP PARTITION `{}`;".format(DATA_TABLE, partition['name']),
+                    "Drop emptied partition {}".format(partition['name'])))
+        else:
+            plan.append(_operation("ALTER TABLE `{}` DROP PARTITION `{}`;".format(DATA_TABLE, partition['name']),
+                    "Drop partition {} (fgt < {})".format(partition['name'], partition['upper_bound']),
+                    partition['estimated_rows']))
+
+    if fgt_index and len(expired_partitions) > 0:
+        upper_bound = expired_partitions[-1]['upper_bound'].strftime(COMMON_DATE_TIME_FORMAT)
+        plan.append(_operation("DELETE FROM `{}` WHERE `fgt` < '{}';".format(FGT_INDEX_TABLE, upper_bound),
+                "Remove fgt index entries of fgts earlier than {}".format(upper_bound)))
+
+    return _execute_plan(pool, plan, dry_run)
@@ -3,6 +3,8 @@ import traceback
 
 from db_adapter.exceptions import DatabaseAdapterError
 from db_adapter.logger import logger
+from db_adapter.base.pool_registry import CURW_FCST
+from db_adapter.base.reference_cache import SOURCE, get_cached_id, get_cached_row, invalidate_reference_cache
 """
 Source JSON Object would looks like this 
 e.g.:
@@ -32,6 +34,10 @@ def get_source_by_id(pool, id_):
     :return: Source if source exists in the database, else None
     """
 
+    row = get_cached_row(pool, CURW_FCST, SOURCE, id_)
+    if row is not None:
+        return row
+
     connection = pool.connection()
     try:
 
@@ -61,6 +67,10 @@ def get_source_id(pool, model, version) -> str:
     :return: str: source id if source exists in the database, else None
     """
 
+    cached_id = get_cached_id(pool, CURW_FCST, SOURCE, (model, version))
+    if cached_id is not None:
+        return cached_id
+
     connection = pool.connection()
     try:
 
@@ -98,6 +108,7 @@ def add_source(pool, model, version, parameters=None):
                 sql_statement = "INSERT INTO `source` (`model`, `version`, `parameters`) VALUES ( %s, %s, %s)"
                 row_count = cursor.execute(sql_statement, (model, version, json.dumps(parameters)))
                 connection.commit()
+                invalidate_reference_cache(pool, CURW_FCST)
                 return True if row_count > 0 else False
         else:
             logger.info("Source with model={} and version={} already exists in the database".format(model, version))
@@ -159,6 +170,7 @@ def delete_source(pool, model, version):
             sql_statement = "DELETE FROM `source` WHERE `model`=%s and `version`=%s"
             row_count = cursor.execute(sql_statement, (model, version))
             connection.commit()
+            invalidate_reference_cache(pool, CURW_FCST)
             if row_count > 0:
                 return True
             else:
@@ -190,6 +202,7 @@ def delete_source_by_id(pool, id_):
             sql_statement = "DELETE FROM `source` WHERE `id`=%s"
             row_count = cursor.execute(sql_statement, id_)
             connection.commit()
+            invalidate_reference_cache(pool, CURW_FCST)
             if row_count > 0 :
                 return True
             else:
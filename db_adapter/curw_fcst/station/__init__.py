@@ -1,4 +1,5 @@
 from .station_utils import get_station_id, get_station_by_id, add_station, delete_station_by_id, delete_station,\
-    add_stations, \
-    add_wrf_stations, get_wrf_stations, get_flo2d_output_stations, get_hechms_stations, get_mike_stations
+    add_stations, add_stations_bulk, add_wrf_stations, get_wrf_stations, get_flo2d_output_stations, get_hechms_stations, \
+    get_mike_stations
 from .station_enum import StationEnum
+from .station_catalog import StationCatalog
@@ -0,0 +1,161 @@
+import os
+import traceback
+
+import numpy as np
+
+from db_adapter.curw_fcst.station.station_enum import StationEnum
+from db_adapter.logger import logger
+from db_adapter.spatial import StationIndex
+
+"""
+Catalog of the curw_fcst stations of a StationEnum type held in parallel NumPy arrays
+(id int32, latitude / longitude float64 and name), with O(1) id -> row and name -> row maps.
+
+Catalogs are loaded with a single id range query, and can be saved to / loaded from a local .npz snapshot so
+that warm starts skip the database.
+
+e.g.:
+    catalog = StationCatalog.load_cached(pool, StationEnum.WRF, 'wrf_stations.npz')
+    rows = catalog.rows_of_ids(station_ids)
+    latitudes, longitudes = catalog.latitudes[rows], catalog.longitudes[rows]
+"""
+
+
+class StationCatalog:
+
+    def __init__(self, station_type, ids, latitudes, longitudes, names):
+        """
+        :param station_type: StationEnum of the stations
+        :param ids: station ids
+        :param latitudes: station latitudes, in the order of ids
+        :param longitudes: station longitudes, in the order of ids
+        :param names: station names, in the order of ids
+        """
+        self.station_type = station_type
+        self.ids = np.asarray(ids, dtype=np.int32)
+        self.latitudes = np.asarray(latitudes, dtype=np.float64)
+        self.longitudes = np.asarray(longitudes, dtype=np.float64)
+        self.names = np.asarray(names, dtype=str)
+        self._row_by_id = {id_: row for row, id_ in enumerate(self.ids.tolist())}
+        self._row_by_name = {name: row for row, name in enumerate(self.names.tolist())}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, id_):
+        return id_ in self._row_by_id
+
+    @classmethod
+    def load(cls, pool, station_type):
+        """
+        Load the stations of a type from the database
+        :param pool: database connection pool
+        :param station_type: StationEnum: which defines the station type
+        :return: StationCatalog
+        """
+
+        initial_value = station_type.value
+        range_ = StationEnum.getRange(station_type)
+
+        connection = pool.connection()
+        try:
+            with connection.cursor() as cursor:
+                sql_statement = "SELECT `id`, `name`, `latitude`, `longitude` FROM `station` " \
+                                "WHERE `id` BETWEEN %s and %s ORDER BY `id`"
+                cursor.execute(sql_statement, (initial_value, initial_value + range_ - 1))
+                results = cursor.fetchall()
+            return cls(station_type, [result.get('id') for result in results],
+                       [result.get('latitude') for result in results],
+                       [result.get('longitude') for result in results],
+                       [result.get('name') for result in results])
+        except Exception as exception:
+            error_message = "Loading station catalog of station_type {} failed.".format(station_type)
+            logger.error(error_message)
+            traceback.print_exc()
+            raise exception
+        finally:
+            if connection is not None:
+                connection.close()
+
+    def save(self, file_path):
+        """
+        Save the catalog to a .npz snapshot
+        :param file_path: snapshot file path
+        :return:
+        """
+        np.savez(file_path, station_type=np.array(self.station_type.name), ids=self.ids, latitudes=self.latitudes,
+                 longitudes=self.longitudes, names=self.names)
+
+    @classmethod
+    def from_snapshot(cls, file_path):
+        """
+        Load a catalog saved with save()
+        :param file_path: snapshot file path
+        :return: StationCatalog
+        """
+        with np.load(file_path) as snapshot:
+            return cls(StationEnum[str(snapshot['station_type'])], snapshot['ids'], snapshot['latitudes'],
+                       snapshot['longitudes'], snapshot['names'])
+
+    @classmethod
+    def load_cached(cls, pool, station_type, file_path, refresh=False):
+        """
+        Load the catalog from a .npz snapshot if it exists, else from the database, saving the snapshot
+        :param pool: database connection pool
+        :param station_type: StationEnum: which defines the station type
+        :param file_path: snapshot file path
+        :param boolean refresh: If True, reload from the database and overwrite the snapshot
+        :return: StationCatalog
+        """
+
+        if not refresh and os.path.exists(file_path):
+            catalog = cls.from_snapshot(file_path)
+            if catalog.station_type is station_type:
+                return catalog
+            logger.info("Snapshot {} holds stations of type {}, reloading stations of type {}"
+                        .format(file_path, catalog.station_type, station_type))
+
+        catalog = cls.load(pool, station_type)
+        catalog.save(file_path)
+        return catalog
+
+    def row_of_id(self, id_):
+        """
+        :param id_: station id
+        :return: row of the station in the catalog arrays, None if not in the catalog
+        """
+        return self._row_by_id.get(id_)
+
+    def row_of_name(self, name):
+        """
+        :param name: station name
+        :return: row of the station in the catalog arrays, None if not in the catalog
+        """
+        return self._row_by_name.get(name)
+
+    def rows_of_ids(self, ids):
+        """
+        :param ids: station ids
+        :return: NumPy array of the rows of the stations (-1 for ids not in the catalog)
+        """
+        return np.array([self._row_by_id.get(id_, -1) for id_ in ids], dtype=np.int64)
+
+    def get_id(self, name):
+        """
+        :param name: station name
+        :return: station id, None if not in the catalog
+        """
+        row = self._row_by_name.get(name)
+        return int(self.ids[row]) if row is not None else None
+
+    def to_dict(self):
+        """
+        :return: dictionary with station names as keys and station ids as values (as returned by get_wrf_stations)
+        """
+        return dict(zip(self.names.tolist(), self.ids.tolist()))
+
+    def spatial_index(self):
+        """
+        :return: StationIndex over the stations of the catalog, for nearest station and radius queries
+        """
+        return StationIndex(self.ids, self.latitudes, self.longitudes)
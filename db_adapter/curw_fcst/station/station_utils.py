@@ -1,9 +1,12 @@
 import traceback
-import csv
 import pkg_resources
 
 from db_adapter.curw_fcst.station.station_enum import StationEnum
 from db_adapter.logger import logger
+from db_adapter.grids import load_wrf_stations
+from db_adapter.base.pool_registry import CURW_FCST
+from db_adapter.base.reference_cache import STATION, get_cached_id, get_cached_row, invalidate_reference_cache, \
+    station_key
 from db_adapter.exceptions import DatabaseAdapterError
 
 """
@@ -19,6 +22,10 @@ e.g.:
 """
 
 
+# maximum number of stations inserted per statement by add_stations_bulk
+STATION_CHUNK_SIZE = 5000
+
+
 def get_station_by_id(pool, id_):
     """
     Retrieve station by id
@@ -27,6 +34,10 @@ def get_station_by_id(pool, id_):
     :return: Station if the stations exists in the database, else None
     """
 
+    row = get_cached_row(pool, CURW_FCST, STATION, id_)
+    if row is not None:
+        return row
+
     connection = pool.connection()
     try:
 
@@ -58,6 +69,10 @@ def get_station_id(pool, latitude, longitude, station_type) -> str:
     :return: str: station id, if station exists in the db, else None
     """
 
+    cached_id = get_cached_id(pool, CURW_FCST, STATION, station_key(latitude, longitude, station_type))
+    if cached_id is not None:
+        return cached_id
+
     connection = pool.connection()
     try:
 
@@ -131,6 +146,7 @@ def add_station(pool, name, latitude, longitude, description, station_type):
                                 "VALUES ( %s, %s, %s, %s, %s)"
                 row_count = cursor2.execute(sql_statement, (station_id, name, latitude, longitude, description))
                 connection.commit()
+                invalidate_reference_cache(pool, CURW_FCST)
                 return True if row_count > 0 else False
         else:
             logger.info("Station with latitude={} longitude={} and station_type={} already exists in the database"
@@ -171,6 +187,89 @@ def add_stations(stations, pool):
         print(station.get('name'))
 
 
+def add_stations_bulk(pool, stations, chunk_size=STATION_CHUNK_SIZE):
+    """
+    Register a batch of stations in a single transaction.
+    Existing stations are matched (by station type, latitude and longitude) with one query per station type,
+    a contiguous block of ids is reserved after the largest id of each StationEnum range while the range is locked
+    (SELECT ... FOR UPDATE), and the new stations are inserted with multi-row INSERT statements.
+    :param pool: database connection pool
+    :param stations: list of json objects that define station attributes (as in add_stations)
+    e.g.:
+    {
+        'name'        : 'wrf_79.875435_6.535172',
+        'latitude'    : '6.535172',
+        'longitude'   : '79.875435',
+        'description' : '',
+        'station_type': StationEnum.WRF
+    }
+    :param chunk_size: maximum number of stations inserted per statement
+    :return: dict of station name -> station id, for all the given stations (existing and added)
+    """
+
+    stations_by_type = {}
+    for station in stations:
+        stations_by_type.setdefault(station.get('station_type'), []).append(station)
+
+    station_ids = {}
+
+    connection = pool.connection()
+    try:
+        with connection.cursor() as cursor:
+            # ranges are locked in ascending order, so that concurrent registrations do not deadlock
+            for station_type in sorted(stations_by_type.keys(), key=lambda station_type: station_type.value):
+                initial_value = station_type.value
+                range_ = StationEnum.getRange(station_type)
+
+                sql_statement = "SELECT `id`, `latitude`, `longitude` FROM `station` " \
+                                "WHERE `id` BETWEEN %s and %s FOR UPDATE"
+                cursor.execute(sql_statement, (initial_value, initial_value + range_ - 1))
+                results = cursor.fetchall()
+
+                existing = {}
+                for result in results:
+                    existing.setdefault((float(result.get('latitude')),
+                                         float(result.get('longitude'))), result.get('id'))
+                next_id = max([result.get('id') for result in results]) + 1 if len(results) > 0 else initial_value
+
+                new_rows = []
+                for station in stations_by_type[station_type]:
+                    key = (float(station.get('latitude')), float(station.get('longitude')))
+                    if key not in existing:
+                        existing[key] = next_id
+                        new_rows.append((next_id, station.get('name'), station.get('latitude'),
+                                         station.get('longitude'), station.get('description')))
+                        next_id += 1
+                    station_ids[station.get('name')] = existing[key]
+
+                if next_id > initial_value + range_:
+                    raise ValueError("Not enough free ids in the range of station type {} for {} new stations"
+                                     .format(station_type, len(new_rows)))
+
+                for i in range(0, len(new_rows), chunk_size):
+                    row_chunk = new_rows[i: i + chunk_size]
+                    sql_statement = "INSERT INTO `station` (`id`, `name`, `latitude`, `longitude`, " \
+                                    "`description`) VALUES {}"\
+                        .format(', '.join(['(%s, %s, %s, %s, %s)'] * len(row_chunk)))
+                    cursor.execute(sql_statement, [value for row in row_chunk for value in row])
+
+                logger.info("Registered {} new stations of type {} ({} already existed)".format(len(new_rows),
+                        station_type, len(stations_by_type[station_type]) - len(new_rows)))
+
+        connection.commit()
+        invalidate_reference_cache(pool, CURW_FCST)
+        return station_ids
+    except Exception as exception:
+        connection.rollback()
+        error_message = "Bulk insertion of {} stations failed.".format(len(stations))
+        logger.error(error_message)
+        traceback.print_exc()
+        raise exception
+    finally:
+        if connection is not None:
+            connection.close()
+
+
 def delete_station(pool, latitude, longitude, station_type):
     """
     Delete station from Station table
@@ -195,6 +294,7 @@ def delete_station(pool, latitude, longitude, station_type):
             sql_statement = "DELETE FROM `station` WHERE `id` like %s and `latitude`=%s and `longitude`=%s"
             row_count = cursor.execute(sql_statement, (pattern, latitude, longitude))
             connection.commit()
+            invalidate_reference_cache(pool, CURW_FCST)
             if row_count > 0:
                 return True
             else:
@@ -227,6 +327,7 @@ def delete_station_by_id(pool, id_):
             sql_statement = "DELETE FROM `station` WHERE `id`=%s"
             row_count = cursor.execute(sql_statement, id_)
             connection.commit()
+            invalidate_reference_cache(pool, CURW_FCST)
             if row_count > 0:
                 return True
             else:
@@ -246,15 +347,14 @@ def delete_station_by_id(pool, id_):
 def add_wrf_stations(pool):
 
     """
-    Add wrfv3 stations to the database
+    Add wrfv3 stations (db_adapter/grids/wrf_stations.csv, shipped with the package) to the database
     :param pool:  database connection pool
-    :param wrf_stations_list: tuple that contains values for (id, name, latitude, longitude, description)
-    :return: True if the insertion is successful, else False
+    :return: number of inserted stations
     """
 
-    # resource_path = pkg_resources.resource_string(__name__, "wrfv3_stations.csv")
-    with open('wrf_stations.csv', 'r') as f:
-        data=[tuple(line) for line in csv.reader(f)][1:]
+    stations = load_wrf_stations()
+    data = list(zip(stations['id'].tolist(), stations['name'].tolist(), stations['latitude'].tolist(),
+                    stations['longitude'].tolist(), stations['description'].tolist()))
 
     connection = pool.connection()
     try:
@@ -263,6 +363,7 @@ def add_wrf_stations(pool):
                                 "VALUES ( %s, %s, %s, %s, %s)"
             row_count = cursor.executemany(sql_statement, data)
         connection.commit()
+        invalidate_reference_cache(pool, CURW_FCST)
         return row_count
     except Exception as exception:
         connection.rollback()
@@ -288,8 +389,9 @@ def get_wrf_stations(pool):
     connection = pool.connection()
     try:
         with connection.cursor() as cursor:
-            sql_statement = "SELECT `id`, `name` FROM `station` WHERE `id` like %s"
-            row_count = cursor.execute(sql_statement, "11_____")
+            sql_statement = "SELECT `id`, `name` FROM `station` WHERE `id` BETWEEN %s and %s"
+            row_count = cursor.execute(sql_statement, (StationEnum.WRF.value,
+                    StationEnum.WRF.value + StationEnum.getRange(StationEnum.WRF) - 1))
             if row_count > 0:
                 results = cursor.fetchall()
                 for dict in results:
@@ -318,13 +420,12 @@ def get_flo2d_output_stations(pool, flo2d_model):
 
     flo2d_output_stations = {}
 
-    id_pattern = '{}_____'.format((str(flo2d_model.value)).split('0')[0])
-
     connection = pool.connection()
     try:
         with connection.cursor() as cursor:
-            sql_statement = "SELECT * FROM `station` WHERE `id` like %s"
-            row_count = cursor.execute(sql_statement, id_pattern)
+            sql_statement = "SELECT * FROM `station` WHERE `id` BETWEEN %s and %s"
+            row_count = cursor.execute(sql_statement, (flo2d_model.value,
+                    flo2d_model.value + StationEnum.getRange(flo2d_model) - 1))
             if row_count > 0:
                 results = cursor.fetchall()
                 for dict in results:
@@ -358,8 +459,9 @@ def get_hechms_stations(pool):
     connection = pool.connection()
     try:
         with connection.cursor() as cursor:
-            sql_statement = "SELECT * FROM `station` WHERE `id` like %s"
-            row_count = cursor.execute(sql_statement, "10_____")
+            sql_statement = "SELECT * FROM `station` WHERE `id` BETWEEN %s and %s"
+            row_count = cursor.execute(sql_statement, (StationEnum.HECHMS.value,
+                    StationEnum.HECHMS.value + StationEnum.getRange(StationEnum.HECHMS) - 1))
             if row_count > 0:
                 results = cursor.fetchall()
                 for dict in results:
@@ -390,8 +492,9 @@ def get_mike_stations(pool):
     connection = pool.connection()
     try:
         with connection.cursor() as cursor:
-            sql_statement = "SELECT * FROM `station` WHERE `id` like %s"
-            row_count = cursor.execute(sql_statement, "18_____")
+            sql_statement = "SELECT * FROM `station` WHERE `id` BETWEEN %s and %s"
+            row_count = cursor.execute(sql_statement, (StationEnum.MIKE11.value,
+                    StationEnum.MIKE11.value + StationEnum.getRange(StationEnum.MIKE11) - 1))
             if row_count > 0:
                 results = cursor.fetchall()
                 for dict in results:
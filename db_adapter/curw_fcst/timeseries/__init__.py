@@ -1,2 +1,3 @@
-from .timeseries import Timeseries
+from .timeseries import Timeseries, DataStorage
+from .run_catalog import RunCatalog
 from .run_info_utils import insert_run_metadata, read_template
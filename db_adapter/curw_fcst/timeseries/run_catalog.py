@@ -0,0 +1,333 @@
+import threading
+import traceback
+from datetime import datetime, timedelta
+from time import monotonic
+
+from db_adapter.logger import logger
+from db_adapter.constants import COMMON_DATE_TIME_FORMAT
+
+"""
+In-process catalog of the curw_fcst run table.
+
+Keeps an index of (sim_tag, station, source, variable, unit) -> run (id, start_date, end_date),
+so that Timeseries read methods can resolve runs without querying the run table on every call.
+
+The catalog is loaded on first use and refreshed lazily once ttl seconds have passed since the last refresh.
+Refreshes are incremental: only runs with an end_date at or after the watermark (latest end_date seen at the
+previous refresh, less the lookback) are reloaded. A full reload is done every full_refresh_interval seconds,
+which also drops runs deleted by other processes. Runs not found in the catalog are looked up in the database.
+
+e.g.:
+    run_catalog = RunCatalog(pool, ttl=60)
+    ts = Timeseries(pool=pool, run_catalog=run_catalog)
+    ts.get_latest_timeseries(sim_tag, station_id, source_id, variable_id, unit_id)
+"""
+
+RUN_COLUMNS = "`id`, `sim_tag`, `station`, `source`, `variable`, `unit`, `start_date`, `end_date`"
+
+# maximum number of stations in an IN (...) list
+STATION_CHUNK_SIZE = 1000
+
+
+def _to_datetime(value):
+    return datetime.strptime(value, COMMON_DATE_TIME_FORMAT) if type(value) is str else value
+
+
+class RunCatalog:
+
+    def __init__(self, pool, ttl=60, lookback=timedelta(days=1), full_refresh_interval=3600):
+        """
+        :param pool: curw_fcst database connection pool
+        :param ttl: seconds after which the catalog is refreshed (incrementally) on the next lookup
+        :param lookback: timedelta subtracted from the latest end_date seen to form the watermark of incremental
+        refreshes, to also catch runs which advanced to an older fgt than the latest one
+        :param full_refresh_interval: seconds after which the catalog is fully reloaded. None disables full reloads
+        """
+        self.pool = pool
+        self.ttl = ttl
+        self.lookback = lookback
+        self.full_refresh_interval = full_refresh_interval
+
+        self._lock = threading.RLock()
+        self._runs = {}
+        self._keys_by_id = {}
+        self._watermark = None
+        self._refreshed_at = None
+        self._fully_refreshed_at = None
+        self._refreshes = 0
+        self._changed_ids = set()
+
+    @staticmethod
+    def _key(sim_tag, station_id, source_id, variable_id, unit_id):
+        try:
+            return str(sim_tag), int(station_id), int(source_id), int(variable_id), int(unit_id)
+        except (TypeError, ValueError):
+            return None
+
+    def _put(self, row):
+        key = self._key(row.get('sim_tag'), row.get('station'), row.get('source'), row.get('variable'),
+                row.get('unit'))
+        if key is None:
+            return
+        end_date = _to_datetime(row.get('end_date'))
+        self._runs[key] = {'id': row.get('id'), 'start_date': _to_datetime(row.get('start_date')),
+                           'end_date': end_date}
+        self._keys_by_id[row.get('id')] = key
+        if end_date is not None and (self._watermark is None or end_date > self._watermark):
+            self._watermark = end_date
+
+    def _touch(self, id_):
+        # runs changed while a refresh query is in flight keep their cached state when its results are swapped in
+        if self._refreshes > 0:
+            self._changed_ids.add(id_)
+
+    def _fetch(self, connection, statements, error_message):
+        """
+        Run select statements on the given connection, or on a connection checked out of the pool if None
+        :param connection: connection held by the caller, or None
+        :param statements: list of (sql_statement, args) tuples
+        :param error_message: message logged if a statement fails
+        :return: list of the result rows of all statements
+        """
+
+        own_connection = connection is None
+        if own_connection:
+            connection = self.pool.connection()
+        try:
+            results = []
+            with connection.cursor() as cursor:
+                for sql_statement, args in statements:
+                    cursor.execute(sql_statement, args)
+                    results.extend(cursor.fetchall())
+            return results
+        except Exception as exception:
+            logger.error(error_message)
+            traceback.print_exc()
+            raise exception
+        finally:
+            if own_connection and connection is not None:
+                connection.close()
+
+    def refresh(self, full=False, connection=None):
+        """
+        Reload the runs changed since the last refresh into the catalog.
+        The run table is queried without holding the catalog lock; the results are swapped in under it.
+        :param full: If True, reload the whole run table
+        :param connection: connection to query through, if the caller already holds one. Else a connection is
+        checked out of the pool
+        :return: number of runs loaded
+        """
+
+        with self._lock:
+            full = full or self._fully_refreshed_at is None or \
+                   (self.full_refresh_interval is not None and
+                    monotonic() - self._fully_refreshed_at > self.full_refresh_interval)
+            since = None if full or self._watermark is None else self._watermark - self.lookback
+            self._refreshes += 1
+
+        try:
+            if since is None:
+                statement = ("SELECT {} FROM `run`;".format(RUN_COLUMNS), None)
+            else:
+                statement = ("SELECT {} FROM `run` WHERE `end_date` >= %s OR `end_date` IS NULL;".format(RUN_COLUMNS),
+                             since)
+            results = self._fetch(connection, [statement], "Refreshing run catalog failed.")
+        except Exception as exception:
+            with self._lock:
+                self._end_refresh()
+            raise exception
+
+        with self._lock:
+            changed_runs = [(self._keys_by_id[id_], self._runs[self._keys_by_id[id_]]) for id_ in self._changed_ids
+                            if id_ in self._keys_by_id]
+            if full:
+                self._runs = {}
+                self._keys_by_id = {}
+                self._watermark = None
+                self._fully_refreshed_at = monotonic()
+
+            for result in results:
+                if result.get('id') not in self._changed_ids:
+                    self._put(result)
+            for key, run in changed_runs:
+                self._put(dict(zip(['sim_tag', 'station', 'source', 'variable', 'unit'], key), **run))
+
+            self._refreshed_at = monotonic()
+            self._end_refresh()
+            return len(results)
+
+    def _end_refresh(self):
+        self._refreshes -= 1
+        if self._refreshes == 0:
+            self._changed_ids = set()
+
+    def _refresh_if_expired(self, connection=None):
+        with self._lock:
+            # while another thread refreshes, lookups are served from the current catalog
+            if self._refreshed_at is not None and \
+                    (monotonic() - self._refreshed_at <= self.ttl or self._refreshes > 0):
+                return
+        self.refresh(connection=connection)
+
+    def get_run(self, sim_tag, station_id, source_id, variable_id, unit_id, connection=None):
+        """
+        Retrieve the run of the given parameters
+        :param sim_tag:
+        :param station_id:
+        :param source_id:
+        :param variable_id:
+        :param unit_id:
+        :param connection: connection to query through on a refresh or a miss, if the caller already holds one
+        :return: dict with 'id', 'start_date' and 'end_date' keys if the run exists, else None
+        """
+
+        key = self._key(sim_tag, station_id, source_id, variable_id, unit_id)
+
+        self._refresh_if_expired(connection)
+        with self._lock:
+            run = self._runs.get(key)
+            if run is not None:
+                return dict(run)
+
+        sql_statement = "SELECT {} FROM `run` WHERE `source`=%s AND `station`=%s " \
+                        "AND `sim_tag`=%s AND `variable`=%s AND `unit`=%s;".format(RUN_COLUMNS)
+        results = self._fetch(connection, [(sql_statement, (source_id, station_id, sim_tag, variable_id, unit_id))],
+                "Retrieving run failed.")
+        if len(results) == 0:
+            return None
+        result = results[0]
+
+        with self._lock:
+            self._put(result)
+
+        return {'id': result.get('id'), 'start_date': result.get('start_date'), 'end_date': result.get('end_date')}
+
+    def get_runs(self, sim_tag, station_ids, source_id, variable_id, unit_id, connection=None):
+        """
+        Retrieve the runs of many stations. Runs not found in the catalog are looked up together, with one query per
+        chunk of STATION_CHUNK_SIZE stations
+        :param sim_tag:
+        :param station_ids: list of station ids
+        :param source_id:
+        :param variable_id:
+        :param unit_id:
+        :param connection: connection to query through on a refresh or misses, if the caller already holds one
+        :return: dict of station id -> dict with 'id', 'start_date' and 'end_date' keys, for the stations having a run
+        """
+
+        runs = {}
+        missing_station_ids = []
+
+        self._refresh_if_expired(connection)
+        with self._lock:
+            for station_id in station_ids:
+                run = self._runs.get(self._key(sim_tag, station_id, source_id, variable_id, unit_id))
+                if run is not None:
+                    runs[station_id] = dict(run)
+                else:
+                    missing_station_ids.append(station_id)
+
+        if len(missing_station_ids) == 0:
+            return runs
+
+        statements = []
+        for i in range(0, len(missing_station_ids), STATION_CHUNK_SIZE):
+            station_chunk = missing_station_ids[i: i + STATION_CHUNK_SIZE]
+            sql_statement = "SELECT {} FROM `run` WHERE `source`=%s AND `sim_tag`=%s AND `variable`=%s " \
+                            "AND `unit`=%s AND `station` IN ({});"\
+                .format(RUN_COLUMNS, ', '.join(['%s'] * len(station_chunk)))
+            statements.append((sql_statement, [source_id, sim_tag, variable_id, unit_id] + station_chunk))
+        results = self._fetch(connection, statements, "Retrieving runs of stations failed.")
+
+        station_ids_by_key = {self._key(sim_tag, station_id, source_id, variable_id, unit_id): station_id
+                              for station_id in missing_station_ids}
+        with self._lock:
+            for result in results:
+                self._put(result)
+                station_id = station_ids_by_key.get(self._key(sim_tag, result.get('station'), source_id, variable_id,
+                        unit_id))
+                if station_id is not None:
+                    runs[station_id] = {'id': result.get('id'), 'start_date': result.get('start_date'),
+                                        'end_date': result.get('end_date')}
+
+        return runs
+
+    def get_run_by_id(self, id_):
+        """
+        Retrieve a cached run by timeseries id
+        :param id_: timeseries id
+        :return: dict with 'id', 'start_date' and 'end_date' keys if the run is in the catalog, else None
+        """
+
+        self._refresh_if_expired()
+        with self._lock:
+            key = self._keys_by_id.get(id_)
+            if key is None:
+                return None
+            return dict(self._runs[key])
+
+    def add_run(self, id_, sim_tag, station_id, source_id, variable_id, unit_id, start_date=None, end_date=None):
+        """
+        Add a newly inserted run to the catalog
+        """
+
+        with self._lock:
+            self._touch(id_)
+            self._put({'id': id_, 'sim_tag': sim_tag, 'station': station_id, 'source': source_id,
+                       'variable': variable_id, 'unit': unit_id, 'start_date': start_date, 'end_date': end_date})
+
+    def update_end_date(self, id_, end_date):
+        """
+        Move the end_date (latest fgt) of a cached run forward, if the given end_date is later than the cached one
+        """
+
+        end_date = _to_datetime(end_date)
+        with self._lock:
+            self._touch(id_)
+            key = self._keys_by_id.get(id_)
+            if key is None:
+                return
+            run = self._runs[key]
+            if run['end_date'] is None or run['end_date'] < end_date:
+                run['end_date'] = end_date
+                if self._watermark is None or end_date > self._watermark:
+                    self._watermark = end_date
+
+    def update_start_date(self, id_, start_date, force=False):
+        """
+        Move the start_date (very first fgt) of a cached run backward, if the given start_date is earlier than the
+        cached one (or set it regardless, if force)
+        """
+
+        start_date = _to_datetime(start_date)
+        with self._lock:
+            self._touch(id_)
+            key = self._keys_by_id.get(id_)
+            if key is None:
+                return
+            run = self._runs[key]
+            if force or run['start_date'] is None or run['start_date'] > start_date:
+                run['start_date'] = start_date
+
+    def remove_run(self, id_):
+        """
+        Remove a deleted run from the catalog
+        """
+
+        with self._lock:
+            self._touch(id_)
+            key = self._keys_by_id.pop(id_, None)
+            if key is not None:
+                self._runs.pop(key, None)
+
+    def clear(self):
+        """
+        Drop all cached runs. The catalog is reloaded on the next lookup.
+        """
+
+        with self._lock:
+            self._runs = {}
+            self._keys_by_id = {}
+            self._watermark = None
+            self._refreshed_at = None
+            self._fully_refreshed_at = None
@@ -1,18 +1,65 @@
+import numpy as np
 import pandas as pd
-import hashlib
-import json
 import traceback
 from pymysql import IntegrityError
+from pymysql.cursors import Cursor
 from datetime import datetime, timedelta
 
 from db_adapter.logger import logger
+from db_adapter.hash_utils import generate_timeseries_id, generate_ids, CURW_FCST_HASH_KEYS
 from db_adapter.exceptions import DatabaseAdapterError, DuplicateEntryError
 from db_adapter.constants import COMMON_DATE_TIME_FORMAT
+from db_adapter.base.timeseries_format import TimeseriesFormat, format_timeseries
+from db_adapter.base.bulk_load import load_data_local_infile
+from db_adapter.base.pymysql_base import iterate_read_query
+from db_adapter.base.date_bounds import update_date_bound, update_date_bounds
+from db_adapter.curw_fcst.common import get_distinct_fgts_for_given_id
+from db_adapter.curw_fcst.fgt_index import FGT_INDEX_TABLE, prepare_fgt_index_update, apply_fgt_index_update, \
+    remove_from_fgt_index
+from db_adapter.curw_fcst.blob_storage import DATA_BLOB_TABLE, DataStorage, read_series, write_series
+from db_adapter.base.series_codec import decode_series, series_to_rows
+from db_adapter.base.timeseries_payload import build_data_rows, is_columnar_timeseries, serialize_data_rows
+from db_adapter.base.data_merge import fetch_window, diff_rows, DEFAULT_ATOL, DEFAULT_RTOL
+
+DATA_COLUMNS = ['id', 'time', 'fgt', 'value']
+
+# maximum number of ids in an IN (...) list
+ID_CHUNK_SIZE = 1000
+# number of rows fetched at a time from streamed (unbuffered) reads
+DATA_FETCH_SIZE = 10000
+# number of fgts fetched per query of get_forecast_evolution
+FGT_CHUNK_SIZE = 50
+
+# fgt of a timeseries id nearest to an expected fgt, using two index seeks on the (id, fgt) key of the
+# table formatted in (data or fgt_index).
+# params: (id, expected_fgt, id, expected_fgt, expected_fgt)
+NEAREST_FGT_SQL = "SELECT `fgt` FROM (" \
+                  "(SELECT `fgt` FROM `{0}` WHERE `id`=%s AND `fgt` <= %s ORDER BY `fgt` DESC LIMIT 1) " \
+                  "UNION " \
+                  "(SELECT `fgt` FROM `{0}` WHERE `id`=%s AND `fgt` >= %s ORDER BY `fgt` ASC LIMIT 1)" \
+                  ") `candidates` ORDER BY ABS(TIMESTAMPDIFF(SECOND, `fgt`, %s)), `fgt` LIMIT 1;"
 
 
 class Timeseries:
-    def __init__(self, pool):
+    def __init__(self, pool, run_catalog=None, fgt_index=False, storage=DataStorage.ROWS, blob_value_type='float64'):
+        """
+        :param pool: database connection pool (or a Session)
+        :param run_catalog: optional RunCatalog used to resolve runs without querying the run table
+        :param fgt_index: If True, maintain the fgt_index table on inserts and deletes, and read fgts from it
+        instead of scanning the data table (see db_adapter.curw_fcst.fgt_index). Not used with blob storage.
+        :param storage: DataStorage.ROWS to store a data table row per value, DataStorage.BLOB to store a compressed
+        data_blob table row per (id, fgt) (see db_adapter.curw_fcst.blob_storage)
+        :param blob_value_type: 'float32' or 'float64', value type of written blob payloads
+        """
         self.pool = pool
+        self.run_catalog = run_catalog
+        self.storage = storage
+        self.blob_value_type = blob_value_type
+        self.fgt_index = fgt_index and storage is DataStorage.ROWS
+        if storage is DataStorage.BLOB:
+            self.fgt_table = DATA_BLOB_TABLE
+        else:
+            self.fgt_table = FGT_INDEX_TABLE if fgt_index else 'data'
 
     @staticmethod
     def generate_timeseries_id(meta_data):
@@ -28,24 +75,7 @@ class Timeseries:
         :return: str: sha256 hash value in hex format (length of 64 characters)
         """
 
-        sha256 = hashlib.sha256()
-        hash_data = {
-                'sim_tag'  : '',
-                'latitude' : '',
-                'longitude': '',
-                'model'    : '',
-                'version'  : '',
-                'variable' : '',
-                'unit'     : '',
-                'unit_type': ''
-                }
-
-        for key in hash_data.keys():
-            hash_data[key] = meta_data[key]
-
-        sha256.update(json.dumps(hash_data, sort_keys=True).encode("ascii"))
-        event_id = sha256.hexdigest()
-        return event_id
+        return generate_timeseries_id(meta_data, CURW_FCST_HASH_KEYS)
 
     def get_timeseries_id_if_exists(self, meta_data):
 
@@ -93,13 +123,15 @@ class Timeseries:
             if connection is not None:
                 connection.close()
 
-    def insert_formatted_data(self, timeseries, upsert=False):
+    def insert_formatted_data(self, timeseries, upsert=False, bulk_load=False):
         """
         Insert timeseries to Data table in the database
         :param timeseries: list of [tms_id, time, fgt, value] lists
         :param boolean upsert: If True, upsert existing values ON DUPLICATE KEY. Default is False.
         Ref: 1). https://stackoverflow.com/a/14383794/1461060
              2). https://chartio.com/resources/tutorials/how-to-insert-if-row-does-not-exist-upsert-in-mysql/
+        :param boolean bulk_load: If True, load rows with LOAD DATA LOCAL INFILE (through a temporary table if upsert)
+        instead of executemany. Falls back to executemany if local infile is disabled. Default is False.
         :return: row count if insertion was successful, else raise DatabaseAdapterError
         """
 
@@ -107,12 +139,7 @@ class Timeseries:
         connection = self.pool.connection()
         try:
             with connection.cursor() as cursor:
-                if upsert:
-                    sql_statement = "INSERT INTO `data` (`id`, `time`, `fgt`, `value`) VALUES (%s, %s, %s, %s) " \
-                                    "ON DUPLICATE KEY UPDATE `value`=VALUES(`value`)"
-                else:
-                    sql_statement = "INSERT INTO `data` (`id`, `time`, `fgt`, `value`) VALUES (%s, %s, %s, %s)"
-                row_count = cursor.executemany(sql_statement, timeseries)
+                row_count, _ = self._insert_data_rows(cursor, timeseries, upsert, bulk_load)
             connection.commit()
             return row_count
         except Exception as exception:
@@ -127,45 +154,83 @@ class Timeseries:
             if connection is not None:
                 connection.close()
 
-    def insert_data(self, timeseries, tms_id, fgt, upsert=False):
+    def _insert_data_rows(self, cursor, rows, upsert, bulk_load):
+        """
+        Insert data rows through the given cursor (without committing), updating the fgt index if enabled
+        :param cursor:
+        :param rows: list of (tms_id, time, fgt, value) rows
+        :param boolean upsert:
+        :param boolean bulk_load:
+        :return: (row count, True if the rows were bulk loaded) tuple
+        """
+
+        if self.storage is DataStorage.BLOB:
+            return write_series(cursor, rows, upsert=upsert, value_type=self.blob_value_type), False
+
+        fgt_index_update = None
+        if self.fgt_index:
+            fgt_index_update = prepare_fgt_index_update(cursor, rows, exact=upsert)
+
+        row_count = None
+        if bulk_load:
+            row_count = load_data_local_infile(cursor, 'data', DATA_COLUMNS, rows, upsert=upsert)
+        bulk_loaded = row_count is not None
+        if not bulk_loaded:
+            if upsert:
+                sql_statement = "INSERT INTO `data` (`id`, `time`, `fgt`, `value`) VALUES (%s, %s, %s, %s) " \
+                                "ON DUPLICATE KEY UPDATE `value`=VALUES(`value`)"
+            else:
+                sql_statement = "INSERT INTO `data` (`id`, `time`, `fgt`, `value`) VALUES (%s, %s, %s, %s)"
+            row_count = cursor.executemany(sql_statement, rows)
+
+        if fgt_index_update is not None:
+            apply_fgt_index_update(cursor, fgt_index_update)
+
+        return row_count, bulk_loaded
+
+    def insert_data(self, timeseries, tms_id, fgt, upsert=False, bulk_load=False):
         """
         Insert timeseries to Data table in the database
         :param tms_id: hash value
         :param fgt: forecast generated time
-        :param timeseries: list of [time, value] lists
+        :param timeseries: list of [time, value] lists, (times, values) tuple of NumPy arrays,
+        pandas Series indexed by time or pandas DataFrame with 'time' and 'value' columns. Not modified.
         :param boolean upsert: If True, upsert existing values ON DUPLICATE KEY. Default is False.
         Ref: 1). https://stackoverflow.com/a/14383794/1461060
              2). https://chartio.com/resources/tutorials/how-to-insert-if-row-does-not-exist-upsert-in-mysql/
+        :param boolean bulk_load: If True, load rows with LOAD DATA LOCAL INFILE (through a temporary table if upsert)
+        instead of executemany. Falls back to executemany if local infile is disabled. Default is False.
+        Columnar timeseries are then serialized straight from their columns, without building row tuples
+        (unless the fgt index is enabled).
         :return: row count if insertion was successful, else raise DatabaseAdapterError
         """
 
-        new_timeseries = []
-        for t in [i for i in timeseries]:
-            if len(t) > 1:
-                # Insert EventId in front of timestamp, value list
-                t.insert(0, tms_id)
-                t.insert(2, fgt)
-                new_timeseries.append(t)
-            else:
-                logger.warning('Invalid timeseries data:: %s', t)
+        serialized_rows = None
+        new_timeseries = None
+        if bulk_load and self.storage is DataStorage.ROWS and not self.fgt_index and \
+                is_columnar_timeseries(timeseries):
+            serialized_rows = serialize_data_rows(timeseries, tms_id, fgt)
+        else:
+            new_timeseries = build_data_rows(timeseries, tms_id, fgt)
 
         row_count = 0
 
         connection = self.pool.connection()
         try:
             with connection.cursor() as cursor:
-                if upsert:
-                    sql_statement = "INSERT INTO `data` (`id`, `time`, `fgt`, `value`) VALUES (%s, %s, %s, %s) " \
-                                    "ON DUPLICATE KEY UPDATE `value`=VALUES(`value`)"
+                if serialized_rows is not None:
+                    row_count = load_data_local_infile(cursor, 'data', DATA_COLUMNS, serialized_rows, upsert=upsert)
+                    if row_count is None:
+                        # local infile disabled, fall back to executemany
+                        row_count, _ = self._insert_data_rows(cursor, build_data_rows(timeseries, tms_id, fgt),
+                                upsert, bulk_load=False)
                 else:
-                    sql_statement = "INSERT INTO `data` (`id`, `time`, `fgt`, `value`) VALUES (%s, %s, %s, %s)"
-                row_count = cursor.executemany(sql_statement, new_timeseries)
+                    row_count, _ = self._insert_data_rows(cursor, new_timeseries, upsert, bulk_load)
             connection.commit()
             return row_count
         except Exception as exception:
             connection.rollback()
-            error_message = "Data insertion to data table for tms id {}, upsert={} failed.".format(timeseries[0][0],
-                    upsert)
+            error_message = "Data insertion to data table for tms id {}, upsert={} failed.".format(tms_id, upsert)
             logger.error(error_message)
             traceback.print_exc()
             raise exception
@@ -174,6 +239,51 @@ class Timeseries:
             if connection is not None:
                 connection.close()
 
+    def merge_data(self, timeseries, tms_id, fgt, atol=DEFAULT_ATOL, rtol=DEFAULT_RTOL):
+        """
+        Merge timeseries into the existing values of a fgt (e.g. a model rerun), writing only new rows and rows
+        whose value changed beyond the tolerance, instead of rewriting every row as insert_data(upsert=True) does
+        :param timeseries: list of [time, value] lists or any columnar timeseries accepted by insert_data
+        :param tms_id: hash value
+        :param fgt: forecast generated time
+        :param atol: absolute tolerance under which a value is considered unchanged
+        :param rtol: relative tolerance under which a value is considered unchanged
+        :return: dict with 'inserted', 'updated' and 'unchanged' row counts
+        """
+
+        if type(fgt) is str:
+            fgt = datetime.strptime(fgt, COMMON_DATE_TIME_FORMAT)
+
+        new_timeseries = build_data_rows(timeseries, tms_id, fgt)
+        if len(new_timeseries) == 0:
+            return {'inserted': 0, 'updated': 0, 'unchanged': 0}
+
+        connection = self.pool.connection()
+        try:
+            with connection.cursor() as cursor:
+                if self.storage is DataStorage.BLOB:
+                    stored_times, stored_values = read_series(cursor, [(tms_id, fgt)]).get((tms_id, fgt),
+                            (np.array([], dtype='datetime64[s]'), np.array([])))
+                else:
+                    times = pd.to_datetime([row[1] for row in new_timeseries])
+                    stored_times, stored_values = fetch_window(cursor, 'data', {'id': tms_id, 'fgt': fgt},
+                            times.min().to_pydatetime(), times.max().to_pydatetime())
+
+                rows, counts = diff_rows(new_timeseries, 1, 3, stored_times, stored_values, atol, rtol)
+                if len(rows) > 0:
+                    self._insert_data_rows(cursor, rows, upsert=True, bulk_load=False)
+            connection.commit()
+            return counts
+        except Exception as exception:
+            connection.rollback()
+            error_message = "Data merge to data table for tms id {}, fgt {} failed.".format(tms_id, fgt)
+            logger.error(error_message)
+            traceback.print_exc()
+            raise exception
+        finally:
+            if connection is not None:
+                connection.close()
+
     def insert_timeseries(self, timeseries, run_tuple):
 
         """
@@ -285,7 +395,6 @@ class Timeseries:
                                                run_meta.get('source_id'), run_meta.get('variable_id'), run_meta.get('unit_id')))
 
             connection.commit()
-            return run_meta.get('tms_id')
         except Exception as exception:
             connection.rollback()
             error_message = "Insertion failed for run enty with tms_id={}, sim_tag={}, station_id={}, source_id={}," \
@@ -299,9 +408,144 @@ class Timeseries:
             if connection is not None:
                 connection.close()
 
+        # the run is committed, hence the catalog is updated outside of the insertion error handling
+        if self.run_catalog is not None:
+            self.run_catalog.add_run(run_meta.get('tms_id'), run_meta.get('sim_tag'), run_meta.get('station_id'),
+                    run_meta.get('source_id'), run_meta.get('variable_id'), run_meta.get('unit_id'),
+                    run_meta.get('start_date'), run_meta.get('end_date'))
+
+        return run_meta.get('tms_id')
+
+    def insert_run_batch(self, runs, fgt, upsert=False, chunk_size=10000, bulk_load=False):
+        """
+        Insert the timeseries of many stations for one fgt (e.g. a whole WRF run) in a single unit of work.
+        Timeseries ids are generated in bulk, existing runs are looked up with one query per id chunk,
+        missing run entries and all data rows are inserted in chunks, and start_date/end_date of all
+        affected runs are updated with one set based statement per id chunk.
+
+        e.g.:
+            runs = {
+                'station_1': ({'sim_tag': 'dwrf_gfs_d1_18', 'latitude': 7.1, ..., 'station_id': 1100001,
+                               'source_id': 1, 'variable_id': 1, 'unit_id': 1}, [[time, value], [time1, value1]]),
+                ...
+            }
+
+        :param runs: dict of key (e.g. station name) -> (meta_data, timeseries) tuples.
+        meta_data: Dict with 'sim_tag', 'latitude', 'longitude', 'model', 'version', 'variable', 'unit', 'unit_type',
+        'station_id', 'source_id', 'variable_id', 'unit_id' keys
+        timeseries: list of [time, value] lists or any columnar timeseries accepted by insert_data
+        :param fgt: forecast generated time
+        :param boolean upsert: If True, upsert existing values ON DUPLICATE KEY. Default is False.
+        :param chunk_size: maximum number of data rows inserted per statement. Default is 10000.
+        :param boolean bulk_load: If True, load data rows with LOAD DATA LOCAL INFILE (see insert_data).
+        Default is False.
+        :return: dict of key -> outcome dict with 'tms_id', 'new_run', 'row_count' and 'error' keys.
+        Stations with invalid meta data or an empty timeseries are reported with an error and skipped,
+        any database error rolls back the whole batch and is raised.
+        """
+
+        if type(fgt) is str:
+            fgt = datetime.strptime(fgt, COMMON_DATE_TIME_FORMAT)
+
+        outcomes = {}
+        valid_keys = []
+        for key, (meta_data, timeseries) in runs.items():
+            outcome = {'tms_id': None, 'new_run': False, 'row_count': 0, 'error': None}
+            outcomes[key] = outcome
+            missing_keys = [hash_key for hash_key in CURW_FCST_HASH_KEYS if hash_key not in meta_data]
+            if len(missing_keys) > 0:
+                outcome['error'] = "Missing meta data {}".format(', '.join(missing_keys))
+                logger.error("Invalid meta data for {}:: {}".format(key, outcome['error']))
+                continue
+            valid_keys.append(key)
+
+        tms_ids = {}
+        for key, tms_id in zip(valid_keys, generate_ids([runs[key][0] for key in valid_keys], CURW_FCST_HASH_KEYS)):
+            outcomes[key]['tms_id'] = tms_id
+            timeseries = runs[key][1]
+            if timeseries is None or len(timeseries) == 0:
+                outcomes[key]['error'] = "Empty timeseries"
+                logger.warning("Empty timeseries for {}".format(key))
+                continue
+            tms_ids[key] = tms_id
+
+        if len(tms_ids) == 0:
+            return outcomes
+
+        unique_ids = list(dict.fromkeys(tms_ids.values()))
+
+        connection = self.pool.connection()
+        try:
+            existing_ids = set()
+            with connection.cursor() as cursor:
+                for i in range(0, len(unique_ids), ID_CHUNK_SIZE):
+                    id_chunk = unique_ids[i: i + ID_CHUNK_SIZE]
+                    sql_statement = "SELECT `id` FROM `run` WHERE `id` IN ({})".format(
+                            ', '.join(['%s'] * len(id_chunk)))
+                    cursor.execute(sql_statement, id_chunk)
+                    existing_ids.update([result.get('id') for result in cursor.fetchall()])
+
+            new_runs = []
+            new_ids = set()
+            data_rows = []
+            for key, tms_id in tms_ids.items():
+                meta_data, timeseries = runs[key]
+                outcome = outcomes[key]
+
+                if tms_id not in existing_ids and tms_id not in new_ids:
+                    new_runs.append((tms_id, meta_data.get('sim_tag'), fgt, fgt, meta_data.get('station_id'),
+                                     meta_data.get('source_id'), meta_data.get('variable_id'),
+                                     meta_data.get('unit_id')))
+                    new_ids.add(tms_id)
+                    outcome['new_run'] = True
+
+                rows = build_data_rows(timeseries, tms_id, fgt)
+                data_rows.extend(rows)
+                outcome['row_count'] = len(rows)
+
+            with connection.cursor() as cursor:
+                if len(new_runs) > 0:
+                    sql_statement = "INSERT INTO `run` (`id`, `sim_tag`, `start_date`, `end_date`, `station`, " \
+                                    "`source`, `variable`, `unit`) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)"
+                    cursor.executemany(sql_statement, new_runs)
+
+                for i in range(0, len(data_rows), chunk_size):
+                    _, bulk_load = self._insert_data_rows(cursor, data_rows[i: i + chunk_size], upsert, bulk_load)
+
+                existing_run_ids = [tms_id for tms_id in unique_ids if tms_id in existing_ids]
+                for i in range(0, len(existing_run_ids), ID_CHUNK_SIZE):
+                    id_chunk = existing_run_ids[i: i + ID_CHUNK_SIZE]
+                    sql_statement = "UPDATE `run` SET `end_date`=GREATEST(COALESCE(`end_date`, %s), %s), " \
+                                    "`start_date`=LEAST(COALESCE(`start_date`, %s), %s) WHERE `id` IN ({})"\
+                        .format(', '.join(['%s'] * len(id_chunk)))
+                    cursor.execute(sql_statement, [fgt, fgt, fgt, fgt] + id_chunk)
+
+            connection.commit()
+        except Exception as exception:
+            connection.rollback()
+            error_message = "Batch insertion of {} timeseries for fgt {} failed.".format(len(tms_ids), fgt)
+            logger.error(error_message)
+            traceback.print_exc()
+            raise exception
+        finally:
+            if connection is not None:
+                connection.close()
+
+        if self.run_catalog is not None:
+            for tms_id, sim_tag, start_date, end_date, station_id, source_id, variable_id, unit_id in new_runs:
+                self.run_catalog.add_run(tms_id, sim_tag, station_id, source_id, variable_id, unit_id, start_date,
+                        end_date)
+            # as the run table update: end_date moves forward and start_date back (a backfilled fgt)
+            for tms_id in existing_run_ids:
+                self.run_catalog.update_end_date(tms_id, fgt)
+                self.run_catalog.update_start_date(tms_id, fgt)
+
+        return outcomes
+
     def update_latest_fgt(self, id_, fgt):
         """
         Update fgt for inserted timeseries, if new fgt is latest date than the existing
+        (atomically, within a single statement)
         :param id_: timeseries id
         :return: scheduled data if update is successful, else raise DatabaseAdapterError
         """
@@ -311,21 +555,16 @@ class Timeseries:
         if type(fgt) is str:
             fgt = datetime.strptime(fgt, COMMON_DATE_TIME_FORMAT)
 
-        existing_end_date = None
         try:
 
             with connection.cursor() as cursor:
-                sql_statement = "SELECT `end_date` FROM `run` WHERE `id`=%s"
-                row_count= cursor.execute(sql_statement, id_)
-                if row_count > 0:
-                    existing_end_date = cursor.fetchone()['end_date']
-
-            if existing_end_date is None or existing_end_date < fgt:
-                with connection.cursor() as cursor2:
-                    sql_statement = "UPDATE `run` SET `end_date`=%s WHERE `id`=%s"
-                    cursor2.execute(sql_statement, (fgt, id_))
+                update_date_bound(cursor, 'run', 'end_date', id_, fgt, latest=True)
 
             connection.commit()
+
+            if self.run_catalog is not None:
+                self.run_catalog.update_end_date(id_, fgt)
+
             return
         except Exception as exception:
             connection.rollback()
@@ -337,6 +576,40 @@ class Timeseries:
             if connection is not None:
                 connection.close()
 
+    def update_latest_fgts(self, id_fgt_pairs):
+        """
+        Update fgts of many inserted timeseries, where the new fgt is later than the existing one,
+        with one statement per chunk of runs
+        :param id_fgt_pairs: list of (timeseries id, fgt) pairs
+        :return: number of updated runs
+        """
+
+        id_fgt_pairs = [(id_, datetime.strptime(fgt, COMMON_DATE_TIME_FORMAT) if type(fgt) is str else fgt)
+                        for id_, fgt in id_fgt_pairs]
+
+        connection = self.pool.connection()
+        try:
+
+            with connection.cursor() as cursor:
+                row_count = update_date_bounds(cursor, 'run', 'end_date', id_fgt_pairs, latest=True)
+
+            connection.commit()
+
+            if self.run_catalog is not None:
+                for id_, fgt in id_fgt_pairs:
+                    self.run_catalog.update_end_date(id_, fgt)
+
+            return row_count
+        except Exception as exception:
+            connection.rollback()
+            error_message = "Updating fgts of {} runs failed.".format(len(id_fgt_pairs))
+            logger.error(error_message)
+            traceback.print_exc()
+            raise exception
+        finally:
+            if connection is not None:
+                connection.close()
+
     def get_latest_fgt(self, id_):
         """
         Retrive latest fgt for given id
@@ -374,16 +647,14 @@ class Timeseries:
         :return:
         """
 
+        if self.run_catalog is not None:
+            run = self.run_catalog.get_run(sim_tag, station_id, source_id, variable_id, unit_id)
+            return run.get('end_date') if run is not None else None
+
         connection = self.pool.connection()
         try:
-            with connection.cursor() as cursor1:
-                sql_statement = "SELECT `end_date` FROM `run` WHERE `source`=%s AND `station`=%s " \
-                                "AND `sim_tag`=%s AND `variable`=%s AND `unit`=%s;"
-                is_exist = cursor1.execute(sql_statement, (source_id, station_id, sim_tag, variable_id, unit_id))
-                if is_exist > 0:
-                    return cursor1.fetchone()['end_date']
-                else:
-                    return None
+            run = self._get_run(connection, sim_tag, station_id, source_id, variable_id, unit_id)
+            return run.get('end_date') if run is not None else None
 
         except Exception as exception:
             error_message = "Retrieving latest fgt failed."
@@ -397,7 +668,9 @@ class Timeseries:
     def update_start_date(self, id_, start_date, force=False):
         """
             Update (very first fgt) start_date for inserted timeseries, if new start_date is earlier than the existing
+            (atomically, within a single statement)
             :param id_: timeseries id
+            :param force: If True, set the start_date even if it is later than the existing one
             :return: scheduled data if update is successful, else raise DatabaseAdapterError
         """
 
@@ -409,25 +682,18 @@ class Timeseries:
         try:
 
             if not force:
-                existing_start_date = None
-
                 with connection.cursor() as cursor:
-                    sql_statement = "SELECT `start_date` FROM `run` WHERE `id`=%s"
-                    row_count= cursor.execute(sql_statement, id_)
-                    if row_count > 0:
-                        existing_start_date = cursor.fetchone()['start_date']
-
-                if existing_start_date is None or existing_start_date > start_date:
-                    with connection.cursor() as cursor2:
-                        sql_statement = "UPDATE `run` SET `start_date`=%s WHERE `id`=%s"
-                        cursor2.execute(sql_statement, (start_date, id_))
-
+                    update_date_bound(cursor, 'run', 'start_date', id_, start_date, latest=False)
             else:
                 with connection.cursor() as cursor3:
                     sql_statement = "UPDATE `run` SET `start_date`=%s WHERE `id`=%s"
                     cursor3.execute(sql_statement, (start_date, id_))
 
             connection.commit()
+
+            if self.run_catalog is not None:
+                self.run_catalog.update_start_date(id_, start_date, force=force)
+
             return
         except Exception as exception:
             connection.rollback()
@@ -439,7 +705,61 @@ class Timeseries:
             if connection is not None:
                 connection.close()
 
-    def get_latest_timeseries(self, sim_tag, station_id, source_id, variable_id, unit_id, start=None):
+    def update_start_dates(self, id_date_pairs):
+        """
+        Update start_dates of many inserted timeseries, where the new start_date is earlier than the existing one,
+        with one statement per chunk of runs
+        :param id_date_pairs: list of (timeseries id, start_date) pairs
+        :return: number of updated runs
+        """
+
+        id_date_pairs = [(id_, datetime.strptime(date, COMMON_DATE_TIME_FORMAT) if type(date) is str else date)
+                         for id_, date in id_date_pairs]
+
+        connection = self.pool.connection()
+        try:
+
+            with connection.cursor() as cursor:
+                row_count = update_date_bounds(cursor, 'run', 'start_date', id_date_pairs, latest=False)
+
+            connection.commit()
+
+            if self.run_catalog is not None:
+                for id_, start_date in id_date_pairs:
+                    self.run_catalog.update_start_date(id_, start_date)
+
+            return row_count
+        except Exception as exception:
+            connection.rollback()
+            error_message = "Updating start_dates of {} runs failed.".format(len(id_date_pairs))
+            logger.error(error_message)
+            traceback.print_exc()
+            raise exception
+        finally:
+            if connection is not None:
+                connection.close()
+
+    def _get_run(self, connection, sim_tag, station_id, source_id, variable_id, unit_id):
+        """
+        Resolve the run of the given parameters, through the run catalog if enabled. The catalog queries through the
+        given connection on a refresh or a miss, rather than checking out a second one
+        :return: dict with 'id' and 'end_date' keys if the run exists, else None
+        """
+
+        if self.run_catalog is not None:
+            return self.run_catalog.get_run(sim_tag, station_id, source_id, variable_id, unit_id,
+                    connection=connection)
+
+        with connection.cursor() as cursor:
+            sql_statement = "SELECT `id`, `end_date` FROM `run` WHERE `source`=%s AND `station`=%s " \
+                            "AND `sim_tag`=%s AND `variable`=%s AND `unit`=%s;"
+            is_exist = cursor.execute(sql_statement, (source_id, station_id, sim_tag, variable_id, unit_id))
+            if is_exist > 0:
+                return cursor.fetchone()
+            return None
+
+    def get_latest_timeseries(self, sim_tag, station_id, source_id, variable_id, unit_id, start=None,
+                              output_format=TimeseriesFormat.LIST):
 
         """
         Retrieve the latest fcst timeseries available for the given parameters
@@ -449,38 +769,31 @@ class Timeseries:
         :param variable_id:
         :param unit_id:
         :param start: expected beginning of the timeseries
+        :param output_format: TimeseriesFormat of the returned timeseries. Default is TimeseriesFormat.LIST
         :return: return list of lists with time, value pairs [[time, value], [time1, value2]]
+        (or the timeseries in the requested output_format)
         """
 
-        meta_data = {}
-        ts = []
         connection = self.pool.connection()
         try:
-            with connection.cursor() as cursor1:
-                sql_statement = "SELECT `id`, `end_date` FROM `run` WHERE `source`=%s AND `station`=%s " \
-                                "AND `sim_tag`=%s AND `variable`=%s AND `unit`=%s;"
-                is_exist = cursor1.execute(sql_statement, (source_id, station_id, sim_tag, variable_id, unit_id))
-                if is_exist > 0:
-                    meta_data = cursor1.fetchone()
-                else:
-                    return None
-            if start:
-                with connection.cursor() as cursor2:
+            meta_data = self._get_run(connection, sim_tag, station_id, source_id, variable_id, unit_id)
+            if meta_data is None:
+                return None
+            if self.storage is DataStorage.BLOB:
+                with connection.cursor() as cursor:
+                    series = read_series(cursor, [(meta_data.get('id'), meta_data.get('end_date'))])
+                rows = series_to_rows(*series[(meta_data.get('id'), meta_data.get('end_date'))], start=start) \
+                    if len(series) > 0 else []
+                return format_timeseries(rows, output_format)
+            # tuple cursor: rows are converted straight into the output format without per row dicts
+            with connection.cursor(Cursor) as cursor2:
+                if start:
                     sql_statement = "SELECT `time`, `value` FROM `data` WHERE `id`=%s AND `fgt`=%s AND `time` >= %s;"
-                    rows = cursor2.execute(sql_statement, (meta_data.get('id'), meta_data.get('end_date'), start))
-                    if rows > 0:
-                        results = cursor2.fetchall()
-                        for result in results:
-                            ts.append([result.get('time'), result.get('value')])
-            else:
-                with connection.cursor() as cursor2:
+                    cursor2.execute(sql_statement, (meta_data.get('id'), meta_data.get('end_date'), start))
+                else:
                     sql_statement = "SELECT `time`, `value` FROM `data` WHERE `id`=%s AND `fgt`=%s;"
-                    rows = cursor2.execute(sql_statement, (meta_data.get('id'), meta_data.get('end_date')))
-                    if rows > 0:
-                        results = cursor2.fetchall()
-                        for result in results:
-                            ts.append([result.get('time'), result.get('value')])
-            return ts
+                    cursor2.execute(sql_statement, (meta_data.get('id'), meta_data.get('end_date')))
+                return format_timeseries(cursor2.fetchall(), output_format)
 
         except Exception as exception:
             error_message = "Retrieving latest timeseries failed."
@@ -491,10 +804,219 @@ class Timeseries:
             if connection is not None:
                 connection.close()
 
-    def get_nearest_timeseries(self, sim_tag, station_id, source_id, variable_id, unit_id, expected_fgt, start=None):
+    def _get_runs_of_stations(self, sim_tag, station_ids, source_id, variable_id, unit_id):
+        """
+        Resolve the runs of many stations, with one query per chunk of ID_CHUNK_SIZE stations
+        (or through the run catalog if enabled)
+        :return: dict of station id -> dict with 'id' and 'end_date' keys, for the stations having a run
+        """
+
+        runs = {}
+
+        if self.run_catalog is not None:
+            return self.run_catalog.get_runs(sim_tag, station_ids, source_id, variable_id, unit_id)
+
+        connection = self.pool.connection()
+        try:
+            with connection.cursor() as cursor:
+                for i in range(0, len(station_ids), ID_CHUNK_SIZE):
+                    station_chunk = station_ids[i: i + ID_CHUNK_SIZE]
+                    sql_statement = "SELECT `id`, `station`, `end_date` FROM `run` WHERE `source`=%s " \
+                                    "AND `sim_tag`=%s AND `variable`=%s AND `unit`=%s AND `station` IN ({});"\
+                        .format(', '.join(['%s'] * len(station_chunk)))
+                    cursor.execute(sql_statement, [source_id, sim_tag, variable_id, unit_id] + station_chunk)
+                    for result in cursor.fetchall():
+                        runs[result.get('station')] = result
+            return runs
+        except Exception as exception:
+            error_message = "Retrieving runs of stations failed."
+            logger.error(error_message)
+            traceback.print_exc()
+            raise exception
+        finally:
+            if connection is not None:
+                connection.close()
+
+    def _stream_data(self, id_fgt_pairs, start=None):
+        """
+        Stream the data of many (id, fgt) pairs, with one unbuffered query per chunk of ID_CHUNK_SIZE pairs
+        :return: dict of id -> list of (time, value) tuples
+        """
+
+        rows_by_id = {id_: [] for id_, _ in id_fgt_pairs}
+
+        if self.storage is DataStorage.BLOB:
+            connection = self.pool.connection()
+            try:
+                with connection.cursor() as cursor:
+                    for (id_, _), (times, values) in read_series(cursor, id_fgt_pairs).items():
+                        rows_by_id[id_] = series_to_rows(times, values, start=start)
+                return rows_by_id
+            except Exception as exception:
+                error_message = "Retrieving blob timeseries of {} ids failed.".format(len(id_fgt_pairs))
+                logger.error(error_message)
+                traceback.print_exc()
+                raise exception
+            finally:
+                if connection is not None:
+                    connection.close()
+
+        for i in range(0, len(id_fgt_pairs), ID_CHUNK_SIZE):
+            pair_chunk = id_fgt_pairs[i: i + ID_CHUNK_SIZE]
+            sql_statement = "SELECT `id`, `time`, `value` FROM `data` WHERE (`id`, `fgt`) IN ({})"\
+                .format(', '.join(['(%s, %s)'] * len(pair_chunk)))
+            params = [value for pair in pair_chunk for value in pair]
+            if start:
+                sql_statement += " AND `time` >= %s"
+                params.append(start)
+            sql_statement += " ORDER BY `id`, `time`;"
+
+            for rows in iterate_read_query(self.pool, sql_statement, params, chunk_size=DATA_FETCH_SIZE):
+                for id_, time, value in rows:
+                    rows_by_id[id_].append((time, value))
+
+        return rows_by_id
+
+    @staticmethod
+    def _format_station_timeseries(station_ids, station_tms_ids, rows_by_id, output_format, as_matrix):
+
+        if not as_matrix:
+            timeseries = {}
+            for station_id in station_ids:
+                tms_id = station_tms_ids.get(station_id)
+                timeseries[station_id] = format_timeseries(rows_by_id.get(tms_id, []), output_format) \
+                    if tms_id is not None else None
+            return timeseries
+
+        columns = {}
+        for column, station_id in enumerate(station_ids):
+            tms_id = station_tms_ids.get(station_id)
+            if tms_id is not None and len(rows_by_id.get(tms_id, [])) > 0:
+                columns[column] = format_timeseries(rows_by_id[tms_id], TimeseriesFormat.NUMPY)
+
+        if len(columns) > 0:
+            times = np.unique(np.concatenate([column_times for column_times, _ in columns.values()]))
+        else:
+            times = np.array([], dtype='datetime64[s]')
+
+        values = np.full((len(times), len(station_ids)), np.nan)
+        for column, (column_times, column_values) in columns.items():
+            values[np.searchsorted(times, column_times), column] = column_values
+
+        return times, np.array(station_ids), values
+
+    def get_latest_timeseries_batch(self, sim_tag, station_ids, source_id, variable_id, unit_id, start=None,
+                                    output_format=TimeseriesFormat.LIST, as_matrix=False):
+
+        """
+        Retrieve the latest fcst timeseries of many stations available for the given parameters.
+        Runs of all stations are resolved with one query and all timeseries are streamed with one query
+        (per chunk of ID_CHUNK_SIZE stations), whatever the number of stations.
+        :param sim_tag:
+        :param station_ids: list of station ids (int)
+        :param source_id:
+        :param variable_id:
+        :param unit_id:
+        :param start: expected beginning of the timeseries
+        :param output_format: TimeseriesFormat of the returned timeseries. Default is TimeseriesFormat.LIST
+        :param as_matrix: If True, return a (times, station_ids, values) tuple, where times is a NumPy datetime64
+        array of all timestamps and values is a 2D float64 array of shape (len(times), len(station_ids)),
+        with NaN for missing values
+        :return: dict of station id -> timeseries in the requested output_format (None if the station has no run),
+        or a (times, station_ids, values) tuple if as_matrix
+        """
+
+        station_ids = list(dict.fromkeys(station_ids))
+        runs = self._get_runs_of_stations(sim_tag, station_ids, source_id, variable_id, unit_id)
+
+        station_tms_ids = {station_id: run.get('id') for station_id, run in runs.items()}
+        rows_by_id = self._stream_data([(run.get('id'), run.get('end_date')) for run in runs.values()
+                                        if run.get('end_date') is not None], start)
+        for tms_id in station_tms_ids.values():
+            rows_by_id.setdefault(tms_id, [])
+
+        return self._format_station_timeseries(station_ids, station_tms_ids, rows_by_id, output_format, as_matrix)
+
+    def get_nearest_fgt(self, id_, expected_fgt):
+        """
+        Retrieve the fgt of the given timeseries id nearest to the expected fgt, with a single query
+        (two index seeks on the (id, fgt) key of the data or fgt_index table). Ties are resolved to the earlier fgt.
+        :param id_: timeseries id
+        :param expected_fgt:
+        :return: nearest fgt if the timeseries has data, else None
+        """
+
+        connection = self.pool.connection()
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(NEAREST_FGT_SQL.format(self.fgt_table),
+                        (id_, expected_fgt, id_, expected_fgt, expected_fgt))
+                result = cursor.fetchone()
+                return result.get('fgt') if result is not None else None
+        except Exception as exception:
+            error_message = "Retrieving nearest fgt for id={} failed.".format(id_)
+            logger.error(error_message)
+            traceback.print_exc()
+            raise exception
+        finally:
+            if connection is not None:
+                connection.close()
+
+    def get_nearest_fgts(self, ids, expected_fgt):
+        """
+        Retrieve the fgts nearest to the expected fgt for many timeseries ids,
+        with one query per chunk of ID_CHUNK_SIZE ids. Ties are resolved to the earlier fgt.
+        :param ids: list of timeseries ids
+        :param expected_fgt:
+        :return: dict of id -> nearest fgt, for the ids having data
+        """
+
+        if type(expected_fgt) is str:
+            expected_fgt = datetime.strptime(expected_fgt, COMMON_DATE_TIME_FORMAT)
+
+        ids = list(dict.fromkeys(ids))
+        nearest_fgts = {}
+
+        connection = self.pool.connection()
+        try:
+            with connection.cursor() as cursor:
+                for i in range(0, len(ids), ID_CHUNK_SIZE):
+                    id_chunk = ids[i: i + ID_CHUNK_SIZE]
+                    sql_statement = "SELECT `run`.`id`, " \
+                                    "(SELECT MAX(`fgt`) FROM `{0}` WHERE `{0}`.`id`=`run`.`id` AND `fgt` <= %s) " \
+                                    "AS `before_fgt`, " \
+                                    "(SELECT MIN(`fgt`) FROM `{0}` WHERE `{0}`.`id`=`run`.`id` AND `fgt` >= %s) " \
+                                    "AS `after_fgt` " \
+                                    "FROM `run` WHERE `run`.`id` IN ({1});"\
+                        .format(self.fgt_table, ', '.join(['%s'] * len(id_chunk)))
+                    cursor.execute(sql_statement, [expected_fgt, expected_fgt] + id_chunk)
+                    for result in cursor.fetchall():
+                        before_fgt = result.get('before_fgt')
+                        after_fgt = result.get('after_fgt')
+                        if before_fgt is None:
+                            fgt = after_fgt
+                        elif after_fgt is None or expected_fgt - before_fgt <= after_fgt - expected_fgt:
+                            fgt = before_fgt
+                        else:
+                            fgt = after_fgt
+                        if fgt is not None:
+                            nearest_fgts[result.get('id')] = fgt
+            return nearest_fgts
+        except Exception as exception:
+            error_message = "Retrieving nearest fgts for {} ids failed.".format(len(ids))
+            logger.error(error_message)
+            traceback.print_exc()
+            raise exception
+        finally:
+            if connection is not None:
+                connection.close()
+
+    def get_nearest_timeseries(self, sim_tag, station_id, source_id, variable_id, unit_id, expected_fgt, start=None,
+                               output_format=TimeseriesFormat.LIST):
 
         """
         Retrieve the fcst timeseries nearest to the specified expected fgt and available for the given parameters.
+        The nearest fgt is resolved within the data query itself. Ties are resolved to the earlier fgt.
         :param sim_tag:
         :param station_id:
         :param source_id:
@@ -502,45 +1024,37 @@ class Timeseries:
         :param unit_id:
         :param expected_fgt:
         :param start: expected beginning of the timeseries
+        :param output_format: TimeseriesFormat of the returned timeseries. Default is TimeseriesFormat.LIST
         :return: return list of lists with time, value pairs [[time, value], [time1, value2]]
+        (or the timeseries in the requested output_format). An empty timeseries if the run has no data
+        (no data after start, if start is specified), None if there's no such run.
         """
 
-        meta_data = {}
-        ts = []
         connection = self.pool.connection()
         try:
-            with connection.cursor() as cursor1:
-                sql_statement = "SELECT `id`, `end_date` FROM `run` WHERE `source`=%s AND `station`=%s " \
-                                "AND `sim_tag`=%s AND `variable`=%s AND `unit`=%s;"
-                is_exist = cursor1.execute(sql_statement, (source_id, station_id, sim_tag, variable_id, unit_id))
-                if is_exist > 0:
-                    meta_data = cursor1.fetchone()
-                else:
-                    return None
-
-            with connection.cursor() as cursor3:
-                cursor3.callproc('getNearestFGTs', (meta_data.get('id'), expected_fgt))
-                fgt = cursor3.fetchone()['fgt']
-                if fgt is None:
-                    return None
+            meta_data = self._get_run(connection, sim_tag, station_id, source_id, variable_id, unit_id)
+            if meta_data is None:
+                return None
 
-            if start:
-                with connection.cursor() as cursor2:
-                    sql_statement = "SELECT `time`, `value` FROM `data` WHERE `id`=%s AND `fgt`=%s AND `time` >= %s;"
-                    rows = cursor2.execute(sql_statement, (meta_data.get('id'), fgt, start))
-                    if rows > 0:
-                        results = cursor2.fetchall()
-                        for result in results:
-                            ts.append([result.get('time'), result.get('value')])
-            else:
-                with connection.cursor() as cursor2:
-                    sql_statement = "SELECT `time`, `value` FROM `data` WHERE `id`=%s AND `fgt`=%s;"
-                    rows = cursor2.execute(sql_statement, (meta_data.get('id'), fgt))
-                    if rows > 0:
-                        results = cursor2.fetchall()
-                        for result in results:
-                            ts.append([result.get('time'), result.get('value')])
-            return ts
+            id_ = meta_data.get('id')
+            if self.storage is DataStorage.BLOB:
+                with connection.cursor() as cursor:
+                    sql_statement = "SELECT `payload` FROM `{}` WHERE `id`=%s AND `fgt`=({});"\
+                        .format(DATA_BLOB_TABLE, NEAREST_FGT_SQL.format(self.fgt_table).rstrip(';'))
+                    cursor.execute(sql_statement, [id_, id_, expected_fgt, id_, expected_fgt, expected_fgt])
+                    result = cursor.fetchone()
+                rows = series_to_rows(*decode_series(result.get('payload')), start=start) \
+                    if result is not None else []
+                return format_timeseries(rows, output_format)
+            with connection.cursor(Cursor) as cursor2:
+                sql_statement = "SELECT `time`, `value` FROM `data` WHERE `id`=%s AND `fgt`=({})"\
+                    .format(NEAREST_FGT_SQL.format(self.fgt_table).rstrip(';'))
+                params = [id_, id_, expected_fgt, id_, expected_fgt, expected_fgt]
+                if start:
+                    sql_statement += " AND `time` >= %s"
+                    params.append(start)
+                cursor2.execute(sql_statement + ";", params)
+                return format_timeseries(cursor2.fetchall(), output_format)
 
         except Exception as exception:
             error_message = "Retrieving latest timeseries failed."
@@ -551,6 +1065,156 @@ class Timeseries:
             if connection is not None:
                 connection.close()
 
+    def get_nearest_timeseries_batch(self, sim_tag, station_ids, source_id, variable_id, unit_id, expected_fgt,
+                                     start=None, output_format=TimeseriesFormat.LIST, as_matrix=False):
+
+        """
+        Retrieve the fcst timeseries nearest to the specified expected fgt for many stations.
+        Runs, nearest fgts and timeseries of all stations are retrieved with one query each
+        (per chunk of ID_CHUNK_SIZE stations), whatever the number of stations.
+        :param sim_tag:
+        :param station_ids: list of station ids (int)
+        :param source_id:
+        :param variable_id:
+        :param unit_id:
+        :param expected_fgt:
+        :param start: expected beginning of the timeseries
+        :param output_format: TimeseriesFormat of the returned timeseries. Default is TimeseriesFormat.LIST
+        :param as_matrix: If True, return a (times, station_ids, values) tuple (see get_latest_timeseries_batch)
+        :return: dict of station id -> timeseries in the requested output_format (None if the station has no run,
+        empty if its run has no data), or a (times, station_ids, values) tuple if as_matrix
+        """
+
+        station_ids = list(dict.fromkeys(station_ids))
+        runs = self._get_runs_of_stations(sim_tag, station_ids, source_id, variable_id, unit_id)
+        nearest_fgts = self.get_nearest_fgts([run.get('id') for run in runs.values()], expected_fgt)
+
+        station_tms_ids = {station_id: run.get('id') for station_id, run in runs.items()}
+        rows_by_id = self._stream_data(list(nearest_fgts.items()), start)
+
+        return self._format_station_timeseries(station_ids, station_tms_ids, rows_by_id, output_format, as_matrix)
+
+    def get_forecast_evolution(self, id_, fgt_start=None, fgt_end=None, start=None, end=None,
+                               fgt_chunk_size=FGT_CHUNK_SIZE):
+        """
+        Retrieve every forecast issued for a timeseries id as a dense fgt x time matrix.
+        The matrix is preallocated from the fgts and the distinct times of the data, and data is streamed with one
+        unbuffered query per chunk of fgt_chunk_size fgts, written straight into the matrix as it arrives, so memory
+        use stays close to the size of the resulting matrix.
+        :param id_: timeseries id
+        :param fgt_start: fgt range start (inclusive)
+        :param fgt_end: fgt range end (inclusive)
+        :param start: time range start (inclusive)
+        :param end: time range end (inclusive)
+        :param fgt_chunk_size: number of fgts fetched per query
+        :return: (fgts, times, values) tuple, where fgts and times are NumPy datetime64 arrays and values is a
+        float64 array of shape (len(fgts), len(times)), with NaN for missing values
+        """
+
+        if self.storage is DataStorage.BLOB:
+            return self._get_blob_forecast_evolution(id_, fgt_start, fgt_end, start, end)
+
+        fgts = get_distinct_fgts_for_given_id(self.pool, id_, fgt_start, fgt_end, use_fgt_index=self.fgt_index)
+        fgt_indexes = {fgt: index for index, fgt in enumerate(fgts)}
+
+        if len(fgts) > 0:
+            times = self._get_data_times(id_, fgts[0], fgts[-1], start, end)
+        else:
+            times = np.array([], dtype='datetime64[s]')
+
+        # the matrix is allocated once from the fgt and time axes, and filled as the rows arrive
+        values = np.full((len(fgts), len(times)), np.nan)
+
+        for i in range(0, len(fgts), fgt_chunk_size):
+            fgt_chunk = fgts[i: i + fgt_chunk_size]
+            sql_statement = "SELECT `fgt`, `time`, `value` FROM `data` WHERE `id`=%s AND `fgt` BETWEEN %s AND %s"
+            params = [id_, fgt_chunk[0], fgt_chunk[-1]]
+            if start is not None:
+                sql_statement += " AND `time` >= %s"
+                params.append(start)
+            if end is not None:
+                sql_statement += " AND `time` <= %s"
+                params.append(end)
+            sql_statement += " ORDER BY `fgt`, `time`;"
+
+            for rows in iterate_read_query(self.pool, sql_statement, params, chunk_size=DATA_FETCH_SIZE):
+                fgt_column, time_column, value_column = zip(*rows)
+                chunk_times = np.array(time_column, dtype='datetime64[s]')
+                columns = np.searchsorted(times, chunk_times)
+                # rows inserted after the time axis was read are not in the matrix
+                valid = columns < len(times)
+                valid[valid] = times[columns[valid]] == chunk_times[valid]
+                fgt_rows = np.array([fgt_indexes.get(fgt, -1) for fgt in fgt_column], dtype=np.int64)
+                valid &= fgt_rows >= 0
+                values[fgt_rows[valid], columns[valid]] = np.array(value_column, dtype=np.float64)[valid]
+
+        return np.array(fgts, dtype='datetime64[s]'), times, values
+
+    def _get_data_times(self, id_, fgt_start, fgt_end, start=None, end=None):
+        """
+        Retrieve the distinct times of the data of a timeseries id within a fgt range
+        :return: sorted NumPy datetime64 array
+        """
+
+        sql_statement = "SELECT DISTINCT `time` FROM `data` WHERE `id`=%s AND `fgt` BETWEEN %s AND %s"
+        params = [id_, fgt_start, fgt_end]
+        if start is not None:
+            sql_statement += " AND `time` >= %s"
+            params.append(start)
+        if end is not None:
+            sql_statement += " AND `time` <= %s"
+            params.append(end)
+        sql_statement += " ORDER BY `time`;"
+
+        connection = self.pool.connection()
+        try:
+            with connection.cursor(Cursor) as cursor:
+                cursor.execute(sql_statement, params)
+                return np.array([result[0] for result in cursor.fetchall()], dtype='datetime64[s]')
+        except Exception as exception:
+            error_message = "Retrieving data times of tms id {} failed.".format(id_)
+            logger.error(error_message)
+            traceback.print_exc()
+            raise exception
+        finally:
+            if connection is not None:
+                connection.close()
+
+    def _get_blob_forecast_evolution(self, id_, fgt_start, fgt_end, start, end):
+
+        sql_statement = "SELECT `fgt`, `payload` FROM `{}` WHERE `id`=%s".format(DATA_BLOB_TABLE)
+        params = [id_]
+        if fgt_start is not None:
+            sql_statement += " AND `fgt` >= %s"
+            params.append(fgt_start)
+        if fgt_end is not None:
+            sql_statement += " AND `fgt` <= %s"
+            params.append(fgt_end)
+        sql_statement += " ORDER BY `fgt`;"
+
+        fgts = []
+        columns = []
+        for fgt, payload in iterate_read_query(self.pool, sql_statement, params):
+            times, values = decode_series(payload)
+            mask = np.ones(len(times), dtype=bool)
+            if start is not None:
+                mask &= times >= np.datetime64(pd.Timestamp(start).to_pydatetime(), 's')
+            if end is not None:
+                mask &= times <= np.datetime64(pd.Timestamp(end).to_pydatetime(), 's')
+            fgts.append(fgt)
+            columns.append((times[mask], values[mask]))
+
+        if len(columns) > 0:
+            times = np.unique(np.concatenate([column_times for column_times, _ in columns]))
+        else:
+            times = np.array([], dtype='datetime64[s]')
+
+        values = np.full((len(fgts), len(times)), np.nan)
+        for row, (column_times, column_values) in enumerate(columns):
+            values[row, np.searchsorted(times, column_times)] = column_values
+
+        return np.array(fgts, dtype='datetime64[s]'), times, values
+
     def delete_timeseries(self, id_, fgt):
         """
         Delete specific timeseries identified by hash id and a fgt
@@ -563,8 +1227,13 @@ class Timeseries:
         try:
 
             with connection.cursor() as cursor:
-                sql_statement = "DELETE FROM `curw_fcst`.`data` WHERE `id`= %s AND `fgt`=%s ;"
+                if self.storage is DataStorage.BLOB:
+                    sql_statement = "DELETE FROM `curw_fcst`.`data_blob` WHERE `id`= %s AND `fgt`=%s ;"
+                else:
+                    sql_statement = "DELETE FROM `curw_fcst`.`data` WHERE `id`= %s AND `fgt`=%s ;"
                 row_count = cursor.execute(sql_statement, (id_, fgt))
+                if self.fgt_index:
+                    remove_from_fgt_index(cursor, id_, fgt=fgt)
 
             connection.commit()
             return row_count
@@ -581,6 +1250,7 @@ class Timeseries:
     def delete_all_by_hash_id(self, id_):
         """
         Delete all timeseries with different fgts but with the same hash id (same meta data)
+        Data rows are deleted explicitly, since a partitioned data table has no cascading foreign key to run.
         :param id_: hash id
         :return:
         """
@@ -589,10 +1259,21 @@ class Timeseries:
         try:
 
             with connection.cursor() as cursor:
+                if self.storage is DataStorage.BLOB:
+                    sql_statement = "DELETE FROM `curw_fcst`.`data_blob` WHERE `id`= %s ;"
+                else:
+                    sql_statement = "DELETE FROM `curw_fcst`.`data` WHERE `id`= %s ;"
+                cursor.execute(sql_statement, id_)
+                if self.fgt_index:
+                    remove_from_fgt_index(cursor, id_)
                 sql_statement = "DELETE FROM `curw_fcst`.`run` WHERE `id`= %s ;"
                 row_count = cursor.execute(sql_statement, id_)
 
             connection.commit()
+
+            if self.run_catalog is not None:
+                self.run_catalog.remove_run(id_)
+
             return row_count
         except Exception as exception:
             connection.rollback()
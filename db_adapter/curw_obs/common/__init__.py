@@ -0,0 +1 @@
+from .common import get_curw_obs_hash_ids
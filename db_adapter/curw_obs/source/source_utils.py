@@ -3,6 +3,8 @@ import traceback
 
 from db_adapter.exceptions import DatabaseAdapterError
 from db_adapter.logger import logger
+from db_adapter.base.pool_registry import CURW_OBS
+from db_adapter.base.reference_cache import SOURCE, get_cached_id, get_cached_row, invalidate_reference_cache
 """
 Source JSON Object would looks like this 
 e.g.:
@@ -25,6 +27,10 @@ def get_source_by_id(pool, id_):
     :return: Source if source exists in the database, else None
     """
 
+    row = get_cached_row(pool, CURW_OBS, SOURCE, id_)
+    if row is not None:
+        return row
+
     connection = pool.connection()
     try:
 
@@ -53,6 +59,10 @@ def get_source_id(pool, source) -> str:
     :return: str: source id if source exists in the database, else None
     """
 
+    cached_id = get_cached_id(pool, CURW_OBS, SOURCE, source)
+    if cached_id is not None:
+        return cached_id
+
     connection = pool.connection()
     try:
 
@@ -89,6 +99,7 @@ def add_source(pool, source, parameters=None):
                 sql_statement = "INSERT INTO `source` (`source`, `parameters`) VALUES ( %s, %s)"
                 row_count = cursor.execute(sql_statement, (source, json.dumps(parameters)))
                 connection.commit()
+                invalidate_reference_cache(pool, CURW_OBS)
                 return True if row_count > 0 else False
         else:
             logger.info("Source with source={} already exists in the database".format(source))
@@ -146,6 +157,7 @@ def delete_source(pool, source):
             sql_statement = "DELETE FROM `source` WHERE `source`=%s"
             row_count = cursor.execute(sql_statement, source)
             connection.commit()
+            invalidate_reference_cache(pool, CURW_OBS)
             if row_count > 0:
                 return True
             else:
@@ -177,6 +189,7 @@ def delete_source_by_id(pool, id_):
             sql_statement = "DELETE FROM `source` WHERE `id`=%s"
             row_count = cursor.execute(sql_statement, id_)
             connection.commit()
+            invalidate_reference_cache(pool, CURW_OBS)
             if row_count > 0 :
                 return True
             else:
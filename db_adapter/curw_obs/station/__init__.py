@@ -1,3 +1,3 @@
 from .station_utils import get_station_id, get_station_by_id, add_station, delete_station_by_id, delete_station,\
-    add_stations, get_description, update_description
+    add_stations, add_stations_bulk, get_description, update_description
 from .station_enum import StationEnum
@@ -6,6 +6,9 @@ from datetime import datetime
 
 from db_adapter.curw_obs.station.station_enum import StationEnum
 from db_adapter.logger import logger
+from db_adapter.base.pool_registry import CURW_OBS
+from db_adapter.base.reference_cache import STATION, get_cached_id, get_cached_row, invalidate_reference_cache, \
+    station_key
 from db_adapter.exceptions import DatabaseAdapterError
 from db_adapter.constants import COMMON_DATE_TIME_FORMAT
 
@@ -23,6 +26,10 @@ e.g.:
 """
 
 
+# maximum number of stations inserted per statement by add_stations_bulk
+STATION_CHUNK_SIZE = 5000
+
+
 def get_station_by_id(pool, id_):
     """
     Retrieve station by id
@@ -31,6 +38,10 @@ def get_station_by_id(pool, id_):
     :return: Station if the stations exists in the database, else None
     """
 
+    row = get_cached_row(pool, CURW_OBS, STATION, id_)
+    if row is not None:
+        return row
+
     connection = pool.connection()
     try:
 
@@ -62,6 +73,11 @@ def get_station_id(pool, latitude, longitude, station_type) -> str:
     :return: str: station id, if station exists in the db, else None
     """
 
+    cached_id = get_cached_id(pool, CURW_OBS, STATION, station_key(latitude, longitude, station_type,
+            StationEnum.getTypeString(station_type)))
+    if cached_id is not None:
+        return cached_id
+
     connection = pool.connection()
     try:
 
@@ -146,6 +162,7 @@ def add_station(pool, name, latitude, longitude, station_type, description=None)
                 row_count = cursor2.execute(sql_statement,
                         (station_id, StationEnum.getTypeString(station_type), name, latitude, longitude, description))
                 connection.commit()
+                invalidate_reference_cache(pool, CURW_OBS)
                 return True if row_count > 0 else False
         else:
             logger.info("Station with latitude={} longitude={} and station_type={} already exists in the database"
@@ -186,6 +203,90 @@ def add_stations(stations, pool):
         print(station.get('name'))
 
 
+def add_stations_bulk(pool, stations, chunk_size=STATION_CHUNK_SIZE):
+    """
+    Register a batch of stations in a single transaction.
+    Existing stations are matched (by station type, latitude and longitude) with one query per station type,
+    a contiguous block of ids is reserved after the largest id of each StationEnum range while the range is locked
+    (SELECT ... FOR UPDATE), and the new stations are inserted with multi-row INSERT statements.
+    :param pool: database connection pool
+    :param stations: list of json objects that define station attributes (as in add_stations)
+    e.g.:
+    {
+        'name'        : 'Hanwella',
+        'latitude'    : '6.535172',
+        'longitude'   : '79.875435',
+        'description' : '',
+        'station_type': StationEnum.CUrW_WaterLevelGauge
+    }
+    :param chunk_size: maximum number of stations inserted per statement
+    :return: dict of station name -> station id, for all the given stations (existing and added)
+    """
+
+    stations_by_type = {}
+    for station in stations:
+        stations_by_type.setdefault(station.get('station_type'), []).append(station)
+
+    station_ids = {}
+
+    connection = pool.connection()
+    try:
+        with connection.cursor() as cursor:
+            # ranges are locked in ascending order, so that concurrent registrations do not deadlock
+            for station_type in sorted(stations_by_type.keys(), key=lambda station_type: station_type.value):
+                initial_value = station_type.value
+                range_ = StationEnum.getRange(station_type)
+                type_string = StationEnum.getTypeString(station_type)
+
+                sql_statement = "SELECT `id`, `station_type`, `latitude`, `longitude` FROM `station` " \
+                                "WHERE `id` BETWEEN %s and %s FOR UPDATE"
+                cursor.execute(sql_statement, (initial_value, initial_value + range_ - 1))
+                results = cursor.fetchall()
+
+                existing = {}
+                for result in results:
+                    existing.setdefault((result.get('station_type'), float(result.get('latitude')),
+                                         float(result.get('longitude'))), result.get('id'))
+                next_id = max([result.get('id') for result in results]) + 1 if len(results) > 0 else initial_value
+
+                new_rows = []
+                for station in stations_by_type[station_type]:
+                    key = (type_string, float(station.get('latitude')), float(station.get('longitude')))
+                    if key not in existing:
+                        existing[key] = next_id
+                        new_rows.append((next_id, type_string, station.get('name'), station.get('latitude'),
+                                         station.get('longitude'), station.get('description')))
+                        next_id += 1
+                    station_ids[station.get('name')] = existing[key]
+
+                if next_id > initial_value + range_:
+                    raise ValueError("Not enough free ids in the range of station type {} for {} new stations"
+                                     .format(station_type, len(new_rows)))
+
+                for i in range(0, len(new_rows), chunk_size):
+                    row_chunk = new_rows[i: i + chunk_size]
+                    sql_statement = "INSERT INTO `station` (`id`, `station_type`, `name`, `latitude`, `longitude`, " \
+                                    "`description`) VALUES {}"\
+                        .format(', '.join(['(%s, %s, %s, %s, %s, %s)'] * len(row_chunk)))
+                    cursor.execute(sql_statement, [value for row in row_chunk for value in row])
+
+                logger.info("Registered {} new stations of type {} ({} already existed)".format(len(new_rows),
+                        station_type, len(stations_by_type[station_type]) - len(new_rows)))
+
+        connection.commit()
+        invalidate_reference_cache(pool, CURW_OBS)
+        return station_ids
+    except Exception as exception:
+        connection.rollback()
+        error_message = "Bulk insertion of {} stations failed.".format(len(stations))
+        logger.error(error_message)
+        traceback.print_exc()
+        raise exception
+    finally:
+        if connection is not None:
+            connection.close()
+
+
 def delete_station(pool, latitude, longitude, station_type):
     """
     Delete station from Station table
@@ -210,6 +311,7 @@ def delete_station(pool, latitude, longitude, station_type):
             sql_statement = "DELETE FROM `station` WHERE `id` like %s and `latitude`=%s and `longitude`=%s and `station_type`=%s;"
             row_count = cursor.execute(sql_statement, (pattern, latitude, longitude, StationEnum.getTypeString(station_type)))
             connection.commit()
+            invalidate_reference_cache(pool, CURW_OBS)
             if row_count > 0:
                 return True
             else:
@@ -242,6 +344,7 @@ def delete_station_by_id(pool, id_):
             sql_statement = "DELETE FROM `station` WHERE `id`=%s"
             row_count = cursor.execute(sql_statement, id_)
             connection.commit()
+            invalidate_reference_cache(pool, CURW_OBS)
             if row_count > 0:
                 return True
             else:
@@ -320,6 +423,7 @@ def update_description(pool, id_, description, append=True):
             sql_statement = "UPDATE `station` SET `description`=%s WHERE `id`=%s"
             cursor.execute(sql_statement, (ordered_description, id_))
         connection.commit()
+        invalidate_reference_cache(pool, CURW_OBS)
         return True
     except Exception as exception:
         connection.rollback()
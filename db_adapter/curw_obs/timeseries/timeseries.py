@@ -1,14 +1,14 @@
 import pandas as pd
-import hashlib
-import json
 import traceback
 from pymysql import IntegrityError
 from datetime import datetime, timedelta
 
 from db_adapter.logger import logger
+from db_adapter.hash_utils import generate_timeseries_id, CURW_OBS_HASH_KEYS
 from db_adapter.exceptions import DatabaseAdapterError, DuplicateEntryError
 from db_adapter.curw_obs.station import StationEnum
 from db_adapter.constants import COMMON_DATE_TIME_FORMAT
+from db_adapter.base.date_bounds import update_date_bound, update_date_bounds
 
 
 class Timeseries:
@@ -29,22 +29,7 @@ class Timeseries:
         :return: str: sha256 hash value in hex format (length of 64 characters)
         """
 
-        sha256 = hashlib.sha256()
-        hash_data = {
-                'latitude'    : '',
-                'longitude'   : '',
-                'station_type': '',
-                'variable'    : '',
-                'unit'        : '',
-                'unit_type'   : ''
-                }
-
-        for key in hash_data.keys():
-            hash_data[key] = meta_data[key]
-
-        sha256.update(json.dumps(hash_data, sort_keys=True).encode("ascii"))
-        event_id = sha256.hexdigest()
-        return event_id
+        return generate_timeseries_id(meta_data, CURW_OBS_HASH_KEYS)
 
     def get_timeseries_id_if_exists(self, meta_data):
 
@@ -259,6 +244,7 @@ class Timeseries:
     def update_end_date(self, id_, end_date):
         """
         Update end_date for inserted timeseries, if end date is latest date than the existing one
+        (atomically, within a single statement)
         :param id_: timeseries id
         :return: end_date if update is successful, else raise DatabaseAdapterError
         """
@@ -268,19 +254,10 @@ class Timeseries:
         if type(end_date) is str:
             end_date = datetime.strptime(end_date, COMMON_DATE_TIME_FORMAT)
 
-        existing_end_date = None
         try:
 
             with connection.cursor() as cursor:
-                sql_statement = "SELECT `end_date` FROM `run` WHERE `id`=%s"
-                row_count= cursor.execute(sql_statement, id_)
-                if row_count > 0:
-                    existing_end_date = cursor.fetchone()['end_date']
-
-            if existing_end_date is None or existing_end_date < end_date:
-                with connection.cursor() as cursor:
-                    sql_statement = "UPDATE `run` SET `end_date`=%s WHERE `id`=%s"
-                    cursor.execute(sql_statement, (end_date, id_))
+                update_date_bound(cursor, 'run', 'end_date', id_, end_date, latest=True)
 
             connection.commit()
             return end_date
@@ -294,9 +271,39 @@ class Timeseries:
             if connection is not None:
                 connection.close()
 
+    def update_end_dates(self, id_date_pairs):
+        """
+        Update end_dates of many inserted timeseries, where the new end_date is later than the existing one,
+        with one statement per chunk of runs
+        :param id_date_pairs: list of (timeseries id, end_date) pairs
+        :return: number of updated runs
+        """
+
+        id_date_pairs = [(id_, datetime.strptime(date, COMMON_DATE_TIME_FORMAT) if type(date) is str else date)
+                         for id_, date in id_date_pairs]
+
+        connection = self.pool.connection()
+        try:
+
+            with connection.cursor() as cursor:
+                row_count = update_date_bounds(cursor, 'run', 'end_date', id_date_pairs, latest=True)
+
+            connection.commit()
+            return row_count
+        except Exception as exception:
+            connection.rollback()
+            error_message = "Updating end_dates of {} runs failed.".format(len(id_date_pairs))
+            logger.error(error_message)
+            traceback.print_exc()
+            raise exception
+        finally:
+            if connection is not None:
+                connection.close()
+
     def update_start_date(self, id_, start_date):
         """
             Update (very first obs date) start_date for inserted timeseries, if start_date is earlier date than the existing one
+            (atomically, within a single statement)
             :param id_: timeseries id
             :return: start_date if update is successful, else raise DatabaseAdapterError
         """
@@ -306,20 +313,10 @@ class Timeseries:
         if type(start_date) is str:
             start_date = datetime.strptime(start_date, COMMON_DATE_TIME_FORMAT)
 
-        existing_start_date = None
-
         try:
 
             with connection.cursor() as cursor:
-                sql_statement = "SELECT `start_date` FROM `run` WHERE `id`=%s"
-                row_count = cursor.execute(sql_statement, id_)
-                if row_count > 0:
-                    existing_start_date = cursor.fetchone()['start_date']
-
-            if existing_start_date is None or existing_start_date > start_date:
-                with connection.cursor() as cursor:
-                    sql_statement = "UPDATE `run` SET `start_date`=%s WHERE `id`=%s"
-                    cursor.execute(sql_statement, (start_date, id_))
+                update_date_bound(cursor, 'run', 'start_date', id_, start_date, latest=False)
             connection.commit()
             return start_date
         except Exception as exception:
@@ -331,3 +328,32 @@ class Timeseries:
         finally:
             if connection is not None:
                 connection.close()
+
+    def update_start_dates(self, id_date_pairs):
+        """
+        Update start_dates of many inserted timeseries, where the new start_date is earlier than the existing one,
+        with one statement per chunk of runs
+        :param id_date_pairs: list of (timeseries id, start_date) pairs
+        :return: number of updated runs
+        """
+
+        id_date_pairs = [(id_, datetime.strptime(date, COMMON_DATE_TIME_FORMAT) if type(date) is str else date)
+                         for id_, date in id_date_pairs]
+
+        connection = self.pool.connection()
+        try:
+
+            with connection.cursor() as cursor:
+                row_count = update_date_bounds(cursor, 'run', 'start_date', id_date_pairs, latest=False)
+
+            connection.commit()
+            return row_count
+        except Exception as exception:
+            connection.rollback()
+            error_message = "Updating start_dates of {} runs failed.".format(len(id_date_pairs))
+            logger.error(error_message)
+            traceback.print_exc()
+            raise exception
+        finally:
+            if connection is not None:
+                connection.close()
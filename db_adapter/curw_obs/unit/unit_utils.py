@@ -1,6 +1,8 @@
 import traceback
 
 from db_adapter.logger import logger
+from db_adapter.base.pool_registry import CURW_OBS
+from db_adapter.base.reference_cache import UNIT, get_cached_id, get_cached_row, invalidate_reference_cache
 from db_adapter.exceptions import DatabaseAdapterError
 
 """
@@ -25,6 +27,10 @@ def get_unit_by_id(pool, id_):
     :return: Unit if unit exists in the db, else None
     """
 
+    row = get_cached_row(pool, CURW_OBS, UNIT, id_)
+    if row is not None:
+        return row
+
     connection = pool.connection()
     try:
 
@@ -54,6 +60,10 @@ def get_unit_id(pool, unit, unit_type) -> str:
     :return: str: unit id if unit exists in the db, else None
     """
 
+    cached_id = get_cached_id(pool, CURW_OBS, UNIT, (unit, unit_type.value))
+    if cached_id is not None:
+        return cached_id
+
     connection = pool.connection()
     try:
 
@@ -90,6 +100,7 @@ def add_unit(pool, unit, unit_type):
                 sql_statement = "INSERT INTO `unit` (`unit`, `type`) VALUES ( %s, %s)"
                 row_count = cursor.execute(sql_statement, (unit, unit_type.value))
                 connection.commit()
+                invalidate_reference_cache(pool, CURW_OBS)
                 return True if row_count > 0 else False
         else:
             logger.info("Unit with unit={}, unit_type={} already exists in the database".format(unit, unit_type))
@@ -144,6 +155,7 @@ def delete_unit(pool, unit, unit_type):
             sql_statement = "DELETE FROM `unit` WHERE `unit`=%s and `type`=%s"
             row_count = cursor.execute(sql_statement, (unit, unit_type.value))
             connection.commit()
+            invalidate_reference_cache(pool, CURW_OBS)
             if row_count > 0:
                 return True
             else:
@@ -176,6 +188,7 @@ def delete_unit_by_id(pool, id_):
             sql_statement = "DELETE FROM `unit` WHERE `id`=%s"
             row_count = cursor.execute(sql_statement, id_)
             connection.commit()
+            invalidate_reference_cache(pool, CURW_OBS)
             if row_count > 0:
                 return True
             else:
@@ -1,6 +1,8 @@
 import traceback
 
 from db_adapter.logger import logger
+from db_adapter.base.pool_registry import CURW_OBS
+from db_adapter.base.reference_cache import VARIABLE, get_cached_id, get_cached_row, invalidate_reference_cache
 from db_adapter.exceptions import DatabaseAdapterError
 
 """
@@ -20,6 +22,10 @@ def get_variable_by_id(pool, id_):
     :return: Variable if variable exists in the db, else None
     """
 
+    row = get_cached_row(pool, CURW_OBS, VARIABLE, id_)
+    if row is not None:
+        return row
+
     connection = pool.connection()
     try:
 
@@ -48,6 +54,10 @@ def get_variable_id(pool, variable) -> str:
     :return: str: variable id if variable exists in the db, else None
     """
 
+    cached_id = get_cached_id(pool, CURW_OBS, VARIABLE, variable)
+    if cached_id is not None:
+        return cached_id
+
     connection = pool.connection()
     try:
 
@@ -83,6 +93,7 @@ def add_variable(pool, variable):
                 sql_statement = "INSERT INTO `variable` (`variable`) VALUES ( %s)"
                 row_count = cursor.execute(sql_statement, variable)
                 connection.commit()
+                invalidate_reference_cache(pool, CURW_OBS)
                 return True if row_count > 0 else False
         else:
             logger.info("Variable with variable={} already exists in the database".format(variable))
@@ -131,6 +142,7 @@ def delete_variable(pool, variable):
             sql_statement = "DELETE FROM `variable` WHERE `variable`=%s"
             row_count = cursor.execute(sql_statement, variable)
             connection.commit()
+            invalidate_reference_cache(pool, CURW_OBS)
             if row_count > 0:
                 return True
             else:
@@ -162,6 +174,7 @@ def delete_variable_by_id(pool, id_):
             sql_statement = "DELETE FROM `variable` WHERE `id`=%s"
             row_count = cursor.execute(sql_statement, id_)
             connection.commit()
+            invalidate_reference_cache(pool, CURW_OBS)
             if row_count > 0:
                 return True
             else:
@@ -1,8 +1,10 @@
 import traceback
 from datetime import datetime, timedelta
 import math
+from pymysql.cursors import Cursor
 
 from db_adapter.logger import logger
+from db_adapter.base.timeseries_format import TimeseriesFormat, format_timeseries
 
 
 def round_up_datetime_to_nearest_x_minutes(datetime_value, mins):
@@ -260,33 +262,28 @@ def summed_timeseries(timeseries):
 ##########################
 # Extract obs timeseries #
 ##########################
-def extract_obs_rain_5_min_ts(connection, id, start_time, end_time=None):
+def extract_obs_rain_5_min_ts(connection, id, start_time, end_time=None, output_format=TimeseriesFormat.LIST):
     """
-    Extract obs station timeseries (15 min intervals)
+    Extract obs station timeseries (5 min intervals)
     :param connection: connection to curw database
-    :param stations_dict: dictionary with station_id as keys and run_ids as values
+    :param id: run id of the obs station timeseries
     :param start_time: start of timeseries
-    :return:
+    :param end_time: end of timeseries
+    :param output_format: TimeseriesFormat of the returned timeseries. Default is TimeseriesFormat.LIST
+    :return: list of [time, value] pairs (or the timeseries in the requested output_format)
     """
 
-    timeseries = []
-
     try:
         # Extract per 5 min observed timeseries
-        with connection.cursor() as cursor1:
+        with connection.cursor(Cursor) as cursor1:
             if end_time is None:
                 sql_statement = "select `time`, `value`  from data where `id`=%s and `time` >= %s ;"
-                rows = cursor1.execute(sql_statement, (id, start_time))
+                cursor1.execute(sql_statement, (id, start_time))
             else:
                 sql_statement = "select `time`, `value`  from data where `id`=%s and `time` >= %s and `time` <= %s;"
-                rows = cursor1.execute(sql_statement, (id, start_time, end_time))
-
-            if rows > 0:
-                results = cursor1.fetchall()
-                for result in results:
-                    timeseries.append([result.get('time'), result.get('value')])
+                cursor1.execute(sql_statement, (id, start_time, end_time))
 
-        return timeseries
+            return format_timeseries(cursor1.fetchall(), output_format)
 
     except Exception as ex:
         traceback.print_exc()
@@ -1,6 +1,8 @@
 import traceback
 from datetime import datetime, timedelta
 
+from db_adapter.logger import logger
+
 
 class DelTimeseries:
     def __init__(self, pool, data_table, run_table):
@@ -239,7 +241,7 @@ def get_curw_sim_hash_ids(pool, run_table, model=None, method=None, obs_end_star
 
     sql_statement = pre_sql_statement + conditions + ";"
 
-    print(sql_statement)
+    logger.debug(sql_statement)
 
     ids = []
     connection = pool.connection()
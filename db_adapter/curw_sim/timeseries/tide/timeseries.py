@@ -1,11 +1,13 @@
 import pandas as pd
-import hashlib
-import json
 import traceback
 from pymysql import IntegrityError
+from pymysql.cursors import Cursor
 
 from db_adapter.logger import logger
+from db_adapter.hash_utils import generate_timeseries_id, CURW_SIM_HASH_KEYS
 from db_adapter.exceptions import DatabaseAdapterError
+from db_adapter.base.timeseries_format import TimeseriesFormat, format_timeseries
+from db_adapter.base.timeseries_payload import build_data_rows
 from db_adapter.curw_sim.grids import GridInterpolationEnum
 
 
@@ -26,20 +28,7 @@ class Timeseries:
         :return: str: sha256 hash value in hex format (length of 64 characters)
         """
 
-        sha256 = hashlib.sha256()
-        hash_data = {
-                'latitude' : '',
-                'longitude': '',
-                'model'    : '',
-                'method'   : ''
-                }
-
-        for key in hash_data.keys():
-            hash_data[key] = meta_data[key]
-
-        sha256.update(json.dumps(hash_data, sort_keys=True).encode("ascii"))
-        event_id = sha256.hexdigest()
-        return event_id
+        return generate_timeseries_id(meta_data, CURW_SIM_HASH_KEYS)
 
     def get_timeseries_id_if_exists(self, meta_data):
 
@@ -117,21 +106,15 @@ class Timeseries:
         """
         Insert timeseries to Data table in the database
         :param tms_id: hash value
-        :param timeseries: list of [tms_id, time, value] lists
+        :param timeseries: list of [time, value] lists, (times, values) tuple of NumPy arrays,
+        pandas Series indexed by time or pandas DataFrame with 'time' and 'value' columns. Not modified.
         :param boolean upsert: If True, upsert existing values ON DUPLICATE KEY. Default is False.
         Ref: 1). https://stackoverflow.com/a/14383794/1461060
              2). https://chartio.com/resources/tutorials/how-to-insert-if-row-does-not-exist-upsert-in-mysql/
         :return: row count if insertion was successful, else raise DatabaseAdapterError
         """
 
-        new_timeseries = []
-        for t in [i for i in timeseries]:
-            if len(t) > 1:
-                # Insert EventId in front of timestamp, value list
-                t.insert(0, tms_id)
-                new_timeseries.append(t)
-            else:
-                logger.warning('Invalid timeseries data:: %s', t)
+        new_timeseries = build_data_rows(timeseries, tms_id)
 
         row_count = 0
         connection = self.pool.connection()
@@ -142,12 +125,12 @@ class Timeseries:
                                     "ON DUPLICATE KEY UPDATE `value`=VALUES(`value`)"
                 else:
                     sql_statement = "INSERT INTO `tide_data` (`id`, `time`, `value`) VALUES (%s, %s, %s)"
-                row_count = cursor.executemany(sql_statement, timeseries)
+                row_count = cursor.executemany(sql_statement, new_timeseries)
             connection.commit()
             return row_count
         except Exception as exception:
             connection.rollback()
-            error_message = "Data insertion to tide_data table for tms id {}, upsert={} failed.".format(timeseries[0][0],
+            error_message = "Data insertion to tide_data table for tms id {}, upsert={} failed.".format(tms_id,
                     upsert)
             logger.error(error_message)
             traceback.print_exc()
@@ -161,21 +144,15 @@ class Timeseries:
         """
         Insert timeseries to DataMax table in the database
         :param tms_id: hash value
-        :param timeseries: list of [tms_id, time, value] lists
+        :param timeseries: list of [time, value] lists, (times, values) tuple of NumPy arrays,
+        pandas Series indexed by time or pandas DataFrame with 'time' and 'value' columns. Not modified.
         :param boolean upsert: If True, upsert existing values ON DUPLICATE KEY. Default is False.
         Ref: 1). https://stackoverflow.com/a/14383794/1461060
              2). https://chartio.com/resources/tutorials/how-to-insert-if-row-does-not-exist-upsert-in-mysql/
         :return: row count if insertion was successful, else raise DatabaseAdapterError
         """
 
-        new_timeseries = []
-        for t in [i for i in timeseries]:
-            if len(t) > 1:
-                # Insert EventId in front of timestamp, value list
-                t.insert(0, tms_id)
-                new_timeseries.append(t)
-            else:
-                logger.warning('Invalid timeseries data:: %s', t)
+        new_timeseries = build_data_rows(timeseries, tms_id)
 
         row_count = 0
         connection = self.pool.connection()
@@ -186,12 +163,12 @@ class Timeseries:
                                     "ON DUPLICATE KEY UPDATE `value`=VALUES(`value`)"
                 else:
                     sql_statement = "INSERT INTO `tide_data_max` (`id`, `time`, `value`) VALUES (%s, %s, %s)"
-                row_count = cursor.executemany(sql_statement, timeseries)
+                row_count = cursor.executemany(sql_statement, new_timeseries)
             connection.commit()
             return row_count
         except Exception as exception:
             connection.rollback()
-            error_message = "Data insertion to tide_data table for tms id {}, upsert={} failed.".format(timeseries[0][0],
+            error_message = "Data insertion to tide_data table for tms id {}, upsert={} failed.".format(tms_id,
                     upsert)
             logger.error(error_message)
             traceback.print_exc()
@@ -205,21 +182,15 @@ class Timeseries:
         """
         Insert timeseries to DataMin table in the database
         :param tms_id: hash value
-        :param timeseries: list of [tms_id, time, value] lists
+        :param timeseries: list of [time, value] lists, (times, values) tuple of NumPy arrays,
+        pandas Series indexed by time or pandas DataFrame with 'time' and 'value' columns. Not modified.
         :param boolean upsert: If True, upsert existing values ON DUPLICATE KEY. Default is False.
         Ref: 1). https://stackoverflow.com/a/14383794/1461060
              2). https://chartio.com/resources/tutorials/how-to-insert-if-row-does-not-exist-upsert-in-mysql/
         :return: row count if insertion was successful, else raise DatabaseAdapterError
         """
 
-        new_timeseries = []
-        for t in [i for i in timeseries]:
-            if len(t) > 1:
-                # Insert EventId in front of timestamp, value list
-                t.insert(0, tms_id)
-                new_timeseries.append(t)
-            else:
-                logger.warning('Invalid timeseries data:: %s', t)
+        new_timeseries = build_data_rows(timeseries, tms_id)
 
         row_count = 0
         connection = self.pool.connection()
@@ -230,12 +201,12 @@ class Timeseries:
                                     "ON DUPLICATE KEY UPDATE `value`=VALUES(`value`)"
                 else:
                     sql_statement = "INSERT INTO `tide_data_min` (`id`, `time`, `value`) VALUES (%s, %s, %s)"
-                row_count = cursor.executemany(sql_statement, timeseries)
+                row_count = cursor.executemany(sql_statement, new_timeseries)
             connection.commit()
             return row_count
         except Exception as exception:
             connection.rollback()
-            error_message = "Data insertion to tide_data table for tms id {}, upsert={} failed.".format(timeseries[0][0],
+            error_message = "Data insertion to tide_data table for tms id {}, upsert={} failed.".format(tms_id,
                     upsert)
             logger.error(error_message)
             traceback.print_exc()
@@ -382,25 +353,21 @@ class Timeseries:
             if connection is not None:
                 connection.close()
 
-    def get_timeseries(self, id_, start_date, end_date):
+    def get_timeseries(self, id_, start_date, end_date, output_format=TimeseriesFormat.LIST):
         """
         Retrieve timeseries by id
         :param id_:
-        :return: list of [time, value] pairs if id exists, else None
+        :param output_format: TimeseriesFormat of the returned timeseries. Default is TimeseriesFormat.LIST
+        :return: list of [time, value] pairs (or the timeseries in the requested output_format)
         """
 
         connection = self.pool.connection()
-        ts = []
         try:
 
-            with connection.cursor() as cursor:
+            with connection.cursor(Cursor) as cursor:
                 sql_statement = "SELECT `time`,`value` FROM `tide_data` WHERE `id`=%s AND `time` BETWEEN %s AND %s;"
-                rows = cursor.execute(sql_statement, (id_, start_date, end_date))
-                if rows > 0:
-                    results = cursor.fetchall()
-                    for result in results:
-                        ts.append([result.get('time'), result.get('value')])
-            return ts
+                cursor.execute(sql_statement, (id_, start_date, end_date))
+                return format_timeseries(cursor.fetchall(), output_format)
         except Exception as exception:
             error_message = "Retrieving timeseries for id {} failed.".format(id_)
             logger.error(error_message)
@@ -0,0 +1,2 @@
+from .grid_utils import WRF_STATIONS, FLO2D_150, FLO2D_250, get_grid_path, read_grid_csv, build_grid_array, \
+    build_grid_arrays, load_grid, load_wrf_stations, load_flo2d_grid
@@ -0,0 +1,140 @@
+import csv
+import os
+
+import numpy as np
+
+"""
+Grid files shipped with the package (db_adapter/grids): the WRF d03 stations and the FLO2D 150m / 250m grids.
+
+Each csv file is also available as a NumPy structured array (.npy, one field per csv column, typed as int, float or
+fixed width str) generated when the package is built, which is memory mapped on load instead of parsing the csv.
+If the .npy file is missing or older than the csv file (i.e. the csv changed), the csv is parsed instead and the .npy
+file is regenerated when the package directory is writable.
+
+This module only depends on NumPy, so that setup.py can use it to generate the .npy files at build time.
+
+e.g.:
+    stations = load_wrf_stations()
+    ids, latitudes, longitudes = stations['id'], stations['latitude'], stations['longitude']
+    cells = load_flo2d_grid('flo2d_250')
+"""
+
+WRF_STATIONS = 'wrf_stations'
+FLO2D_150 = 'flo2d/flo2d_150m'
+FLO2D_250 = 'flo2d/flo2d_250m'
+
+GRIDS = [WRF_STATIONS, FLO2D_150, FLO2D_250]
+
+_FLO2D_GRIDS = {
+        'flo2d_150': FLO2D_150,
+        'flo2d_250': FLO2D_250
+        }
+
+GRID_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+
+
+def get_grid_path(grid, extension='.csv', directory=None):
+    """
+    :param grid: grid name (WRF_STATIONS, FLO2D_150 or FLO2D_250)
+    :param extension: '.csv' or '.npy'
+    :param directory: grids directory. Default is the package directory
+    :return: path of the grid file
+    """
+    return os.path.join(directory or GRID_DIRECTORY, *grid.split('/')) + extension
+
+
+def _column_type(values):
+
+    for type_ in (int, float):
+        try:
+            for value in values:
+                type_(value)
+            return np.int64 if type_ is int else np.float64
+        except ValueError:
+            continue
+    return 'U{}'.format(max([len(value) for value in values] + [1]))
+
+
+def read_grid_csv(file_path):
+    """
+    Parse a grid csv file into a NumPy structured array
+    :param file_path: csv file path
+    :return: structured array with one field per csv column (named by the header)
+    """
+
+    with open(file_path, 'r', newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        rows = [row for row in reader if len(row) > 0]
+
+    columns = list(zip(*rows)) if len(rows) > 0 else [()] * len(header)
+    dtype = np.dtype([(name, _column_type(column)) for name, column in zip(header, columns)])
+    return np.array([tuple(row) for row in rows], dtype=dtype) if len(rows) > 0 else np.empty(0, dtype=dtype)
+
+
+def build_grid_array(grid, directory=None):
+    """
+    Generate the .npy file of a grid from its csv file
+    :param grid: grid name (WRF_STATIONS, FLO2D_150 or FLO2D_250)
+    :param directory: grids directory. Default is the package directory
+    :return: path of the .npy file
+    """
+
+    npy_path = get_grid_path(grid, '.npy', directory)
+    # written to a temporary file first, so that readers never map a partially written file
+    temp_path = '{}.{}.tmp.npy'.format(npy_path, os.getpid())
+    np.save(temp_path, read_grid_csv(get_grid_path(grid, '.csv', directory)))
+    os.replace(temp_path, npy_path)
+    return npy_path
+
+
+def build_grid_arrays(directory=None):
+    """
+    Generate the .npy files of all the grids
+    :param directory: grids directory. Default is the package directory
+    :return: list of the paths of the .npy files
+    """
+    return [build_grid_array(grid, directory) for grid in GRIDS]
+
+
+def load_grid(grid, mmap=True):
+    """
+    Load a grid, memory mapping its .npy file if it is up to date, else parsing its csv file
+    :param grid: grid name (WRF_STATIONS, FLO2D_150 or FLO2D_250)
+    :param boolean mmap: If True, memory map the .npy file (read only), else read it into memory
+    :return: NumPy structured array with one field per csv column
+    """
+
+    csv_path = get_grid_path(grid, '.csv')
+    npy_path = get_grid_path(grid, '.npy')
+
+    if not os.path.exists(npy_path) or os.path.getmtime(npy_path) < os.path.getmtime(csv_path):
+        try:
+            build_grid_array(grid)
+        except OSError:
+            # read only installation, the csv is parsed on every load
+            return read_grid_csv(csv_path)
+
+    return np.load(npy_path, mmap_mode='r' if mmap else None)
+
+
+def load_wrf_stations(mmap=True):
+    """
+    Load the WRF d03 stations
+    :param boolean mmap: If True, memory map the .npy file
+    :return: NumPy structured array with 'id', 'name', 'latitude', 'longitude' and 'description' fields
+    """
+    return load_grid(WRF_STATIONS, mmap)
+
+
+def load_flo2d_grid(flo2d_model, mmap=True):
+    """
+    Load the cells of a FLO2D grid
+    :param flo2d_model: 'flo2d_150' or 'flo2d_250'
+    :param boolean mmap: If True, memory map the .npy file
+    :return: NumPy structured array with 'Grid_ID', 'X' (longitude) and 'Y' (latitude) fields
+    """
+
+    if flo2d_model not in _FLO2D_GRIDS:
+        raise ValueError("Unknown flo2d model {}. Expected one of {}".format(flo2d_model, list(_FLO2D_GRIDS.keys())))
+    return load_grid(_FLO2D_GRIDS[flo2d_model], mmap)
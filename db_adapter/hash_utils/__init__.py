@@ -0,0 +1,2 @@
+from .timeseries_id_utils import CURW_FCST_HASH_KEYS, CURW_OBS_HASH_KEYS, CURW_SIM_HASH_KEYS, \
+    generate_timeseries_id, generate_ids, set_id_cache_size, clear_id_cache, get_id_cache_info
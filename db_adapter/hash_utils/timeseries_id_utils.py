@@ -0,0 +1,178 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+"""
+Timeseries (run) id generation shared by the curw_fcst, curw_obs and curw_sim Timeseries classes.
+
+The id of a timeseries is the sha256 hex digest of the json dump (with sorted keys) of its identifying meta data.
+Generated ids are memoized in a bounded LRU cache keyed by the identifying meta data values,
+so repeated meta data is hashed only once.
+"""
+
+CURW_FCST_HASH_KEYS = ('sim_tag', 'latitude', 'longitude', 'model', 'version', 'variable', 'unit', 'unit_type')
+CURW_OBS_HASH_KEYS = ('latitude', 'longitude', 'station_type', 'variable', 'unit', 'unit_type')
+CURW_SIM_HASH_KEYS = ('latitude', 'longitude', 'model', 'method')
+
+DEFAULT_CACHE_SIZE = 65536
+
+_cache = OrderedDict()
+_cache_size = DEFAULT_CACHE_SIZE
+_cache_lock = threading.Lock()
+_hits = 0
+_misses = 0
+
+
+def _canonical_value(value):
+
+    # values which compare equal may dump differently (e.g. 1 vs 1.0 vs True, 0.0 vs -0.0),
+    # hence the type (and repr of floats) is part of the key, also for the items of nested values
+    if type(value) is str:
+        return value
+    if isinstance(value, float):
+        return type(value), repr(value)
+    if isinstance(value, (tuple, list)):
+        return type(value), tuple([_canonical_value(item) for item in value])
+    if isinstance(value, dict):
+        return type(value), tuple([(_canonical_value(key), _canonical_value(item)) for key, item in value.items()])
+    return type(value), value
+
+
+def _cache_key(meta_data, hash_keys):
+
+    key = (hash_keys, tuple([_canonical_value(meta_data[hash_key]) for hash_key in hash_keys]))
+    try:
+        hash(key)
+    except TypeError:
+        # unhashable meta data values are not memoized
+        return None
+    return key
+
+
+def _hash(meta_data, hash_keys):
+
+    hash_data = {}
+    for hash_key in hash_keys:
+        hash_data[hash_key] = meta_data[hash_key]
+
+    return hashlib.sha256(json.dumps(hash_data, sort_keys=True).encode("ascii")).hexdigest()
+
+
+def _cache_put(key, event_id):
+
+    _cache[key] = event_id
+    if len(_cache) > _cache_size:
+        _cache.popitem(last=False)
+
+
+def generate_timeseries_id(meta_data, hash_keys):
+    """
+    Generate the timeseries id for given metadata
+    :param meta_data: Dict containing the hash_keys
+    :param hash_keys: tuple of the meta data keys used to generate the id
+    (CURW_FCST_HASH_KEYS, CURW_OBS_HASH_KEYS or CURW_SIM_HASH_KEYS)
+    :return: str: sha256 hash value in hex format (length of 64 characters)
+    """
+
+    global _hits, _misses
+
+    key = _cache_key(meta_data, hash_keys)
+    if key is None:
+        return _hash(meta_data, hash_keys)
+
+    with _cache_lock:
+        event_id = _cache.get(key)
+        if event_id is not None:
+            _cache.move_to_end(key)
+            _hits += 1
+            return event_id
+        _misses += 1
+
+    event_id = _hash(meta_data, hash_keys)
+
+    with _cache_lock:
+        _cache_put(key, event_id)
+
+    return event_id
+
+
+def generate_ids(meta_data_list, hash_keys):
+    """
+    Generate the timeseries ids for a list of metadata
+    :param meta_data_list: list of dicts containing the hash_keys
+    :param hash_keys: tuple of the meta data keys used to generate the ids
+    (CURW_FCST_HASH_KEYS, CURW_OBS_HASH_KEYS or CURW_SIM_HASH_KEYS)
+    :return: list of ids, in the order of meta_data_list
+    """
+
+    global _hits, _misses
+
+    keys = [_cache_key(meta_data, hash_keys) for meta_data in meta_data_list]
+    ids = [None] * len(keys)
+    missing = {}
+
+    with _cache_lock:
+        for i, key in enumerate(keys):
+            event_id = _cache.get(key) if key is not None else None
+            if event_id is not None:
+                _cache.move_to_end(key)
+                _hits += 1
+                ids[i] = event_id
+            else:
+                _misses += 1
+                missing.setdefault(key, []).append(i)
+
+    generated = {}
+    for key, indexes in missing.items():
+        if key is None:
+            for i in indexes:
+                ids[i] = _hash(meta_data_list[i], hash_keys)
+        else:
+            event_id = _hash(meta_data_list[indexes[0]], hash_keys)
+            generated[key] = event_id
+            for i in indexes:
+                ids[i] = event_id
+
+    with _cache_lock:
+        for key, event_id in generated.items():
+            _cache_put(key, event_id)
+
+    return ids
+
+
+def set_id_cache_size(size):
+    """
+    Set the maximum number of memoized ids
+    :param size: int, 0 disables memoization
+    """
+
+    global _cache_size
+
+    with _cache_lock:
+        _cache_size = size
+        while len(_cache) > _cache_size:
+            _cache.popitem(last=False)
+
+
+def clear_id_cache():
+    """
+    Clear the memoized ids along with the cache counters
+    """
+
+    global _hits, _misses
+
+    with _cache_lock:
+        _cache.clear()
+        _hits = 0
+        _misses = 0
+
+
+def get_id_cache_info():
+    """
+    Usage counters of the id cache
+    :return: dict with 'hits', 'misses', 'size' and 'max_size' keys
+    """
+
+    with _cache_lock:
+        return {'hits': _hits, 'misses': _misses, 'size': len(_cache), 'max_size': _cache_size}
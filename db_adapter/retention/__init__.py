@@ -0,0 +1 @@
+from .purge_utils import purge_curw_fcst, purge_curw_obs, purge_curw_sim
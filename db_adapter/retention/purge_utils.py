@@ -0,0 +1,269 @@
+import json
+import os
+import time
+import traceback
+from datetime import datetime, timedelta
+
+from db_adapter.logger import logger
+from db_adapter.constants import COMMON_DATE_TIME_FORMAT
+from db_adapter.curw_fcst.common import get_curw_fcst_hash_ids
+from db_adapter.curw_fcst.fgt_index import get_expired_row_counts, remove_from_fgt_index
+from db_adapter.curw_obs.common import get_curw_obs_hash_ids
+from db_adapter.curw_sim.common import get_curw_sim_hash_ids
+
+"""
+Retention purge of timeseries data older than a retention window.
+
+Timeseries ids are selected through the get_curw_*_hash_ids helpers, and the data of each id is deleted in
+primary key ordered chunks (DELETE ... ORDER BY ... LIMIT chunk_size), committing each chunk, so that every
+transaction stays small. The last deleted key is kept as a cursor, so that each chunk starts its index range scan
+at the last deleted time rather than at the start of the id. Throughput can be capped with max_rows_per_second
+and/or a sleep between chunks.
+
+If a state_file is given, progress (including the key cursor) is checkpointed to it after every chunk, and a killed
+purge resumes from it (with the same cutoff) when started again with the same arguments. The state file is removed
+once the purge completes.
+
+With fgt_index=True, curw_fcst purges are planned from the fgt index (ids without expired fgts are skipped and the
+rows to delete are estimated up front), and the index entries of the purged fgts are removed.
+
+For a partitioned curw_fcst data table, prefer db_adapter.curw_fcst.partition.drop_expired_partitions.
+
+e.g.:
+    purge_curw_fcst(pool, retention=timedelta(days=365), source_id=1, variable_id=1,
+                    chunk_size=10000, max_rows_per_second=50000, state_file='fcst_purge_state.json')
+"""
+
+DEFAULT_CHUNK_SIZE = 10000
+
+# lower bound of the key cursor before the first chunk of an id (smallest MySQL DATETIME)
+MIN_TIME = datetime(1000, 1, 1)
+
+
+def _to_timedelta(retention):
+    return retention if isinstance(retention, timedelta) else timedelta(days=retention)
+
+
+def _load_state(state_file, job):
+
+    if state_file is None or not os.path.exists(state_file):
+        return None
+
+    with open(state_file, 'r') as file:
+        state = json.load(file)
+
+    if state.get('job') != job:
+        raise ValueError("State file {} belongs to a different purge job: {}".format(state_file, state.get('job')))
+
+    return state
+
+
+def _save_state(state_file, state):
+
+    if state_file is None:
+        return
+
+    temp_file = "{}.tmp".format(state_file)
+    with open(temp_file, 'w') as file:
+        json.dump(state, file)
+    os.replace(temp_file, state_file)
+
+
+def _purge(pool, job, ids, data_table, time_column, order_columns, retention, chunk_size, max_rows_per_second,
+           sleep, state_file, fgt_index=False):
+
+    state = _load_state(state_file, job)
+    if state is not None:
+        cutoff = datetime.strptime(state['cutoff'], COMMON_DATE_TIME_FORMAT)
+        logger.info("Resuming purge {} from {} ({} ids done, {} rows deleted).".format(job, state_file,
+                len(state['completed_ids']), state['rows_deleted']))
+    else:
+        cutoff = datetime.now().replace(microsecond=0) - _to_timedelta(retention)
+        state = {'job': job, 'cutoff': cutoff.strftime(COMMON_DATE_TIME_FORMAT), 'completed_ids': [],
+                 'rows_deleted': 0, 'last_key_id': None, 'last_key': None}
+
+    completed_ids = set(state['completed_ids'])
+    pending_ids = [id_ for id_ in ids if id_ not in completed_ids]
+
+    if fgt_index:
+        expired_row_counts = get_expired_row_counts(pool, pending_ids, cutoff)
+        pending_ids = [id_ for id_ in pending_ids if id_ in expired_row_counts]
+        logger.info("Purge {} planned from the fgt index:: {} ids, ~{} rows older than {}".format(job,
+                len(pending_ids), sum(expired_row_counts.values()), cutoff))
+
+    order_by = ', '.join(['`{}`'.format(column) for column in order_columns])
+    # the last key of a chunk, found before deleting the chunk
+    boundary_sql_statement = "SELECT {} FROM `{}` WHERE `id`=%s AND `{}` < %s AND `{}` >= %s ORDER BY {} " \
+                             "LIMIT 1 OFFSET %s;".format(order_by, data_table, time_column, order_columns[0],
+                                                         order_by)
+    sql_statement = "DELETE FROM `{}` WHERE `id`=%s AND `{}` < %s AND `{}` >= %s ORDER BY {} LIMIT %s;"\
+        .format(data_table, time_column, order_columns[0], order_by)
+
+    rows_deleted = 0
+    start_time = time.monotonic()
+
+    connection = pool.connection()
+    try:
+        for id_ in pending_ids:
+            id_rows_deleted = 0
+            # primary key cursor: rows of the id before the last deleted key are gone, so each chunk starts its
+            # index range at the last deleted time instead of rescanning the deleted (but not yet purged) entries
+            last_key = state.get('last_key') if state.get('last_key_id') == id_ else None
+            last_time = datetime.strptime(last_key[0], COMMON_DATE_TIME_FORMAT) if last_key is not None \
+                else MIN_TIME
+            while True:
+                with connection.cursor() as cursor:
+                    cursor.execute(boundary_sql_statement, (id_, cutoff, last_time, chunk_size - 1))
+                    boundary = cursor.fetchone()
+                    row_count = cursor.execute(sql_statement, (id_, cutoff, last_time, chunk_size))
+                connection.commit()
+
+                id_rows_deleted += row_count
+                rows_deleted += row_count
+                state['rows_deleted'] += row_count
+                if boundary is not None:
+                    last_time = boundary.get(order_columns[0])
+                    state['last_key_id'] = id_
+                    state['last_key'] = [boundary.get(column).strftime(COMMON_DATE_TIME_FORMAT)
+                                         for column in order_columns]
+                _save_state(state_file, state)
+
+                if max_rows_per_second:
+                    lag = rows_deleted / max_rows_per_second - (time.monotonic() - start_time)
+                    if lag > 0:
+                        time.sleep(lag)
+                if sleep:
+                    time.sleep(sleep)
+
+                if row_count < chunk_size:
+                    break
+
+            if fgt_index:
+                with connection.cursor() as cursor:
+                    remove_from_fgt_index(cursor, id_, before=cutoff)
+                connection.commit()
+
+            state['completed_ids'].append(id_)
+            state['last_key_id'] = None
+            state['last_key'] = None
+            _save_state(state_file, state)
+
+            elapsed = time.monotonic() - start_time
+            logger.info("Purged {} rows of id {} older than {} ({} ids left, {:.1f} rows/sec)".format(
+                    id_rows_deleted, id_, cutoff, len(pending_ids) - len(state['completed_ids']) +
+                    len(completed_ids), rows_deleted / elapsed if elapsed > 0 else 0))
+    except Exception as exception:
+        connection.rollback()
+        error_message = "Purging {} failed. Progress is kept in state file {}".format(job, state_file)
+        logger.error(error_message)
+        traceback.print_exc()
+        raise exception
+    finally:
+        if connection is not None:
+            connection.close()
+
+    elapsed = time.monotonic() - start_time
+    summary = {
+            'cutoff'         : cutoff,
+            'ids'            : len(ids),
+            'rows_deleted'   : state['rows_deleted'],
+            'elapsed'        : elapsed,
+            'rows_per_second': rows_deleted / elapsed if elapsed > 0 else 0
+            }
+    logger.info("Purge {} completed:: {}".format(job, summary))
+
+    if state_file is not None and os.path.exists(state_file):
+        os.remove(state_file)
+
+    return summary
+
+
+def purge_curw_fcst(pool, retention, sim_tag=None, source_id=None, variable_id=None, unit_id=None, station_id=None,
+                    chunk_size=DEFAULT_CHUNK_SIZE, max_rows_per_second=None, sleep=0, state_file=None,
+                    fgt_index=False):
+    """
+    Delete curw_fcst forecasts generated (fgt) before the retention window, for the runs matching the given filters
+    :param pool: curw_fcst database connection pool
+    :param retention: timedelta, or number of days, of forecasts to keep
+    :param sim_tag:
+    :param source_id:
+    :param variable_id:
+    :param unit_id:
+    :param station_id:
+    :param chunk_size: maximum number of rows deleted per statement (and transaction)
+    :param max_rows_per_second: throughput cap. None for no cap
+    :param sleep: seconds to sleep between chunks
+    :param state_file: path of the checkpoint file. None to disable checkpointing
+    :param fgt_index: If True, plan the purge from the fgt_index table and remove the purged fgts from it
+    :return: dict with 'cutoff', 'ids', 'rows_deleted', 'elapsed' and 'rows_per_second' keys
+    """
+
+    if sim_tag is None and source_id is None and variable_id is None and unit_id is None and station_id is None:
+        raise ValueError("At least one of sim_tag, source_id, variable_id, unit_id, station_id is required.")
+
+    ids = get_curw_fcst_hash_ids(pool, sim_tag=sim_tag, source_id=source_id, variable_id=variable_id,
+            unit_id=unit_id, station_id=station_id) or []
+
+    job = {'database': 'curw_fcst', 'retention': _to_timedelta(retention).total_seconds(), 'sim_tag': sim_tag,
+           'source_id': source_id, 'variable_id': variable_id, 'unit_id': unit_id, 'station_id': station_id}
+
+    return _purge(pool, job, ids, 'data', 'fgt', ['time', 'fgt'], retention, chunk_size, max_rows_per_second,
+            sleep, state_file, fgt_index=fgt_index)
+
+
+def purge_curw_obs(pool, retention, variable_id=None, unit_id=None, station_id=None,
+                   chunk_size=DEFAULT_CHUNK_SIZE, max_rows_per_second=None, sleep=0, state_file=None):
+    """
+    Delete curw_obs observations older than the retention window, for the runs matching the given filters
+    :param pool: curw_obs database connection pool
+    :param retention: timedelta, or number of days, of observations to keep
+    :param variable_id:
+    :param unit_id:
+    :param station_id:
+    :param chunk_size: maximum number of rows deleted per statement (and transaction)
+    :param max_rows_per_second: throughput cap. None for no cap
+    :param sleep: seconds to sleep between chunks
+    :param state_file: path of the checkpoint file. None to disable checkpointing
+    :return: dict with 'cutoff', 'ids', 'rows_deleted', 'elapsed' and 'rows_per_second' keys
+    """
+
+    if variable_id is None and unit_id is None and station_id is None:
+        raise ValueError("At least one of variable_id, unit_id, station_id is required.")
+
+    ids = get_curw_obs_hash_ids(pool, variable_id=variable_id, unit_id=unit_id, station_id=station_id) or []
+
+    job = {'database': 'curw_obs', 'retention': _to_timedelta(retention).total_seconds(),
+           'variable_id': variable_id, 'unit_id': unit_id, 'station_id': station_id}
+
+    return _purge(pool, job, ids, 'data', 'time', ['time'], retention, chunk_size, max_rows_per_second, sleep,
+            state_file)
+
+
+def purge_curw_sim(pool, retention, run_table='run', data_table='data', model=None, method=None, grid_id=None,
+                   chunk_size=DEFAULT_CHUNK_SIZE, max_rows_per_second=None, sleep=0, state_file=None):
+    """
+    Delete curw_sim timeseries values older than the retention window, for the runs matching the given filters
+    :param pool: curw_sim database connection pool
+    :param retention: timedelta, or number of days, of timeseries values to keep
+    :param run_table: run table name (e.g. 'run', 'dis_run')
+    :param data_table: data table name (e.g. 'data', 'data_max', 'dis_data')
+    :param model: target model
+    :param method: interpolation method
+    :param grid_id: grid id pattern, escape character $
+    :param chunk_size: maximum number of rows deleted per statement (and transaction)
+    :param max_rows_per_second: throughput cap. None for no cap
+    :param sleep: seconds to sleep between chunks
+    :param state_file: path of the checkpoint file. None to disable checkpointing
+    :return: dict with 'cutoff', 'ids', 'rows_deleted', 'elapsed' and 'rows_per_second' keys
+    """
+
+    if model is None and method is None and grid_id is None:
+        raise ValueError("At least one of model, method, grid_id is required.")
+
+    ids = get_curw_sim_hash_ids(pool, run_table, model=model, method=method, grid_id=grid_id) or []
+
+    job = {'database': 'curw_sim', 'retention': _to_timedelta(retention).total_seconds(), 'run_table': run_table,
+           'data_table': data_table, 'model': model, 'method': method, 'grid_id': grid_id}
+
+    return _purge(pool, job, ids, data_table, 'time', ['time'], retention, chunk_size, max_rows_per_second, sleep,
+            state_file)
@@ -0,0 +1 @@
+from .spatial_utils import StationIndex, get_station_index, EARTH_RADIUS_KM
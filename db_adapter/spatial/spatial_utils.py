@@ -0,0 +1,220 @@
+import csv
+import threading
+import traceback
+import weakref
+
+import numpy as np
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:
+    cKDTree = None
+
+from db_adapter.logger import logger
+from db_adapter.base.session import Session
+from db_adapter.base.pool_registry import CURW_FCST, CURW_OBS
+from db_adapter.base.reference_cache import get_reference_cache_generation
+
+"""
+Spatial index over station coordinates, for nearest station and radius queries.
+
+Stations are indexed as 3D unit vectors, so that the nearest stations by chord length are the nearest stations by
+great circle distance. Queries return station ids with haversine distances in km, and take arrays of points, so
+thousands of points are resolved with a single call. The index uses a scipy cKDTree when scipy is installed and falls
+back to a vectorized NumPy brute force search otherwise.
+
+Indexes of the station table are built once per pool, database and StationEnum type and cached until the reference
+data of the pool changes (see db_adapter.base.reference_cache).
+
+e.g.:
+    index = get_station_index(pool, StationEnum.WRF)
+    ids, distances = index.nearest([6.9, 7.1], [79.8, 79.9])
+    ids, distances = index.within_radius(6.9, 79.8, radius=5)[0]
+"""
+
+EARTH_RADIUS_KM = 6371.0088
+
+# maximum number of query point x station distances computed at once by the brute force search
+BRUTE_FORCE_BLOCK_SIZE = 4000000
+
+_indexes = weakref.WeakKeyDictionary()
+_index_lock = threading.Lock()
+
+
+def _to_unit_vectors(latitudes, longitudes):
+
+    latitudes = np.radians(np.asarray(latitudes, dtype=np.float64))
+    longitudes = np.radians(np.asarray(longitudes, dtype=np.float64))
+    cos_latitudes = np.cos(latitudes)
+    return np.column_stack([cos_latitudes * np.cos(longitudes), cos_latitudes * np.sin(longitudes),
+                            np.sin(latitudes)])
+
+
+def _chord_to_km(chord):
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(chord / 2, 0, 1))
+
+
+def _km_to_chord(distance):
+    return 2 * np.sin(min(distance / EARTH_RADIUS_KM, np.pi) / 2)
+
+
+class StationIndex:
+
+    def __init__(self, ids, latitudes, longitudes):
+        """
+        :param ids: station ids
+        :param latitudes: station latitudes, in the order of ids
+        :param longitudes: station longitudes, in the order of ids
+        """
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.latitudes = np.asarray(latitudes, dtype=np.float64)
+        self.longitudes = np.asarray(longitudes, dtype=np.float64)
+        self._points = _to_unit_vectors(self.latitudes, self.longitudes)
+        self._tree = cKDTree(self._points) if cKDTree is not None and len(self.ids) > 0 else None
+
+    @classmethod
+    def from_csv(cls, file_path):
+        """
+        Build an index from a station csv file with 'id', 'latitude' and 'longitude' columns
+        (e.g. db_adapter/grids/wrf_stations.csv)
+        :param file_path: csv file path
+        :return: StationIndex
+        """
+        with open(file_path, 'r') as f:
+            rows = list(csv.DictReader(f))
+        return cls([row['id'] for row in rows], [row['latitude'] for row in rows],
+                   [row['longitude'] for row in rows])
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _brute_force_blocks(self, query_points):
+        block_size = max(1, BRUTE_FORCE_BLOCK_SIZE // max(1, len(self._points)))
+        for i in range(0, len(query_points), block_size):
+            # chord^2 = 2 - 2 * (dot product of the unit vectors), precise enough to rank the stations
+            chords = np.sqrt(np.maximum(2 - 2 * query_points[i: i + block_size] @ self._points.T, 0))
+            yield i, chords
+
+    def nearest(self, latitudes, longitudes, k=1):
+        """
+        Find the k nearest stations of each query point
+        :param latitudes: latitude or array of latitudes of the query points
+        :param longitudes: longitude or array of longitudes of the query points
+        :param k: number of stations per query point
+        :return: (ids, distances) tuple of NumPy arrays of shape (points,) if k is 1, else (points, k), ordered by
+        distance (km). A single query point returns a scalar (k=1) or a 1D array.
+        """
+
+        scalar = np.ndim(latitudes) == 0
+        query_points = _to_unit_vectors(np.atleast_1d(latitudes), np.atleast_1d(longitudes))
+        k = min(k, len(self.ids))
+        if k < 1:
+            raise ValueError("Station index is empty")
+
+        if self._tree is not None:
+            chords, positions = self._tree.query(query_points, k=k)
+            chords, positions = chords.reshape(len(query_points), k), positions.reshape(len(query_points), k)
+        else:
+            chords = np.empty((len(query_points), k))
+            positions = np.empty((len(query_points), k), dtype=np.int64)
+            for i, block in self._brute_force_blocks(query_points):
+                nearest = np.argpartition(block, k - 1, axis=1)[:, :k] if k < block.shape[1] \
+                    else np.tile(np.arange(block.shape[1]), (len(block), 1))
+                block_chords = self._chords(query_points[i: i + len(block)], nearest)
+                order = np.argsort(block_chords, axis=1, kind='mergesort')
+                positions[i: i + len(block)] = np.take_along_axis(nearest, order, axis=1)
+                chords[i: i + len(block)] = np.take_along_axis(block_chords, order, axis=1)
+
+        ids, distances = self.ids[positions], _chord_to_km(chords)
+        if k == 1:
+            ids, distances = ids[:, 0], distances[:, 0]
+        if scalar:
+            return ids[0], distances[0]
+        return ids, distances
+
+    def within_radius(self, latitudes, longitudes, radius):
+        """
+        Find the stations within a distance of each query point
+        :param latitudes: latitude or array of latitudes of the query points
+        :param longitudes: longitude or array of longitudes of the query points
+        :param radius: distance in km
+        :return: list of (ids, distances) tuples of NumPy arrays, one per query point, ordered by distance (km)
+        """
+
+        query_points = _to_unit_vectors(np.atleast_1d(latitudes), np.atleast_1d(longitudes))
+        max_chord = _km_to_chord(radius)
+        results = []
+
+        if self._tree is not None:
+            for point, positions in zip(query_points, self._tree.query_ball_point(query_points, max_chord)):
+                results.append(self._sorted_result(point, np.asarray(positions, dtype=np.int64)))
+        else:
+            for i, block in self._brute_force_blocks(query_points):
+                for point, chords in zip(query_points[i: i + len(block)], block):
+                    results.append(self._sorted_result(point, np.flatnonzero(chords <= max_chord)))
+        return results
+
+    def _chords(self, query_points, positions):
+        # computed from the coordinate differences, which is exact also for very close points
+        return np.sqrt(np.sum((self._points[positions] - query_points[:, np.newaxis, :]) ** 2, axis=-1))
+
+    def _sorted_result(self, point, positions):
+        chords = self._chords(point[np.newaxis, :], positions)[0]
+        order = np.argsort(chords, kind='mergesort')
+        return self.ids[positions[order]], _chord_to_km(chords[order])
+
+
+def _load_station_index(pool, database, station_type):
+
+    initial_value = station_type.value
+    range_ = station_type.getRange(station_type)
+
+    connection = pool.connection()
+    try:
+        with connection.cursor() as cursor:
+            if database == CURW_OBS:
+                sql_statement = "SELECT `id`, `latitude`, `longitude` FROM `station` " \
+                                "WHERE `id` BETWEEN %s and %s and `station_type`=%s"
+                cursor.execute(sql_statement, (initial_value, initial_value + range_ - 1,
+                                               station_type.getTypeString(station_type)))
+            else:
+                sql_statement = "SELECT `id`, `latitude`, `longitude` FROM `station` WHERE `id` BETWEEN %s and %s"
+                cursor.execute(sql_statement, (initial_value, initial_value + range_ - 1))
+            results = cursor.fetchall()
+        return StationIndex([result.get('id') for result in results],
+                            [result.get('latitude') for result in results],
+                            [result.get('longitude') for result in results])
+    except Exception as exception:
+        error_message = "Building spatial index of {} stations of type {} failed.".format(database, station_type)
+        logger.error(error_message)
+        traceback.print_exc()
+        raise exception
+    finally:
+        if connection is not None:
+            connection.close()
+
+
+def get_station_index(pool, station_type, database=CURW_FCST):
+    """
+    Spatial index of the stations of a type, built on first use and cached
+    :param pool: database connection pool (or Session)
+    :param station_type: StationEnum of the database (db_adapter.curw_fcst.station or db_adapter.curw_obs.station)
+    :param database: CURW_FCST or CURW_OBS
+    :return: StationIndex
+    """
+
+    while isinstance(pool, Session):
+        pool = pool.pool
+
+    key = (database, station_type.name)
+    generation = get_reference_cache_generation()
+    with _index_lock:
+        cached = _indexes.get(pool, {}).get(key)
+    if cached is not None and cached[0] == generation:
+        return cached[1]
+
+    index = _load_station_index(pool, database, station_type)
+    logger.info("Built spatial index of {} {} stations of type {}".format(len(index), database, station_type))
+    with _index_lock:
+        _indexes.setdefault(pool, {})[key] = (generation, index)
+    return index
@@ -1,4 +1,33 @@
+import importlib.util
+import os
+
 import setuptools
+from setuptools.command.build_py import build_py
+
+
+class BuildPyWithGridArrays(build_py):
+    """
+    build_py generating the memory mappable .npy versions of the grid csv files (db_adapter/grids)
+    """
+
+    def run(self):
+        build_py.run(self)
+        if self.dry_run:
+            return
+
+        # loaded from its file, so that the db_adapter package (and its dependencies) is not imported at build time
+        spec = importlib.util.spec_from_file_location('grid_utils',
+                os.path.join('db_adapter', 'grids', 'grid_utils.py'))
+        try:
+            grid_utils = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(grid_utils)
+        except ImportError:
+            self.warn("NumPy is not available, grid .npy files are generated on first load instead")
+            return
+
+        for npy_path in grid_utils.build_grid_arrays(os.path.join(self.build_lib, 'db_adapter', 'grids')):
+            self.announce("generated {}".format(npy_path), level=2)
+
 
 with open("README.md", "r") as fh:
     long_description = fh.read()
@@ -14,6 +43,8 @@ setuptools.setup(
         long_description_content_type="text/markdown",
         url="https://github.com/shadhini/curw_db_adapter",
         packages=setuptools.find_packages(),
+        package_data={'db_adapter.grids': ['*.csv', 'flo2d/*.csv']},
+        cmdclass={'build_py': BuildPyWithGridArrays},
         classifiers=[
                 "Programming Language :: Python :: 3",
                 "License :: OSI Approved :: MIT License",
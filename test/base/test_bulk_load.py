@@ -0,0 +1,108 @@
+from datetime import datetime
+
+import pytest
+from pymysql.err import IntegrityError, OperationalError
+
+from db_adapter.base.bulk_load import load_data_local_infile, is_bulk_load_supported, SerializedRows
+
+"""
+Unit tests of db_adapter.base.bulk_load with a fake cursor (no database needed).
+
+usage: python -m pytest test/base
+"""
+
+pytestmark = pytest.mark.skipif(not is_bulk_load_supported(), reason="memfd is not supported on this platform")
+
+COLUMNS = ['id', 'time', 'fgt', 'value']
+ROWS = [('a', datetime(2019, 7, 1, 0), datetime(2019, 7, 1), 1.5),
+        ('a', datetime(2019, 7, 1, 1), datetime(2019, 7, 1), None)]
+
+
+class FakeCursor:
+
+    def __init__(self, loaded_rows=None, warnings=(), load_error=None, upsert_row_count=0):
+        self.statements = []
+        self.files = []
+        self.loaded_rows = loaded_rows
+        self.warnings = list(warnings)
+        self.load_error = load_error
+        self.upsert_row_count = upsert_row_count
+        self.results = []
+
+    def execute(self, sql_statement, args=None):
+        self.statements.append(sql_statement)
+        self.results = []
+        if sql_statement.startswith('LOAD DATA'):
+            if self.load_error is not None:
+                raise self.load_error
+            with open(args, 'rb') as f:
+                self.files.append(f.read())
+            return len(ROWS) if self.loaded_rows is None else self.loaded_rows
+        if sql_statement.startswith('SHOW WARNINGS'):
+            self.results = self.warnings
+            return len(self.results)
+        if sql_statement.startswith('INSERT'):
+            return self.upsert_row_count
+        return 0
+
+    def fetchall(self):
+        return self.results
+
+
+def test_insert_loads_rows_into_the_table():
+    cursor = FakeCursor()
+
+    assert load_data_local_infile(cursor, 'data', COLUMNS, ROWS) == 2
+    assert len(cursor.statements) == 1
+    assert "INTO TABLE `data`" in cursor.statements[0]
+    assert 'IGNORE' not in cursor.statements[0] and 'REPLACE' not in cursor.statements[0]
+    assert cursor.files == [b'a\t2019-07-01 00:00:00\t2019-07-01 00:00:00\t1.5\n'
+                            b'a\t2019-07-01 01:00:00\t2019-07-01 00:00:00\t\\N\n']
+
+
+def test_insert_raises_on_duplicate_entry():
+    cursor = FakeCursor(loaded_rows=1, warnings=[{'Level': 'Warning', 'Code': 1062,
+                                                  'Message': "Duplicate entry 'a' for key 'PRIMARY'"}])
+
+    with pytest.raises(IntegrityError) as error:
+        load_data_local_infile(cursor, 'data', COLUMNS, ROWS)
+    assert error.value.args[0] == 1062
+
+
+def test_insert_tuple_cursor_warnings():
+    cursor = FakeCursor(loaded_rows=1, warnings=[('Warning', 1062, "Duplicate entry 'a' for key 'PRIMARY'")])
+
+    with pytest.raises(IntegrityError):
+        load_data_local_infile(cursor, 'data', COLUMNS, ROWS)
+
+
+def test_upsert_goes_through_a_temporary_table():
+    cursor = FakeCursor(upsert_row_count=3)
+
+    # counted as executemany with ON DUPLICATE KEY UPDATE: 1 inserted row + 1 updated row
+    assert load_data_local_infile(cursor, 'data', COLUMNS, ROWS, upsert=True) == 3
+    assert cursor.statements[1] == "CREATE TEMPORARY TABLE `data_bulk_load` LIKE `data`"
+    assert "INTO TABLE `data_bulk_load`" in cursor.statements[2]
+    assert cursor.statements[3] == "INSERT INTO `data` (`id`, `time`, `fgt`, `value`) " \
+                                   "SELECT `id`, `time`, `fgt`, `value` FROM `data_bulk_load` " \
+                                   "ON DUPLICATE KEY UPDATE `id`=VALUES(`id`), `time`=VALUES(`time`), " \
+                                   "`fgt`=VALUES(`fgt`), `value`=VALUES(`value`)"
+    assert cursor.statements[-1] == "DROP TEMPORARY TABLE IF EXISTS `data_bulk_load`"
+
+
+def test_local_infile_disabled():
+    cursor = FakeCursor(load_error=OperationalError(3948, "Loading local data is disabled"))
+
+    assert load_data_local_infile(cursor, 'data', COLUMNS, ROWS) is None
+    assert load_data_local_infile(cursor, 'data', COLUMNS, ROWS, upsert=True) is None
+    assert cursor.statements[-1] == "DROP TEMPORARY TABLE IF EXISTS `data_bulk_load`"
+
+
+def test_insert_serialized_rows():
+    payload = b'a\t2019-07-01 00:00:00\t2019-07-01 00:00:00\t1.5\n'
+    cursor = FakeCursor(loaded_rows=0, warnings=[{'Level': 'Warning', 'Code': 1062,
+                                                  'Message': "Duplicate entry 'a' for key 'PRIMARY'"}])
+
+    with pytest.raises(IntegrityError):
+        load_data_local_infile(cursor, 'data', COLUMNS, SerializedRows(1, payload))
+    assert cursor.files == [payload]
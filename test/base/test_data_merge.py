@@ -0,0 +1,102 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from db_adapter.base.data_merge import diff_rows, merge_data_rows
+
+"""
+Unit tests of the diff-aware merge of db_adapter.base.data_merge (no database needed).
+
+usage: python -m pytest test/base
+"""
+
+TMS_ID = 'a' * 64
+TIMES = [datetime(2019, 7, 21) + timedelta(minutes=15 * i) for i in range(4)]
+STORED_TIMES = np.array(TIMES[:3], dtype='datetime64[s]')
+STORED_VALUES = np.array([1.0, 2.0, np.nan])
+
+
+def build_rows(values):
+    return [(TMS_ID, time, value) for time, value in zip(TIMES, values)]
+
+
+def test_unchanged_changed_and_new_rows():
+    rows = build_rows([1.0, 2.5, None, 4.0])
+
+    rows_to_write, counts = diff_rows(rows, 1, 2, STORED_TIMES, STORED_VALUES)
+
+    # a stored NULL against an incoming None is unchanged
+    assert rows_to_write == [rows[1], rows[3]]
+    assert counts == {'inserted': 1, 'updated': 1, 'unchanged': 2}
+
+
+def test_null_against_a_value_is_changed():
+    rows = build_rows([None, 2.0, 3.0])
+
+    rows_to_write, counts = diff_rows(rows, 1, 2, STORED_TIMES, STORED_VALUES)
+
+    assert rows_to_write == [rows[0], rows[2]]
+    assert counts == {'inserted': 0, 'updated': 2, 'unchanged': 1}
+
+
+def test_tolerance():
+    rows = build_rows([1.0 + 1e-7, 2.01])
+
+    assert diff_rows(rows, 1, 2, STORED_TIMES, STORED_VALUES)[1]['updated'] == 1
+    assert diff_rows(rows, 1, 2, STORED_TIMES, STORED_VALUES, atol=0.0)[1]['updated'] == 2
+    assert diff_rows(rows, 1, 2, STORED_TIMES, STORED_VALUES, atol=0.0, rtol=0.01)[1]['updated'] == 0
+
+
+def test_unsorted_epoch_stored_times():
+    rows = build_rows([1.0, 2.0])
+    order = [1, 0]
+    stored_times = STORED_TIMES[:2].astype(np.int64)[order]
+
+    rows_to_write, counts = diff_rows(rows, 1, 2, stored_times, STORED_VALUES[:2][order])
+
+    assert rows_to_write == []
+    assert counts['unchanged'] == 2
+
+
+def test_nothing_stored():
+    rows = build_rows([1.0, 2.0])
+
+    rows_to_write, counts = diff_rows(rows, 1, 2, np.array([], dtype='datetime64[s]'), np.array([]))
+
+    assert rows_to_write == rows
+    assert counts == {'inserted': 2, 'updated': 0, 'unchanged': 0}
+
+
+def test_no_rows():
+    assert diff_rows([], 1, 2, STORED_TIMES, STORED_VALUES) == ([], {'inserted': 0, 'updated': 0, 'unchanged': 0})
+
+
+class FakeCursor:
+
+    def __init__(self, results):
+        self.results = results
+        self.statements = []
+
+    def execute(self, sql_statement, args=None):
+        self.statements.append((sql_statement, args))
+        return len(self.results)
+
+    def executemany(self, sql_statement, args):
+        self.statements.append((sql_statement, args))
+        return len(args)
+
+    def fetchall(self):
+        return self.results
+
+
+def test_merge_writes_only_changed_rows():
+    cursor = FakeCursor([{'time': TIMES[0], 'value': 1.0}, {'time': TIMES[1], 'value': 2.0}])
+    rows = build_rows([1.0, 3.0, 4.0])
+
+    counts = merge_data_rows(cursor, 'data', ['id', 'time', 'value'], rows, {'id': TMS_ID})
+
+    assert counts == {'inserted': 1, 'updated': 1, 'unchanged': 1}
+    assert cursor.statements[0] == ("SELECT `time`, `value` FROM `data` WHERE `id`=%s AND `time` BETWEEN %s AND %s;",
+                                    [TMS_ID, TIMES[0], TIMES[2]])
+    assert cursor.statements[1] == ("INSERT INTO `data` (`id`, `time`, `value`) VALUES (%s, %s, %s) "
+                                    "ON DUPLICATE KEY UPDATE `value`=VALUES(`value`)", rows[1:])
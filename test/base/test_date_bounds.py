@@ -0,0 +1,87 @@
+from datetime import datetime
+
+from db_adapter.base.date_bounds import update_date_bound, update_date_bounds
+
+"""
+Unit tests of the set based run date bound updates of db_adapter.base.date_bounds, checking the exact statements and
+parameters sent through a fake cursor (no database needed).
+
+usage: python -m pytest test/base
+"""
+
+JULY_20 = datetime(2019, 7, 20)
+JULY_21 = datetime(2019, 7, 21)
+JULY_22 = datetime(2019, 7, 22)
+
+
+class FakeCursor:
+
+    def __init__(self):
+        self.statements = []
+
+    def execute(self, sql_statement, args=None):
+        self.statements.append((sql_statement, list(args)))
+        return 1
+
+
+def test_update_latest_bound():
+    cursor = FakeCursor()
+
+    update_date_bound(cursor, 'run', 'end_date', 'a', JULY_21)
+
+    assert cursor.statements == [("UPDATE `run` SET `end_date`=GREATEST(COALESCE(`end_date`, CAST(%s AS DATETIME)), "
+                                  "CAST(%s AS DATETIME)) WHERE `id`=%s", [JULY_21, JULY_21, 'a'])]
+
+
+def test_update_earliest_bound():
+    cursor = FakeCursor()
+
+    update_date_bound(cursor, 'run', 'start_date', 'a', JULY_21, latest=False)
+
+    assert cursor.statements[0][0].startswith("UPDATE `run` SET `start_date`=LEAST(COALESCE(`start_date`, ")
+
+
+def test_update_bounds_merges_duplicate_ids():
+    cursor = FakeCursor()
+
+    row_count = update_date_bounds(cursor, 'run', 'end_date', [('a', JULY_21), ('b', JULY_20), ('a', JULY_22),
+                                                               ('b', None), ('a', JULY_20)])
+
+    assert row_count == 1
+    assert cursor.statements == [(
+            "UPDATE `run` JOIN (SELECT %s AS `id`, CAST(%s AS DATETIME) AS `date` UNION ALL "
+            "SELECT %s, CAST(%s AS DATETIME)) AS `bounds` ON `run`.`id`=`bounds`.`id` "
+            "SET `run`.`end_date`=GREATEST(COALESCE(`run`.`end_date`, `bounds`.`date`), `bounds`.`date`)",
+            ['a', JULY_22, 'b', JULY_20])]
+
+
+def test_update_earliest_bounds_keep_the_earliest_duplicate():
+    cursor = FakeCursor()
+
+    update_date_bounds(cursor, 'run', 'start_date', [('a', JULY_21), ('a', JULY_20), ('a', JULY_22)], latest=False)
+
+    sql_statement, params = cursor.statements[0]
+    assert "SET `run`.`start_date`=LEAST(COALESCE(`run`.`start_date`, `bounds`.`date`), `bounds`.`date`)" \
+           in sql_statement
+    assert params == ['a', JULY_20]
+
+
+def test_update_bounds_in_chunks():
+    cursor = FakeCursor()
+
+    row_count = update_date_bounds(cursor, 'dis_run', 'end_date', [(str(i), JULY_21) for i in range(5)],
+                                   chunk_size=2)
+
+    assert row_count == 3
+    assert [len(params) for _, params in cursor.statements] == [4, 4, 2]
+    assert cursor.statements[2] == ("UPDATE `dis_run` JOIN (SELECT %s AS `id`, CAST(%s AS DATETIME) AS `date`) "
+                                    "AS `bounds` ON `dis_run`.`id`=`bounds`.`id` SET `dis_run`.`end_date`="
+                                    "GREATEST(COALESCE(`dis_run`.`end_date`, `bounds`.`date`), `bounds`.`date`)",
+                                    ['4', JULY_21])
+
+
+def test_update_no_bounds():
+    cursor = FakeCursor()
+
+    assert update_date_bounds(cursor, 'run', 'end_date', [('a', None)]) == 0
+    assert cursor.statements == []
@@ -0,0 +1,214 @@
+import threading
+from datetime import datetime
+
+import numpy as np
+
+from db_adapter.curw_fcst.timeseries import Timeseries
+from db_adapter.curw_fcst.timeseries.run_catalog import RunCatalog
+from db_adapter.base.timeseries_format import TimeseriesFormat
+
+"""
+Unit tests of db_adapter.curw_fcst.timeseries.Timeseries with a fake connection pool (no database needed).
+The fake cursors answer queries with a handler function of the SQL statement and its parameters.
+
+usage: python -m pytest test/base
+"""
+
+FGT = datetime(2019, 7, 20, 23)
+RUN = {'id': 'a' * 64, 'end_date': FGT}
+
+
+class FakeCursor:
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.results = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def execute(self, sql_statement, args=None):
+        self.pool.statements.append((sql_statement, args))
+        self.results = list(self.pool.handler(sql_statement, args))
+        return len(self.results)
+
+    def executemany(self, sql_statement, args):
+        self.pool.statements.append((sql_statement, args))
+        return len(args)
+
+    def fetchone(self):
+        return self.results[0] if len(self.results) > 0 else None
+
+    def fetchall(self):
+        return self.results
+
+    def fetchmany(self, size):
+        results, self.results = self.results[:size], self.results[size:]
+        return results
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    def cursor(self, cursor_class=None):
+        return FakeCursor(self.pool)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.pool.in_use -= 1
+
+
+class FakePool:
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.statements = []
+        self.in_use = 0
+        self.max_in_use = 0
+
+    def connection(self, shareable=True):
+        self.in_use += 1
+        self.max_in_use = max(self.max_in_use, self.in_use)
+        return FakeConnection(self)
+
+
+def test_nearest_timeseries_of_missing_run():
+    pool = FakePool(lambda sql_statement, args: [])
+
+    assert Timeseries(pool).get_nearest_timeseries('tag', 1, 1, 1, 1, FGT) is None
+
+
+def test_nearest_timeseries_of_run_without_data():
+    pool = FakePool(lambda sql_statement, args: [RUN] if 'FROM `run`' in sql_statement else [])
+    timeseries = Timeseries(pool)
+
+    assert timeseries.get_nearest_timeseries('tag', 1, 1, 1, 1, FGT) == []
+    times, values = timeseries.get_nearest_timeseries('tag', 1, 1, 1, 1, FGT, output_format=TimeseriesFormat.NUMPY)
+    assert len(times) == 0 and len(values) == 0
+
+
+def test_nearest_timeseries():
+    rows = [(datetime(2019, 7, 21, 0), 1.0), (datetime(2019, 7, 21, 1), 2.0)]
+    pool = FakePool(lambda sql_statement, args: [RUN] if 'FROM `run`' in sql_statement else rows)
+
+    assert Timeseries(pool).get_nearest_timeseries('tag', 1, 1, 1, 1, FGT) == [list(row) for row in rows]
+
+
+def run_row(id_, station_id):
+    return {'id': id_, 'sim_tag': 'tag', 'station': station_id, 'source': 1, 'variable': 1, 'unit': 1,
+            'start_date': FGT, 'end_date': FGT}
+
+
+def test_run_catalog_resolves_misses_with_one_query():
+
+    def handler(sql_statement, args):
+        if 'IN (' in sql_statement:
+            return [run_row('b' * 64, station_id) for station_id in args[4:] if station_id == 2]
+        return [run_row('a' * 64, 1)]
+
+    pool = FakePool(handler)
+    catalog = RunCatalog(pool)
+
+    runs = Timeseries(pool, run_catalog=catalog)._get_runs_of_stations('tag', [1, 2, 3], 1, 1, 1)
+
+    assert {station_id: run['id'] for station_id, run in runs.items()} == {1: 'a' * 64, 2: 'b' * 64}
+    # the full refresh, then a single query for the stations missing from the catalog
+    assert len(pool.statements) == 2
+    assert pool.statements[1][1] == [1, 'tag', 1, 1, 2, 3]
+
+    # the resolved run is now in the catalog
+    assert catalog.get_runs('tag', [2], 1, 1, 1)[2]['id'] == 'b' * 64
+    assert len(pool.statements) == 2
+
+
+def test_run_catalog_queries_through_the_held_connection():
+    rows = [(datetime(2019, 7, 21, 0), 1.0)]
+
+    def handler(sql_statement, args):
+        if 'FROM `run`' in sql_statement:
+            # the whole run table holds the run of station 1
+            return [run_row(RUN['id'], 1)] if args is None else []
+        return rows
+
+    pool = FakePool(handler)
+
+    # the catalog refresh and the miss lookup run on the connection of get_latest_timeseries
+    assert Timeseries(pool, run_catalog=RunCatalog(pool)).get_latest_timeseries('tag', 1, 1, 1, 1) == [[*rows[0]]]
+    assert Timeseries(pool, run_catalog=RunCatalog(pool)).get_nearest_timeseries('tag', 2, 1, 1, 1, FGT) is None
+    assert pool.max_in_use == 1 and pool.in_use == 0
+
+
+def test_run_catalog_refresh_does_not_hold_the_lock():
+    later_fgt = datetime(2019, 7, 21, 23)
+
+    def handler(sql_statement, args):
+        # another thread writes to the catalog while the refresh query runs
+        thread = threading.Thread(target=catalog.update_end_date, args=(RUN['id'], later_fgt))
+        thread.start()
+        thread.join(timeout=1)
+        assert not thread.is_alive()
+        return [run_row(RUN['id'], 1)]
+
+    pool = FakePool(handler)
+    catalog = RunCatalog(pool)
+    catalog.add_run(RUN['id'], 'tag', 1, 1, 1, 1, FGT, FGT)
+
+    catalog.refresh()
+
+    # the run updated during the refresh keeps its newer end_date
+    assert catalog.get_run('tag', 1, 1, 1, 1)['end_date'] == later_fgt
+
+
+def test_forecast_evolution_matrix():
+    fgts = [datetime(2019, 7, 20, hour) for hour in range(3)]
+    times = [datetime(2019, 7, 21, hour) for hour in range(4)]
+    # fgt i forecasts times i to i + 1; the row of time 3 was inserted after the time axis was read
+    data = [(fgts[i], times[i + j], float(10 * i + j)) for i in range(3) for j in range(2)]
+
+    def handler(sql_statement, args):
+        if 'distinct `fgt`' in sql_statement:
+            return [{'fgt': fgt} for fgt in fgts]
+        if 'DISTINCT `time`' in sql_statement:
+            return [(time,) for time in times[:3]]
+        return [row for row in data if args[1] <= row[0] <= args[2]]
+
+    pool = FakePool(handler)
+    evolution_fgts, evolution_times, values = Timeseries(pool).get_forecast_evolution(RUN['id'], fgt_chunk_size=2)
+
+    assert evolution_fgts.tolist() == fgts
+    assert evolution_times.tolist() == times[:3]
+    np.testing.assert_array_equal(values, [[0.0, 1.0, np.nan], [np.nan, 10.0, 11.0], [np.nan, np.nan, 20.0]])
+    # the fgt axis, the time axis, then one data query per chunk of 2 fgts
+    assert len(pool.statements) == 4
+
+
+def test_run_batch_backfill_moves_the_cached_start_date():
+    meta_data = {'sim_tag': 'tag', 'latitude': 7.1, 'longitude': 79.9, 'model': 'WRF', 'version': 'v4',
+                 'variable': 'Precipitation', 'unit': 'mm', 'unit_type': 'Accumulative', 'station_id': 1,
+                 'source_id': 1, 'variable_id': 1, 'unit_id': 1}
+    backfill_fgt = datetime(2019, 7, 19, 23)
+    tms_id = Timeseries.generate_timeseries_id(meta_data)
+    catalog = RunCatalog(FakePool(lambda sql_statement, args: []))
+    catalog.refresh()
+    catalog.add_run(tms_id, 'tag', 1, 1, 1, 1, FGT, FGT)
+
+    # the run exists: the batch moves its dates with GREATEST / LEAST
+    pool = FakePool(lambda sql_statement, args: [{'id': tms_id}] if sql_statement.startswith('SELECT `id`') else [])
+    timeseries = Timeseries(pool, run_catalog=catalog)
+    timeseries.insert_run_batch({'station': (meta_data, [[datetime(2019, 7, 20, 0), 1.0]])}, backfill_fgt)
+
+    run = catalog.get_run_by_id(tms_id)
+    assert run['start_date'] == backfill_fgt and run['end_date'] == FGT
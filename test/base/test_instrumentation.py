@@ -0,0 +1,45 @@
+import pytest
+
+from db_adapter.base.instrumentation import fingerprint_statement
+
+"""
+Unit tests of the statement fingerprints of db_adapter.base.instrumentation (no database needed).
+
+usage: python -m pytest test/base
+"""
+
+
+@pytest.mark.parametrize('statement, fingerprint', [
+        ("SELECT * FROM `data` WHERE `id`=%s;", "SELECT * FROM `data` WHERE `id`=?"),
+        ("SELECT * FROM `data` WHERE `id`=%(id)s", "SELECT * FROM `data` WHERE `id`=?"),
+        ("SELECT * FROM `data` WHERE `id`='abc' AND `value` > -1.5e3",
+         "SELECT * FROM `data` WHERE `id`=? AND `value` > ?"),
+        ("SELECT 1 FROM t WHERE a='it''s' AND b=\"say \"\"hi\"\"\" AND c='a\\'b'",
+         "SELECT ? FROM t WHERE a=? AND b=? AND c=?"),
+        ("select  `x`\n  from t\twhere y = 2 ;", "select `x` from t where y = ?"),
+        (b"SELECT `time` FROM `data` WHERE `id`=%s", "SELECT `time` FROM `data` WHERE `id`=?"),
+        ])
+def test_literals_and_whitespace_are_normalized(statement, fingerprint):
+    assert fingerprint_statement(statement) == fingerprint
+
+
+def test_identifiers_with_digits_are_kept():
+    assert fingerprint_statement("SELECT `d03_1`, t2.col3 FROM `table1` WHERE x=1") == \
+           "SELECT `d03_1`, t2.col3 FROM `table1` WHERE x=?"
+
+
+def test_in_lists_share_a_fingerprint():
+    fingerprints = set([fingerprint_statement("SELECT `id` FROM `run` WHERE `id` IN ({})".format(
+            ', '.join(['%s'] * count))) for count in [1, 2, 1000]])
+    fingerprints.add(fingerprint_statement("SELECT `id` FROM `run` WHERE `id` IN ('a', 'b', 3)"))
+
+    assert fingerprints == {"SELECT `id` FROM `run` WHERE `id` IN (...)"}
+
+
+def test_values_lists_share_a_fingerprint():
+    fingerprints = set([fingerprint_statement("INSERT INTO `data` (`id`, `time`, `value`) VALUES {}".format(
+            ', '.join(['(%s, %s, %s)'] * count))) for count in [1, 2, 1000]])
+    fingerprints.add(fingerprint_statement("INSERT INTO `data` (`id`, `time`, `value`) VALUES "
+                                           "('a', '2019-07-21 00:00:00', 1.5), ('a', '2019-07-21 00:15:00', -2)"))
+
+    assert fingerprints == {"INSERT INTO `data` (`id`, `time`, `value`) VALUES (...)"}
@@ -0,0 +1,94 @@
+import threading
+import time
+
+import pytest
+from DBUtils.PooledDB import TooManyConnections
+
+from db_adapter.base.pooled_db import InstrumentedPooledDB
+
+"""
+Unit tests of the db_adapter.base.InstrumentedPooledDB usage counters with a fake DB-API module (no database needed).
+
+usage: python -m pytest test/base
+"""
+
+
+class FakeConnection:
+
+    def cursor(self, *args):
+        return None
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def connect():
+    return FakeConnection()
+
+
+connect.threadsafety = 1
+connect.OperationalError = connect.InternalError = Exception
+
+
+def test_warm_up_is_not_counted():
+    pool = InstrumentedPooledDB(connect, mincached=2, maxcached=2)
+
+    stats = pool.get_stats()
+    assert stats['checkouts'] == 0
+    assert stats['connections_created'] == 2
+    assert stats['idle'] == 2
+
+
+def test_returned_connections_are_reset_or_discarded():
+    pool = InstrumentedPooledDB(connect, maxcached=1)
+
+    first, second = pool.connection(), pool.connection()
+    assert pool.get_stats()['in_use'] == 2
+    first.close()
+    second.close()
+
+    stats = pool.get_stats()
+    assert stats['checkouts'] == 2
+    assert stats['connections_reset'] == 1
+    assert stats['connections_discarded'] == 1
+    assert stats['in_use'] == 0 and stats['idle'] == 1
+
+
+def test_blocked_checkout_counts_one_wait():
+    pool = InstrumentedPooledDB(connect, maxcached=1, maxconnections=1, blocking=True)
+    connection = pool.connection()
+
+    thread = threading.Thread(target=lambda: pool.connection().close())
+    thread.start()
+    time.sleep(0.1)
+    # wakeups without a free connection keep the checkout waiting
+    for _ in range(3):
+        with pool._lock:
+            pool._lock.notify_all()
+        time.sleep(0.02)
+    connection.close()
+    thread.join()
+
+    stats = pool.get_stats()
+    assert stats['checkouts'] == 2
+    assert stats['waits'] == 1
+    assert stats['wait_time'] >= 0.1
+
+
+def test_non_blocking_refusal_is_not_a_wait():
+    pool = InstrumentedPooledDB(connect, maxconnections=1, blocking=False)
+    connection = pool.connection()
+
+    with pytest.raises(TooManyConnections):
+        pool.connection()
+    connection.close()
+
+    stats = pool.get_stats()
+    assert stats['checkouts'] == 1
+    assert stats['waits'] == 0
@@ -0,0 +1,126 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from db_adapter.retention.purge_utils import _purge, MIN_TIME
+
+"""
+Unit tests of the db_adapter.retention purge with a fake connection pool holding the data rows in memory
+(no database needed).
+
+usage: python -m pytest test/base
+"""
+
+JOB = {'database': 'curw_fcst'}
+NOW = datetime.now().replace(microsecond=0)
+OLD_FGT = NOW - timedelta(days=30)
+
+
+class FakeCursor:
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.result = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def execute(self, sql_statement, args):
+        self.pool.statements.append((sql_statement, args))
+        id_, cutoff, last_time, limit = args
+        # rows of the id in (time, fgt) order
+        rows = sorted([row for row in self.pool.rows if row[0] == id_ and row[2] < cutoff and row[1] >= last_time],
+                      key=lambda row: (row[1], row[2]))
+        if sql_statement.startswith('SELECT'):
+            self.result = {'time': rows[limit][1], 'fgt': rows[limit][2]} if len(rows) > limit else None
+            return 1 if self.result is not None else 0
+        if self.pool.fail_on_delete == len(self.pool.statements):
+            raise RuntimeError("killed")
+        for row in rows[:limit]:
+            self.pool.rows.remove(row)
+        return len(rows[:limit])
+
+    def fetchone(self):
+        return self.result
+
+
+class FakeConnection:
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    def cursor(self):
+        return FakeCursor(self.pool)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakePool:
+
+    def __init__(self, rows, fail_on_delete=None):
+        self.rows = list(rows)
+        self.statements = []
+        self.fail_on_delete = fail_on_delete
+
+    def connection(self, shareable=True):
+        return FakeConnection(self)
+
+
+def build_rows():
+    times = [datetime(2019, 7, 21) + timedelta(hours=hour) for hour in range(5)]
+    # 5 times x 2 old fgts per id, and a recent fgt which is kept
+    return [(id_, time, fgt) for id_ in ['a', 'b'] for time in times
+            for fgt in [OLD_FGT, OLD_FGT + timedelta(hours=1), NOW]]
+
+
+def purge(pool, state_file=None):
+    return _purge(pool, JOB, ['a', 'b'], 'data', 'fgt', ['time', 'fgt'], timedelta(days=1), 4, None, 0, state_file)
+
+
+def test_purge_advances_the_key_cursor():
+    pool = FakePool(build_rows())
+
+    summary = purge(pool)
+
+    assert summary['rows_deleted'] == 20
+    assert sorted(set([row[2] for row in pool.rows])) == [NOW]
+    deletes = [args for sql_statement, args in pool.statements if sql_statement.startswith('DELETE')]
+    assert "`time` >= %s" in pool.statements[0][0]
+    # 10 rows of each id in chunks of 4: the lower bound moves to the time of the last deleted key
+    assert [args[2] for args in deletes if args[0] == 'a'] == [MIN_TIME, datetime(2019, 7, 21, 1),
+                                                              datetime(2019, 7, 21, 3)]
+    assert deletes[3][2] == MIN_TIME
+
+
+def test_resume_from_the_checkpointed_key(tmp_path):
+    state_file = str(tmp_path / 'purge_state.json')
+    # killed on the second delete of id a
+    pool = FakePool(build_rows(), fail_on_delete=4)
+
+    with pytest.raises(RuntimeError):
+        purge(pool, state_file)
+
+    with open(state_file, 'r') as file:
+        state = json.load(file)
+    assert state['rows_deleted'] == 4
+    assert state['last_key_id'] == 'a'
+    assert state['last_key'] == ['2019-07-21 01:00:00', (OLD_FGT + timedelta(hours=1)).strftime('%Y-%m-%d %H:%M:%S')]
+
+    pool.statements = []
+    pool.fail_on_delete = None
+    summary = purge(pool, state_file)
+
+    assert pool.statements[0][1][2] == datetime(2019, 7, 21, 1)
+    assert summary['rows_deleted'] == 20
+    assert sorted(set([row[2] for row in pool.rows])) == [NOW]
@@ -0,0 +1,105 @@
+import pytest
+
+from db_adapter.base import Session
+from db_adapter.base.pool_registry import CURW_FCST
+from db_adapter.base.reference_cache import VARIABLE, enable_reference_cache, disable_reference_cache, \
+    get_cached_id, invalidate_reference_cache
+
+"""
+Unit tests of db_adapter.base.reference_cache with a fake connection pool (no database needed).
+
+usage: python -m pytest test/base
+"""
+
+
+class FakeCursor:
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.results = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def execute(self, sql_statement, args=None):
+        self.pool.statements.append(sql_statement)
+        self.results = [dict(row) for row in self.pool.tables.get(sql_statement.split('`')[1], [])]
+        return len(self.results)
+
+    def fetchall(self):
+        return self.results
+
+
+class FakeConnection:
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    def cursor(self, *args):
+        return FakeCursor(self.pool)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakePool:
+
+    def __init__(self):
+        self.tables = {VARIABLE: [{'id': 1, 'variable': 'Precipitation'}]}
+        self.statements = []
+        self.checkouts = 0
+
+    def connection(self, shareable=True):
+        self.checkouts += 1
+        return FakeConnection(self)
+
+
+@pytest.fixture(autouse=True)
+def reference_cache():
+    enable_reference_cache()
+    yield
+    disable_reference_cache()
+
+
+def test_lookups_through_a_session_bypass_the_cache():
+    pool = FakePool()
+
+    with Session(pool) as session:
+        assert get_cached_id(session, CURW_FCST, VARIABLE, 'Precipitation') is None
+
+    assert pool.checkouts == 0
+    assert get_cached_id(pool, CURW_FCST, VARIABLE, 'Precipitation') == 1
+    assert pool.checkouts == 1
+
+
+def test_session_invalidation_is_repeated_when_the_session_ends():
+    pool = FakePool()
+
+    with Session(pool) as session:
+        # delete_variable through the session: the row is gone only once the session commits
+        invalidate_reference_cache(session, CURW_FCST)
+        assert get_cached_id(pool, CURW_FCST, VARIABLE, 'Precipitation') == 1
+        pool.tables[VARIABLE] = []
+
+    assert get_cached_id(pool, CURW_FCST, VARIABLE, 'Precipitation') is None
+
+
+def test_nested_session_invalidation_waits_for_the_enclosing_session():
+    pool = FakePool()
+
+    with Session(pool) as session:
+        with Session(session) as inner_session:
+            invalidate_reference_cache(inner_session, CURW_FCST)
+        assert get_cached_id(pool, CURW_FCST, VARIABLE, 'Precipitation') == 1
+        pool.tables[VARIABLE] = []
+
+    assert get_cached_id(pool, CURW_FCST, VARIABLE, 'Precipitation') is None
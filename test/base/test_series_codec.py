@@ -0,0 +1,93 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from db_adapter.base.series_codec import encode_series, decode_series, series_to_rows, HEADER, FLAG_IRREGULAR
+
+"""
+Unit tests of the db_adapter.base.series_codec binary timeseries encoding (no database needed).
+
+usage: python -m pytest test/base
+"""
+
+
+def flags_of(payload):
+    return HEADER.unpack_from(payload)[2]
+
+
+def test_round_trip_regular_steps():
+    start = datetime(2019, 7, 1)
+    times = [start + timedelta(minutes=15 * i) for i in range(96)]
+    values = [i * 0.5 for i in range(96)]
+
+    payload = encode_series(times, values)
+    decoded_times, decoded_values = decode_series(payload)
+
+    assert not flags_of(payload) & FLAG_IRREGULAR
+    assert decoded_times.tolist() == times
+    assert decoded_values.tolist() == values
+
+
+def test_round_trip_irregular_steps():
+    times = [datetime(2019, 7, 1), datetime(2019, 7, 1, 0, 15), datetime(2019, 7, 1, 1), datetime(2019, 7, 3)]
+    values = [1.25, -2.5, 0.0, 1e6]
+
+    payload = encode_series(times, values)
+    decoded_times, decoded_values = decode_series(payload)
+
+    assert flags_of(payload) & FLAG_IRREGULAR
+    assert decoded_times.tolist() == times
+    assert decoded_values.tolist() == values
+
+
+def test_round_trip_unsorted_time_value_lists():
+    rows = [['2019-07-01 01:00:00', 2.0], ['2019-07-01 00:00:00', 1.0], ['2019-07-01 01:00:00', 3.0]]
+
+    decoded_times, decoded_values = decode_series(encode_series(rows))
+
+    # sorted by time, the last value of a duplicated time wins
+    assert decoded_times.tolist() == [datetime(2019, 7, 1), datetime(2019, 7, 1, 1)]
+    assert decoded_values.tolist() == [1.0, 3.0]
+
+
+def test_round_trip_empty_series():
+    decoded_times, decoded_values = decode_series(encode_series([], []))
+
+    assert len(decoded_times) == 0
+    assert len(decoded_values) == 0
+    assert series_to_rows(decoded_times, decoded_values) == []
+
+
+def test_round_trip_nan_and_none():
+    times = [datetime(2019, 7, 1, hour) for hour in range(4)]
+
+    decoded_times, decoded_values = decode_series(encode_series(times, [1.0, None, float('nan'), 4.0]))
+
+    assert np.isnan(decoded_values[1]) and np.isnan(decoded_values[2])
+    assert series_to_rows(decoded_times, decoded_values) == [(times[0], 1.0), (times[1], None), (times[2], None),
+                                                             (times[3], 4.0)]
+
+
+def test_round_trip_float32():
+    times = [datetime(2019, 7, 1, hour) for hour in range(3)]
+    values = [0.1, 2.5, 1e-3]
+
+    decoded_times, decoded_values = decode_series(encode_series(times, values, value_type='float32'))
+
+    assert decoded_times.tolist() == times
+    assert decoded_values.tolist() == np.array(values, dtype=np.float32).astype(np.float64).tolist()
+
+
+def test_series_to_rows_time_range():
+    times = [datetime(2019, 7, 1, hour) for hour in range(5)]
+    decoded_times, decoded_values = decode_series(encode_series(times, list(range(5))))
+
+    rows = series_to_rows(decoded_times, decoded_values, start='2019-07-01 01:00:00', end=times[3])
+
+    assert rows == [(times[1], 1.0), (times[2], 2.0), (times[3], 3.0)]
+
+
+def test_unsupported_value_type():
+    with pytest.raises(ValueError):
+        encode_series([datetime(2019, 7, 1)], [1.0], value_type='int16')
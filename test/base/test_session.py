@@ -0,0 +1,126 @@
+import pytest
+
+from db_adapter.base import Session
+from db_adapter.exceptions import DatabaseAdapterError
+
+"""
+Unit tests of db_adapter.base.Session with a fake connection pool (no database needed).
+
+usage: python -m pytest test/base
+"""
+
+
+class FakeConnection:
+
+    def __init__(self, log):
+        self.log = log
+
+    def cursor(self):
+        self.log.append('cursor')
+        return None
+
+    def commit(self):
+        self.log.append('commit')
+
+    def rollback(self):
+        self.log.append('rollback')
+
+    def close(self):
+        self.log.append('close')
+
+
+class FakePool:
+
+    def __init__(self):
+        self.log = []
+        self.checkouts = 0
+
+    def connection(self, shareable=True):
+        self.checkouts += 1
+        return FakeConnection(self.log)
+
+
+def helper(pool, fail=False):
+    # mimics the adapter helpers: connection, commit / rollback, close
+    connection = pool.connection()
+    try:
+        connection.cursor()
+        if fail:
+            raise ValueError("failed")
+        connection.commit()
+    except Exception as exception:
+        connection.rollback()
+        raise exception
+    finally:
+        connection.close()
+
+
+def test_commits_once_at_the_end():
+    pool = FakePool()
+    with Session(pool) as session:
+        helper(session)
+        helper(session)
+        assert pool.log == ['cursor', 'cursor']
+
+    assert pool.checkouts == 1
+    assert pool.log == ['cursor', 'cursor', 'commit', 'close']
+
+
+def test_rolls_back_on_exception():
+    pool = FakePool()
+    with pytest.raises(ValueError):
+        with Session(pool) as session:
+            helper(session)
+            helper(session, fail=True)
+
+    assert pool.log == ['cursor', 'cursor', 'rollback', 'close']
+
+
+def test_caught_failure_does_not_commit_silently():
+    pool = FakePool()
+    with pytest.raises(DatabaseAdapterError):
+        with Session(pool) as session:
+            helper(session)
+            try:
+                helper(session, fail=True)
+            except ValueError:
+                pass
+            assert session.rollback_only
+
+    assert 'commit' not in pool.log
+    assert pool.log[-2:] == ['rollback', 'close']
+
+
+def test_commit_raises_when_rollback_only():
+    pool = FakePool()
+    session = Session(pool)
+    helper(session)
+    session.connection().rollback()
+
+    with pytest.raises(DatabaseAdapterError):
+        session.commit()
+    assert not session.rollback_only
+
+    # the session can be used again after the rollback
+    helper(session)
+    assert session.commit()
+    session.close()
+    assert pool.log[-2:] == ['commit', 'close']
+
+
+def test_commit_without_work():
+    pool = FakePool()
+    with Session(pool) as session:
+        assert session.commit()
+    assert pool.checkouts == 0
+
+
+def test_nested_session_shares_the_connection():
+    pool = FakePool()
+    with Session(pool) as outer:
+        with Session(outer) as inner:
+            helper(inner)
+        helper(outer)
+
+    assert pool.checkouts == 1
+    assert pool.log.count('commit') == 1
@@ -0,0 +1,52 @@
+import hashlib
+import json
+
+import pytest
+
+from db_adapter.hash_utils import CURW_FCST_HASH_KEYS, CURW_OBS_HASH_KEYS, CURW_SIM_HASH_KEYS, \
+    generate_timeseries_id, generate_ids
+from db_adapter.hash_utils.timeseries_id_utils import clear_id_cache, get_id_cache_info
+
+"""
+Unit tests of the memoized timeseries id generation (no database needed): memoized ids must be byte identical to the
+sha256 of the json dump of the identifying meta data.
+
+usage: python -m pytest test/base
+"""
+
+# values which compare equal (and hash alike) but dump differently, nested or not
+VALUES = [1, 1.0, True, 0.0, -0.0, 'a', None, (1,), (1.0,), (True,), [1], [1.0], ((1, 2.0),), ((1.0, 2),),
+          {'x': 1}, {'x': 1.0}, {1: 'a'}, {True: 'a'}, [(0.0,)], [(-0.0,)]]
+
+
+def baseline_id(meta_data, hash_keys):
+    hash_data = {hash_key: meta_data[hash_key] for hash_key in hash_keys}
+    return hashlib.sha256(json.dumps(hash_data, sort_keys=True).encode("ascii")).hexdigest()
+
+
+def meta_data_list(hash_keys):
+    return [{hash_key: (value if index == 0 else 'x') for index, hash_key in enumerate(hash_keys)}
+            for value in VALUES] + [{hash_key: value for hash_key in hash_keys} for value in VALUES]
+
+
+@pytest.mark.parametrize('hash_keys', [CURW_FCST_HASH_KEYS, CURW_OBS_HASH_KEYS, CURW_SIM_HASH_KEYS])
+def test_memoized_ids_match_baseline(hash_keys):
+    clear_id_cache()
+    meta_data = meta_data_list(hash_keys)
+    expected = [baseline_id(item, hash_keys) for item in meta_data]
+
+    # generated (misses), then memoized (hits), one at a time and in batches
+    assert [generate_timeseries_id(item, hash_keys) for item in meta_data] == expected
+    assert [generate_timeseries_id(item, hash_keys) for item in meta_data] == expected
+    assert generate_ids(meta_data, hash_keys) == expected
+    assert generate_ids(list(reversed(meta_data)), hash_keys) == list(reversed(expected))
+    assert get_id_cache_info()['hits'] > 0
+
+
+def test_nested_values_do_not_share_cache_entries():
+    clear_id_cache()
+    ids = generate_ids([{'latitude': value, 'longitude': 1, 'model': 'm', 'method': 'x'}
+                        for value in [(1,), (1.0,), (True,)]], CURW_SIM_HASH_KEYS)
+
+    assert len(set(ids)) == 3
+    assert get_id_cache_info()['size'] == 3
@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from db_adapter.base.bulk_load import SerializedRows, _serialize_rows
+from db_adapter.base.timeseries_payload import build_data_rows, serialize_data_rows
+
+"""
+Unit tests of db_adapter.base.timeseries_payload (no database needed).
+
+usage: python -m pytest test/base
+"""
+
+TMS_ID = 'a' * 64
+FGT = datetime(2019, 7, 20, 23)
+TIMES = [datetime(2019, 7, 21) + timedelta(minutes=15 * i) for i in range(6)]
+VALUES = [0.1, 1e-05, 12.5, float('nan'), -3.0, 1e16]
+
+
+def parse(payload):
+    rows = []
+    for line in payload.decode('utf-8').splitlines():
+        fields = line.split('\t')
+        rows.append(fields[:-1] + [None if fields[-1] == '\\N' else float(fields[-1])])
+    return rows
+
+
+@pytest.mark.parametrize('timeseries', [
+        (np.array(TIMES, dtype='datetime64[s]'), np.array(VALUES)),
+        pd.Series(VALUES, index=pd.DatetimeIndex(TIMES)),
+        pd.DataFrame({'time': TIMES, 'value': VALUES})
+        ])
+def test_serialized_columns_match_serialized_rows(timeseries):
+    serialized_rows = serialize_data_rows(timeseries, TMS_ID, FGT)
+
+    assert isinstance(serialized_rows, SerializedRows)
+    assert serialized_rows.row_count == len(TIMES)
+    assert parse(serialized_rows.payload) == parse(_serialize_rows(build_data_rows(timeseries, TMS_ID, FGT)))
+    assert parse(serialized_rows.payload)[3] == [TMS_ID, '2019-07-21 00:45:00', '2019-07-20 23:00:00', None]
+
+
+def test_serialize_without_fgt():
+    serialized_rows = serialize_data_rows((np.array(TIMES[:2], dtype='datetime64[s]'), np.array([1, 2])), TMS_ID)
+
+    assert serialized_rows.payload == '{0}\t2019-07-21 00:00:00\t1.0\n{0}\t2019-07-21 00:15:00\t2.0\n'\
+        .format(TMS_ID).encode('utf-8')
+
+
+def test_build_data_rows_does_not_modify_lists():
+    timeseries = [[TIMES[0], 1.0], [TIMES[1], 2.0], [TIMES[2]]]
+
+    rows = build_data_rows(timeseries, TMS_ID, FGT)
+
+    assert rows == [(TMS_ID, TIMES[0], FGT, 1.0), (TMS_ID, TIMES[1], FGT, 2.0)]
+    assert timeseries == [[TIMES[0], 1.0], [TIMES[1], 2.0], [TIMES[2]]]
+
+
+def test_length_mismatch():
+    with pytest.raises(ValueError):
+        serialize_data_rows((np.array(TIMES, dtype='datetime64[s]'), np.array(VALUES[:2])), TMS_ID, FGT)
@@ -0,0 +1,118 @@
+import timeit
+import traceback
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from db_adapter.base import get_Pool, destroy_Pool
+from db_adapter.base.series_codec import encode_series, decode_series
+from db_adapter.curw_fcst.blob_storage import create_data_blob_table
+from db_adapter.curw_fcst.timeseries import Timeseries, DataStorage
+
+"""
+Benchmark of the curw_fcst data_blob storage against the row per value data table.
+
+Inserts one synthetic forecast timeseries (FGTS fgts of ROWS values) in both layouts, then compares the read latency
+of get_latest_timeseries, get_forecast_evolution and the stored size. Synthetic rows are deleted afterwards.
+Codec figures (payload size, encode/decode time) are printed before connecting to the database.
+
+usage: python test/blob_storage_benchmark.py
+"""
+
+USERNAME = "root"
+PASSWORD = "password"
+HOST = "127.0.0.1"
+PORT = 3306
+DATABASE = "curw_fcst"
+
+ROWS = 2000
+FGTS = 30
+REPEAT = 20
+
+SIM_TAG = 'blob_storage_benchmark'
+STATION_ID = 1
+SOURCE_ID = 1
+VARIABLE_ID = 1
+UNIT_ID = 1
+
+TMS_ID = 'b' * 64
+START = datetime(2019, 7, 21, 0, 0, 0)
+
+
+def forecast():
+    times = [START + timedelta(minutes=15 * i) for i in range(ROWS)]
+    values = np.round(np.random.random(ROWS) * 100, 2).tolist()
+    return [[time, value] for time, value in zip(times, values)]
+
+
+def benchmark_codec():
+    timeseries = forecast()
+    times = np.array([t[0] for t in timeseries], dtype='datetime64[s]')
+    values = np.array([t[1] for t in timeseries])
+
+    print("{:<34}{:>14}{:>14}{:>14}".format('codec', 'bytes', 'encode (ms)', 'decode (ms)'))
+    for value_type in ['float64', 'float32']:
+        payload = encode_series(times, values, value_type=value_type)
+        encode_time = min(timeit.repeat(lambda: encode_series(times, values, value_type=value_type),
+                number=1, repeat=REPEAT))
+        decode_time = min(timeit.repeat(lambda: decode_series(payload), number=1, repeat=REPEAT))
+        print("{:<34}{:>14}{:>14.3f}{:>14.3f}".format("{} values, {}".format(ROWS, value_type), len(payload),
+                encode_time * 1000, decode_time * 1000))
+
+
+def table_size(pool, table):
+    connection = pool.connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE TABLE `{}`;".format(table))
+            cursor.fetchall()
+            cursor.execute("SELECT `DATA_LENGTH` + `INDEX_LENGTH` AS `size` FROM `information_schema`.`TABLES` "
+                           "WHERE `TABLE_SCHEMA`=DATABASE() AND `TABLE_NAME`=%s;", table)
+            return cursor.fetchone().get('size')
+    finally:
+        connection.close()
+
+
+def main():
+    benchmark_codec()
+
+    pool = get_Pool(host=HOST, port=PORT, user=USERNAME, password=PASSWORD, db=DATABASE)
+    create_data_blob_table(pool)
+
+    layouts = [('rows', Timeseries(pool=pool)),
+               ('blob float64', Timeseries(pool=pool, storage=DataStorage.BLOB)),
+               ('blob float32', Timeseries(pool=pool, storage=DataStorage.BLOB, blob_value_type='float32'))]
+
+    fgts = [START - timedelta(hours=6 * i) for i in range(FGTS)][::-1]
+    try:
+        layouts[0][1].insert_run({'tms_id': TMS_ID, 'sim_tag': SIM_TAG, 'start_date': fgts[0],
+                                  'end_date': fgts[-1], 'station_id': STATION_ID, 'source_id': SOURCE_ID,
+                                  'variable_id': VARIABLE_ID, 'unit_id': UNIT_ID})
+
+        print("\n{:<34}{:>14}{:>14}".format('layout', 'latest (ms)', 'evolution (ms)'))
+        for name, ts in layouts:
+            for fgt in fgts:
+                ts.insert_data(forecast(), TMS_ID, fgt, upsert=True)
+
+            latest_time = min(timeit.repeat(lambda: ts.get_latest_timeseries(SIM_TAG, STATION_ID, SOURCE_ID,
+                    VARIABLE_ID, UNIT_ID), number=1, repeat=REPEAT))
+            evolution_time = min(timeit.repeat(lambda: ts.get_forecast_evolution(TMS_ID), number=1, repeat=REPEAT))
+            print("{:<34}{:>14.2f}{:>14.2f}".format(name, latest_time * 1000, evolution_time * 1000))
+
+            if ts.storage is DataStorage.BLOB and name != layouts[-1][0]:
+                for fgt in fgts:
+                    ts.delete_timeseries(TMS_ID, fgt)
+
+        print("\ntable sizes (bytes, whole tables):: data={}, data_blob={}".format(table_size(pool, 'data'),
+                table_size(pool, 'data_blob')))
+    except Exception:
+        traceback.print_exc()
+    finally:
+        layouts[-1][1].delete_all_by_hash_id(TMS_ID)
+        layouts[0][1].delete_all_by_hash_id(TMS_ID)
+        destroy_Pool(pool=pool)
+        print("Process Finished.")
+
+
+if __name__ == '__main__':
+    main()
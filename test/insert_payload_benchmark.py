@@ -0,0 +1,89 @@
+import timeit
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pymysql
+
+from db_adapter.base import build_data_rows, serialize_data_rows
+from db_adapter.base.bulk_load import _serialize_rows
+
+"""
+Benchmark of building the data table insert payload of one fcst timeseries.
+Compares the former list mutating path (t.insert(0, tms_id) / t.insert(2, fgt) on every row)
+with build_data_rows() fed with lists, NumPy arrays, a pandas Series and a pandas DataFrame.
+The payload column includes escaping the rows into the VALUES clause, as done by executemany.
+List cases include building the caller's list, since the legacy path mutates it and cannot reuse it.
+The LOAD DATA cases compare serializing built rows (bulk_load=True with lists) with serializing the columns
+directly (bulk_load=True with columnar input).
+No database connection is needed.
+
+usage: python test/insert_payload_benchmark.py
+"""
+
+ROWS = 100000
+REPEAT = 5
+
+TMS_ID = 'a' * 64
+FGT = datetime(2019, 7, 20, 23, 0, 0)
+
+connection = pymysql.connections.Connection(defer_connect=True, charset='utf8mb4')
+
+
+def legacy_rows(timeseries):
+    new_timeseries = []
+    for t in [i for i in timeseries]:
+        if len(t) > 1:
+            t.insert(0, TMS_ID)
+            t.insert(2, FGT)
+            new_timeseries.append(t)
+    return new_timeseries
+
+
+def escape_rows(rows):
+    return ','.join([connection.escape(row) for row in rows])
+
+
+def main():
+    start = datetime(2019, 7, 21, 0, 0, 0)
+    times = [start + timedelta(minutes=15 * i) for i in range(ROWS)]
+    values = np.random.random(ROWS)
+
+    time_array = np.array(times, dtype='datetime64[s]')
+    series = pd.Series(values, index=pd.DatetimeIndex(times))
+    data_frame = pd.DataFrame({'time': times, 'value': values})
+
+    def list_input():
+        return [[time, value] for time, value in zip(times, values.tolist())]
+
+    cases = [
+            ('legacy list (mutating)', lambda: legacy_rows(list_input())),
+            ('build_data_rows(list)', lambda: build_data_rows(list_input(), TMS_ID, FGT)),
+            ('build_data_rows(numpy)', lambda: build_data_rows((time_array, values), TMS_ID, FGT)),
+            ('build_data_rows(series)', lambda: build_data_rows(series, TMS_ID, FGT)),
+            ('build_data_rows(frame)', lambda: build_data_rows(data_frame, TMS_ID, FGT))
+            ]
+
+    print("{} rows, best of {} runs".format(ROWS, REPEAT))
+    print("{:<28}{:>12}{:>16}".format('input', 'rows (ms)', 'payload (ms)'))
+    for name, build in cases:
+        build_time = min(timeit.repeat(build, number=1, repeat=REPEAT))
+        payload_time = min(timeit.repeat(lambda: escape_rows(build()), number=1, repeat=REPEAT))
+        print("{:<28}{:>12.1f}{:>16.1f}".format(name, build_time * 1000, payload_time * 1000))
+
+    load_data_cases = [
+            ('rows(list)', lambda: _serialize_rows(build_data_rows(list_input(), TMS_ID, FGT))),
+            ('rows(numpy)', lambda: _serialize_rows(build_data_rows((time_array, values), TMS_ID, FGT))),
+            ('serialize_data_rows(numpy)', lambda: serialize_data_rows((time_array, values), TMS_ID, FGT)),
+            ('serialize_data_rows(series)', lambda: serialize_data_rows(series, TMS_ID, FGT)),
+            ('serialize_data_rows(frame)', lambda: serialize_data_rows(data_frame, TMS_ID, FGT))
+            ]
+
+    print("{:<28}{:>28}".format('input', 'LOAD DATA payload (ms)'))
+    for name, serialize in load_data_cases:
+        payload_time = min(timeit.repeat(serialize, number=1, repeat=REPEAT))
+        print("{:<28}{:>28.1f}".format(name, payload_time * 1000))
+
+
+if __name__ == "__main__":
+    main()